@@ -5,8 +5,9 @@ import mlflow
 
 class BaseCopier():
     def __init__(self, src_client, dst_client):
-        self.src_client = src_client
-        self.dst_client = dst_client
+        from mlflow_export_import.common import mlflow_utils
+        self.src_client = mlflow_utils.create_mlflow_client(src_client)
+        self.dst_client = mlflow_utils.create_mlflow_client(dst_client)
 
     def get_experiment(self, client, exp_name):
         exp = client.get_experiment_by_name(exp_name)
@@ -23,7 +24,8 @@ def mk_local_path(path):
 
 def peek_at_experiment(exp_dir):
     manifest_path = os.path.join(exp_dir,"manifest.json")
-    with open(mk_local_path(manifest_path), "r") as f:
+    from mlflow_export_import.common import encoding
+    with encoding.open_text(manifest_path, "r") as f:
         content = f.read()
     print("manifest path:",manifest_path)
     print(content)
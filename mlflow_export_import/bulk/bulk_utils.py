@@ -1,8 +1,7 @@
-import mlflow
-from mlflow_export_import.common.iterators import ListRegisteredModelsIterator
-from mlflow_export_import.common.iterators import ListExperimentsIterator
-
-client = mlflow.tracking.MlflowClient()
+from mlflow.exceptions import MlflowException
+from mlflow_export_import.common.iterators import ListRegisteredModelsIterator, SearchRegisteredModelsIterator
+from mlflow_export_import.common.iterators import ListExperimentsIterator, SearchExperimentsIterator
+from mlflow_export_import.common import mlflow_utils
 
 def get_experiment_ids(experiment_ids):
     """
@@ -10,10 +9,10 @@ def get_experiment_ids(experiment_ids):
     """
     if isinstance(experiment_ids,str):
         if experiment_ids == "all":
-            return [ exp.experiment_id for exp in ListExperimentsIterator(client) ]
+            return [ exp.experiment_id for exp in ListExperimentsIterator(mlflow_utils.get_default_mlflow_client(), prefetch=1) ]
         elif experiment_ids.endswith("*"):
             exp_prefix = experiment_ids[:-1]
-            return [ exp.experiment_id for exp in ListExperimentsIterator(client) if exp.name.startswith(exp_prefix) ] # Wish there was an experiment search method for efficiency
+            return [ exp.experiment_id for exp in _search_experiments_by_prefix(exp_prefix) ]
         else:
             return experiment_ids.split(",")
     elif isinstance(experiment_ids,list):
@@ -25,10 +24,10 @@ def get_experiment_ids(experiment_ids):
 def get_model_names(model_names):
     if isinstance(model_names,str):
         if model_names == "all":
-            model_names = [ model.name for model in ListRegisteredModelsIterator(client) ]
+            model_names = [ model.name for model in ListRegisteredModelsIterator(mlflow_utils.get_default_mlflow_client(), prefetch=1) ]
         elif model_names.endswith("*"):
             model_prefix = model_names[:-1]
-            model_names = [ model.name for model in ListRegisteredModelsIterator(client) if model.name.startswith(model_prefix) ] # TODO: change to search_registered_models
+            model_names = [ model.name for model in _search_registered_models_by_prefix(model_prefix) ]
         else:
             model_names = model_names.split(",")
     elif isinstance(model_names,list):
@@ -36,3 +35,42 @@ def get_model_names(model_names):
     else:
         return model_names
     return model_names
+
+def _search_experiments_by_prefix(prefix):
+    """
+    Returns the experiments whose name starts with prefix using a server-side 'name LIKE' filter.
+    Falls back to listing all experiments if the server or client does not support search_experiments.
+    """
+    client = mlflow_utils.get_default_mlflow_client()
+    query = _mk_prefix_filter(prefix)
+    if query and hasattr(client, "search_experiments"):
+        try:
+            return [ exp for exp in SearchExperimentsIterator(client, query=query, prefetch=1) if exp.name.startswith(prefix) ]
+        except MlflowException as e:
+            print(f"WARNING: Cannot search experiments with filter \"{query}\". Listing all experiments. {e}")
+    return [ exp for exp in ListExperimentsIterator(client, prefetch=1) if exp.name.startswith(prefix) ]
+
+def _search_registered_models_by_prefix(prefix):
+    """
+    Returns the registered models whose name starts with prefix using a server-side 'name LIKE' filter.
+    Falls back to listing all registered models if the server does not support the filter.
+    """
+    client = mlflow_utils.get_default_mlflow_client()
+    query = _mk_prefix_filter(prefix)
+    if query:
+        try:
+            return [ model for model in SearchRegisteredModelsIterator(client, query=query, prefetch=1) if model.name.startswith(prefix) ]
+        except MlflowException as e:
+            print(f"WARNING: Cannot search registered models with filter \"{query}\". Listing all models. {e}")
+    return [ model for model in ListRegisteredModelsIterator(client, prefetch=1) if model.name.startswith(prefix) ]
+
+def _mk_prefix_filter(prefix):
+    """
+    Returns a 'name LIKE' filter for a name prefix or None if the prefix cannot be quoted.
+    The '_' and '%' LIKE wildcards in the prefix can over-match, so callers check the prefix on the results.
+    """
+    if "'" not in prefix:
+        return f"name LIKE '{prefix}%'"
+    if '"' not in prefix:
+        return f'name LIKE "{prefix}%"'
+    return None
@@ -9,6 +9,10 @@ from mlflow_export_import.bulk.export_models import export_models
 from mlflow_export_import.bulk.export_experiments import export_experiments
 from mlflow_export_import import click_doc
 from mlflow_export_import.bulk import write_export_manifest_file
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import cached_client
+from mlflow_export_import.common import encoding as _encoding
+from mlflow_export_import.common.blob_store import BLOBS_DIR
 
 ALL_STAGES = "Production,Staging,Archive,None" 
 
@@ -30,22 +34,67 @@ ALL_STAGES = "Production,Staging,Archive,None"
     default=False,
     show_default=True
 )
+@click.option("--rate-limits",
+    help=click_doc.rate_limits,
+    type=str,
+    required=False
+)
+@click.option("--cache-lookups",
+    help=click_doc.cache_lookups,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--incremental",
+    help=click_doc.incremental,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--dedup-artifacts",
+    help=click_doc.dedup_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
 
-def main(output_dir, notebook_formats, use_threads):
+def main(output_dir, notebook_formats, use_threads, rate_limits, cache_lookups, incremental, dedup_artifacts, reference_artifacts, encoding):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    rate_limiter.configure(rate_limits)
+    cached_client.configure(cache_lookups)
+    _encoding.configure(encoding)
     start_time = time.time()
+    blobs_dir = os.path.join(output_dir, BLOBS_DIR) if dedup_artifacts else None
     export_experiments(experiments="all",
         output_dir=os.path.join(output_dir,"experiments"),
         export_metadata_tags=True,
         notebook_formats=notebook_formats,
-        use_threads=use_threads)
+        use_threads=use_threads,
+        incremental=incremental,
+        blobs_dir=blobs_dir,
+        reference_artifacts=reference_artifacts)
     export_models(model_names="all", 
         output_dir=os.path.join(output_dir,"models"),
         notebook_formats=notebook_formats, 
         stages=ALL_STAGES, 
-        use_threads=use_threads)
+        use_threads=use_threads,
+        incremental=incremental,
+        blobs_dir=blobs_dir,
+        reference_artifacts=reference_artifacts)
     duration = round(time.time() - start_time, 1)
     write_export_manifest_file(output_dir, duration, ALL_STAGES, notebook_formats)
     print(f"Duraton for entire tracking server export: {duration} seconds")
@@ -4,7 +4,6 @@ Exports experiments to a directory.
 
 import os
 import time
-import json
 from concurrent.futures import ThreadPoolExecutor
 import click
 import mlflow
@@ -13,11 +12,16 @@ from mlflow_export_import import utils, click_doc
 from mlflow_export_import.bulk import bulk_utils
 from mlflow_export_import.experiment.export_experiment import ExperimentExporter
 from mlflow_export_import.common import filesystem as _filesystem
-
-client = mlflow.tracking.MlflowClient()
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import cached_client
+from mlflow_export_import.run import columnar_metrics
+from mlflow_export_import.common import instrumentation
+from mlflow_export_import.common import encoding as _encoding
+from mlflow_export_import.common.export_state import ExportState
+from mlflow_export_import.common.blob_store import BlobStore, BLOBS_DIR
 
 def _export_experiment(exp_id_or_name, output_dir, exporter, export_results, run_ids):
-    exp = mlflow_utils.get_experiment(client, exp_id_or_name)
+    exp = mlflow_utils.get_experiment(exporter.mlflow_client, exp_id_or_name)
     exp_output = os.path.join(output_dir, exp.experiment_id)
     ok_runs = -1; failed_runs = -1
     try:
@@ -38,14 +42,21 @@ def _export_experiment(exp_id_or_name, output_dir, exporter, export_results, run
         traceback.print_exc()
     return ok_runs, failed_runs
 
-def export_experiments(experiments, output_dir, export_metadata_tags, notebook_formats, use_threads=False):
+def export_experiments(experiments, output_dir, export_metadata_tags, notebook_formats, use_threads=False, search_partitions=1, metrics_format="json", incremental=False, blobs_dir=None, artifact_workers=8, reference_artifacts=False):
     """
     :param: experiments: Can be either:
       - List of experiment names 
       - List of experiment IDs
       - Dictionary with experiment ID key and list of run IDs 
       - String with comma-delimited experiment names or IDs.
+    :param: search_partitions: Number of start_time ranges to search an experiment's runs concurrently.
+    :param: metrics_format: Format of run metric histories - 'json' in run.json or 'npz' in a columnar metrics.npz file.
+    :param: incremental: Only export runs that are new or changed since the last export into output_dir.
+    :param: blobs_dir: Directory of a content-addressed blob store to deduplicate artifact files into. If None do not deduplicate.
+    :param: artifact_workers: Maximum number of artifact files of a run downloaded concurrently.
+    :param: reference_artifacts: Do not download artifacts. Record each run's artifact URI and the path and size of each artifact file in run.json.
     """
+    client = mlflow_utils.get_default_mlflow_client()
     start_time = time.time()
     max_workers = os.cpu_count() or 4 if use_threads else 1
 
@@ -70,7 +81,9 @@ def export_experiments(experiments, output_dir, export_metadata_tags, notebook_f
     failed_runs = 0
     export_results = []
     futures = []
-    exporter = ExperimentExporter(client, export_metadata_tags, utils.string_to_list(notebook_formats))
+    export_state = ExportState(output_dir) if incremental else None
+    blob_store = BlobStore(blobs_dir) if blobs_dir else None
+    exporter = ExperimentExporter(client, export_metadata_tags, utils.string_to_list(notebook_formats), search_partitions, metrics_format, export_state, blob_store, artifact_workers, reference_artifacts)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for exp_id_or_name in experiments:
             run_ids = experiments_dct.get(exp_id_or_name,None)
@@ -91,23 +104,30 @@ def export_experiments(experiments, output_dir, export_metadata_tags, notebook_f
             "mlflow_version": mlflow.__version__,
             "mlflow_tracking_uri": mlflow.get_tracking_uri(),
             "export_time": utils.get_now_nice(),
+            "encoding": _encoding.get_encoding(),
             "duration": duration,
             "experiments": len(experiments),
             "total_runs": total_runs,
             "ok_runs": ok_runs,
-            "failed_runs": failed_runs
+            "failed_runs": failed_runs,
+            "incremental": export_state.get_stats() if export_state else None,
+            "blob_store": blob_store.get_stats() if blob_store else None,
+            "rate_limiter": rate_limiter.get_rate_limiter().get_stats(),
+            "cache": cached_client.get_cache_stats(client),
+            "instrumentation": instrumentation.get_recorder().get_stats()
         },
         "experiments": export_results 
     }
     fs = _filesystem.get_filesystem(output_dir)
     fs.mkdirs(output_dir)
-    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
-        f.write(json.dumps(dct,indent=2)+"\n")
+    utils.write_json_file(fs, os.path.join(output_dir, "manifest.json"), dct)
 
     print(f"{len(experiments)} experiments exported")
     print(f"{ok_runs}/{total_runs} runs succesfully exported")
     if failed_runs > 0:
         print(f"{failed_runs}/{total_runs} runs failed")
+    if export_state:
+        print(f"{export_state.get_stats()['skipped_runs']}/{total_runs} runs skipped as unchanged")
     print(f"Duration for experiments export: {duration} seconds")
 
 
@@ -139,16 +159,78 @@ def export_experiments(experiments, output_dir, export_metadata_tags, notebook_f
     default=False,
     show_default=True
 )
+@click.option("--search-partitions",
+    help=click_doc.search_partitions,
+    type=int,
+    default=1,
+    show_default=True
+)
+@click.option("--metrics-format",
+    help=click_doc.metrics_format,
+    type=click.Choice(columnar_metrics.METRICS_FORMATS),
+    default="json",
+    show_default=True
+)
+@click.option("--rate-limits",
+    help=click_doc.rate_limits,
+    type=str,
+    required=False
+)
+@click.option("--cache-lookups",
+    help=click_doc.cache_lookups,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--incremental",
+    help=click_doc.incremental,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--dedup-artifacts",
+    help=click_doc.dedup_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--artifact-workers",
+    help=click_doc.artifact_workers,
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
 
-def main(experiments, output_dir, export_metadata_tags, notebook_formats, use_threads): 
+def main(experiments, output_dir, export_metadata_tags, notebook_formats, use_threads, search_partitions, metrics_format, rate_limits, cache_lookups, incremental, dedup_artifacts, artifact_workers, reference_artifacts, encoding): 
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    _encoding.configure(encoding)
+    rate_limiter.configure(rate_limits)
+    cached_client.configure(cache_lookups)
     export_experiments(experiments=experiments,
         output_dir=output_dir,
         export_metadata_tags=export_metadata_tags,
         notebook_formats=notebook_formats,
-        use_threads=use_threads)
+        use_threads=use_threads,
+        search_partitions=search_partitions,
+        metrics_format=metrics_format,
+        incremental=incremental,
+        blobs_dir=os.path.join(output_dir, BLOBS_DIR) if dedup_artifacts else None,
+        artifact_workers=artifact_workers,
+        reference_artifacts=reference_artifacts)
 
 if __name__ == "__main__":
     main()
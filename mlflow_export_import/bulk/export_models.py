@@ -3,7 +3,6 @@ Exports models and their versions' backing run along with the experiment that th
 """
 
 import os
-import json
 import time
 import click
 from concurrent.futures import ThreadPoolExecutor
@@ -15,10 +14,16 @@ from mlflow_export_import import utils, click_doc
 from mlflow_export_import.bulk import write_export_manifest_file
 from mlflow_export_import.bulk.model_utils import get_experiments_runs_of_models
 from mlflow_export_import.bulk import bulk_utils
+from mlflow_export_import.common import mlflow_utils
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import cached_client
+from mlflow_export_import.common import instrumentation
+from mlflow_export_import.common import encoding as _encoding
+from mlflow_export_import.common.export_state import ExportState
+from mlflow_export_import.common.blob_store import BLOBS_DIR
 
-client = mlflow.tracking.MlflowClient()
-
-def _export_models(model_names, output_dir, notebook_formats, stages, export_run=True, use_threads=False):
+def _export_models(model_names, output_dir, notebook_formats, stages, export_run=True, use_threads=False, incremental=False):
+    client = mlflow_utils.get_default_mlflow_client()
     max_workers = os.cpu_count() or 4 if use_threads else 1
     start_time = time.time()
     model_names = bulk_utils.get_model_names(model_names)
@@ -26,7 +31,8 @@ def _export_models(model_names, output_dir, notebook_formats, stages, export_run
     for model_name in model_names:
         print(f"  {model_name}")
 
-    exporter = ModelExporter(stages=stages, notebook_formats=utils.string_to_list(notebook_formats), export_run=export_run)
+    export_state = ExportState(output_dir) if incremental else None
+    exporter = ModelExporter(client, stages=stages, notebook_formats=utils.string_to_list(notebook_formats), export_run=export_run, export_state=export_state)
     futures = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for model_name in model_names:
@@ -38,6 +44,8 @@ def _export_models(model_names, output_dir, notebook_formats, stages, export_run
         result = future.result()
         if result[0]: ok_models.append(result[1])
         else: failed_models.append(result[1])
+    if export_state:
+        export_state.save()
 
     duration = round(time.time() - start_time, 1)
     manifest = {
@@ -45,10 +53,15 @@ def _export_models(model_names, output_dir, notebook_formats, stages, export_run
             "mlflow_version": mlflow.__version__,
             "mlflow_tracking_uri": mlflow.get_tracking_uri(),
             "export_time": utils.get_now_nice(),
+            "encoding": _encoding.get_encoding(),
             "total_models": len(model_names),
             "ok_models": len(ok_models),
             "failed_models": len(failed_models),
-            "duration": duration
+            "duration": duration,
+            "incremental": export_state.get_stats() if export_state else None,
+            "rate_limiter": rate_limiter.get_rate_limiter().get_stats(),
+            "cache": cached_client.get_cache_stats(client),
+            "instrumentation": instrumentation.get_recorder().get_stats()
         },
         "stages": stages,
         "notebook_formats": notebook_formats,
@@ -58,20 +71,19 @@ def _export_models(model_names, output_dir, notebook_formats, stages, export_run
 
     fs = _filesystem.get_filesystem(output_dir)
     fs.mkdirs(output_dir)
-    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
-        f.write(json.dumps(manifest, indent=2)+"\n")
+    utils.write_json_file(fs, os.path.join(output_dir, "manifest.json"), manifest)
 
     print(f"{len(model_names)} models exported")
     print(f"Duration for registered models export: {duration} seconds")
 
-def export_models(model_names, output_dir, notebook_formats, stages="", export_all_runs=False, use_threads=False):
+def export_models(model_names, output_dir, notebook_formats, stages="", export_all_runs=False, use_threads=False, incremental=False, blobs_dir=None, reference_artifacts=False):
     exps_and_runs = get_experiments_runs_of_models(model_names)
     exp_ids = exps_and_runs.keys()
     start_time = time.time()
     out_dir = os.path.join(output_dir,"experiments")
     exps_to_export = exp_ids if export_all_runs else exps_and_runs
-    export_experiments.export_experiments(exps_to_export, out_dir, True, notebook_formats, use_threads)
-    _export_models(model_names, os.path.join(output_dir,"models"), notebook_formats, stages, export_run=False, use_threads=use_threads)
+    export_experiments.export_experiments(exps_to_export, out_dir, True, notebook_formats, use_threads, incremental=incremental, blobs_dir=blobs_dir, reference_artifacts=reference_artifacts)
+    _export_models(model_names, os.path.join(output_dir,"models"), notebook_formats, stages, export_run=False, use_threads=use_threads, incremental=incremental)
     duration = round(time.time() - start_time, 1)
     write_export_manifest_file(output_dir, duration, stages, notebook_formats)
     print(f"Duration for total registered models and versions' runs export: {duration} seconds")
@@ -110,17 +122,58 @@ def export_models(model_names, output_dir, notebook_formats, stages="", export_a
     default=False,
     show_default=True
 )
+@click.option("--rate-limits",
+    help=click_doc.rate_limits,
+    type=str,
+    required=False
+)
+@click.option("--cache-lookups",
+    help=click_doc.cache_lookups,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--incremental",
+    help=click_doc.incremental,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--dedup-artifacts",
+    help=click_doc.dedup_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
 
-def main(models, output_dir, stages, notebook_formats, export_all_runs, use_threads):
+def main(models, output_dir, stages, notebook_formats, export_all_runs, use_threads, rate_limits, cache_lookups, incremental, dedup_artifacts, reference_artifacts, encoding):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    _encoding.configure(encoding)
+    rate_limiter.configure(rate_limits)
+    cached_client.configure(cache_lookups)
     export_models(models, 
         output_dir=output_dir, 
         notebook_formats=notebook_formats, 
         stages=stages, 
         export_all_runs=export_all_runs, 
-        use_threads=use_threads)
+        use_threads=use_threads,
+        incremental=incremental,
+        blobs_dir=os.path.join(output_dir, BLOBS_DIR) if dedup_artifacts else None,
+        reference_artifacts=reference_artifacts)
 
 if __name__ == "__main__":
     main()
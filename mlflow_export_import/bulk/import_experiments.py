@@ -3,11 +3,13 @@ Import a list of experiment from a directory.
 """
 
 import os
-import json
 import click
 from concurrent.futures import ThreadPoolExecutor
-from mlflow_export_import import click_doc
+from mlflow_export_import import utils, click_doc
 from mlflow_export_import.experiment.import_experiment import ExperimentImporter
+from mlflow_export_import.run import imported_run_index
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import instrumentation
 
 def _import_experiment(importer, exp_name, exp_input_dir):
     try:
@@ -16,22 +18,26 @@ def _import_experiment(importer, exp_name, exp_input_dir):
         import traceback
         traceback.print_exc()
 
-def import_experiments(input_dir, experiment_name_suffix, use_src_user_id, import_metadata_tags, use_threads): 
+def import_experiments(input_dir, experiment_name_suffix, use_src_user_id, import_metadata_tags, use_threads, artifact_workers=8, run_workers=4, existing_runs="duplicate"): 
     path = os.path.join(input_dir,"manifest.json")
-    with open(path, "r") as f:
-        dct = json.loads(f.read())
+    dct = utils.read_json_file(path)
     for exp in dct["experiments"]:
         print("  ",exp)
 
     importer = ExperimentImporter(None,
         use_src_user_id=use_src_user_id,
-        import_metadata_tags=import_metadata_tags)
+        import_metadata_tags=import_metadata_tags,
+        artifact_workers=artifact_workers,
+        run_workers=run_workers,
+        existing_runs=existing_runs)
     max_workers = os.cpu_count() or 4 if use_threads else 1
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for exp in dct["experiments"]:
             exp_input_dir = os.path.join(input_dir,exp["id"])
             exp_name = exp["name"] + experiment_name_suffix if experiment_name_suffix else exp["name"]
             executor.submit(_import_experiment, importer, exp_name, exp_input_dir)
+    print("Rate limiter:", rate_limiter.get_rate_limiter().get_stats())
+    print("Instrumentation:", instrumentation.get_recorder().get_stats())
 
 @click.command()
 @click.option("--input-dir", 
@@ -61,12 +67,36 @@ def import_experiments(input_dir, experiment_name_suffix, use_src_user_id, impor
     default=False,
     show_default=True
 )
+@click.option("--rate-limits",
+    help=click_doc.rate_limits,
+    type=str,
+    required=False
+)
+@click.option("--artifact-workers",
+    help=click_doc.import_artifact_workers,
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--run-workers",
+    help=click_doc.run_workers,
+    type=int,
+    default=4,
+    show_default=True
+)
+@click.option("--existing-runs",
+    help=click_doc.existing_runs,
+    type=click.Choice(imported_run_index.EXISTING_RUNS_MODES),
+    default="duplicate",
+    show_default=True
+)
 
-def main(input_dir, experiment_name_suffix, use_src_user_id, import_metadata_tags, use_threads): 
+def main(input_dir, experiment_name_suffix, use_src_user_id, import_metadata_tags, use_threads, rate_limits, artifact_workers, run_workers, existing_runs): 
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
-    import_experiments(input_dir, experiment_name_suffix, use_src_user_id, import_metadata_tags, use_threads)
+    rate_limiter.configure(rate_limits)
+    import_experiments(input_dir, experiment_name_suffix, use_src_user_id, import_metadata_tags, use_threads, artifact_workers, run_workers, existing_runs)
 
 if __name__ == "__main__":
     main()
@@ -12,8 +12,8 @@ from mlflow_export_import import utils, click_doc
 from mlflow_export_import.common import filesystem as _filesystem
 from mlflow_export_import.experiment.import_experiment import ExperimentImporter
 from mlflow_export_import.model.import_model import AllModelImporter
-
-print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import instrumentation
 
 def _remap(run_info_map):
     res = {}
@@ -50,14 +50,14 @@ def _import_experiments(input_dir, use_src_user_id, import_metadata_tags):
 
     return run_info_map, { "experiments": len(exps), "exceptions": exceptions, "duration": duration }
 
-def _import_models(input_dir, run_info_map, delete_model, verbose, use_threads):
+def _import_models(input_dir, run_info_map, delete_model, verbose, use_threads, reference_model_sources=False):
     max_workers = os.cpu_count() or 4 if use_threads else 1
     start_time = time.time()
     models_dir = os.path.join(input_dir, "models")
     manifest_path = os.path.join(models_dir,"manifest.json")
     manifest = utils.read_json_file(manifest_path)
     models = manifest["ok_models"]
-    importer = AllModelImporter(run_info_map)
+    importer = AllModelImporter(run_info_map, reference_sources=reference_model_sources)
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for model in models:
@@ -67,13 +67,15 @@ def _import_models(input_dir, run_info_map, delete_model, verbose, use_threads):
     duration = round(time.time() - start_time, 1)
     return { "models": len(models), "duration": duration }
 
-def import_all(input_dir, delete_model, use_src_user_id, import_metadata_tags, verbose, use_threads):
+def import_all(input_dir, delete_model, use_src_user_id, import_metadata_tags, verbose, use_threads, reference_model_sources=False):
     start_time = time.time()
     exp_res = _import_experiments(input_dir, use_src_user_id, import_metadata_tags)
     run_info_map = _remap(exp_res[0])
-    model_res = _import_models(input_dir, run_info_map, delete_model, verbose, use_threads)
+    model_res = _import_models(input_dir, run_info_map, delete_model, verbose, use_threads, reference_model_sources)
     duration = round(time.time() - start_time, 1)
-    dct = { "duration": duration, "experiment_import": exp_res[1], "model_import": model_res }
+    dct = { "duration": duration, "experiment_import": exp_res[1], "model_import": model_res,
+        "rate_limiter": rate_limiter.get_rate_limiter().get_stats(),
+        "instrumentation": instrumentation.get_recorder().get_stats() }
     fs = _filesystem.get_filesystem(".")
     utils.write_json_file(fs, "import_report.json", dct)
     print("\nImport report:")
@@ -116,17 +118,31 @@ def import_all(input_dir, delete_model, use_src_user_id, import_metadata_tags, v
     default=False,
     show_default=True
 )
+@click.option("--rate-limits",
+    help=click_doc.rate_limits,
+    type=str,
+    required=False
+)
+@click.option("--reference-model-sources",
+    help=click_doc.reference_model_sources,
+    type=bool,
+    default=False,
+    show_default=True
+)
 
-def main(input_dir, delete_model, use_src_user_id, import_metadata_tags, verbose, use_threads):
+def main(input_dir, delete_model, use_src_user_id, import_metadata_tags, verbose, use_threads, rate_limits, reference_model_sources):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+    rate_limiter.configure(rate_limits)
     import_all(input_dir, 
         delete_model=delete_model, 
         use_src_user_id=use_src_user_id, 
         import_metadata_tags=import_metadata_tags, 
         verbose=verbose, 
-        use_threads=use_threads)
+        use_threads=use_threads,
+        reference_model_sources=reference_model_sources)
 
 if __name__ == "__main__":
     main()
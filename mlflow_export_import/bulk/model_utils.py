@@ -1,11 +1,11 @@
 
 import mlflow
 from mlflow_export_import.bulk import bulk_utils
-
-client = mlflow.tracking.MlflowClient()
+from mlflow_export_import.common import mlflow_utils
 
 def get_experiments_runs_of_models(model_names, show_experiments=False, show_runs=False):
     """ Get experiments and runs to to export. """
+    client = mlflow_utils.get_default_mlflow_client()
     model_names = bulk_utils.get_model_names(model_names)
     print("Models:")
     for model_name in model_names:
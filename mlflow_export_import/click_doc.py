@@ -14,3 +14,29 @@ model_stages = "Stages to export (comma seperated). Default is all stages. Value
 delete_model = "First delete the model if it exists and all its versions."
 
 use_threads = "Process the export/import in parallel using threads."
+
+search_partitions = "Number of start_time ranges to search an experiment's runs concurrently. Speeds up listing of very large experiments."
+
+cache_lookups = "Cache experiment and registered model lookups by ID or name for 5 minutes. Runs are never cached. Only use it if the source experiments and models do not change during the export."
+
+rate_limits = "Maximum requests per second per endpoint class for all calls to the tracking server. Classes are read, search, write, artifacts and default (any unlisted class). Example: 'read=20,write=10,default=10'. Default is no limit."
+
+metrics_format = "Format of run metric histories. 'json' writes them in run.json. 'npz' writes them to a columnar NumPy metrics.npz file per run which is much smaller and faster to import for runs with many steps."
+
+encoding = "Encoding of exported JSON files (run.json, manifests and model.json). 'json' is indented, 'compact' has no whitespace, 'gzip' and 'zstd' are compact and compressed. 'zstd' requires the zstandard package. Importers detect the encoding automatically."
+
+incremental = "Only export runs and registered models that are new or changed since the last export into the same output directory. Fingerprints of exported entities are kept in export_state.json in the output directory. Artifacts logged to a run after it ended are not detected."
+
+dedup_artifacts = "Store each distinct run artifact file once in a content-addressed blob store ('blobs' directory of the output directory) keyed by SHA-256. Each run's artifact directory is replaced by an artifacts.json that references the blobs. Importers rehydrate the artifacts automatically."
+
+artifact_workers = "Maximum number of artifact files of a run downloaded concurrently. Files already downloaded with the expected size are skipped so an interrupted export resumes where it stopped."
+
+import_artifact_workers = "Maximum number of artifact files of a run uploaded concurrently. Files that already exist at the destination with the same size are skipped so an interrupted import resumes where it stopped."
+
+run_workers = "Maximum number of runs of an experiment in each stage of the import. Run creation, data logging and artifact upload of different runs overlap in separate pools of this size. If 1 runs are imported one at a time."
+
+existing_runs = "What to do with source runs already imported into the destination experiment. 'duplicate' imports them again. 'resume' and 'replace' skip runs that were imported and FINISHED. A partially imported run is deleted and imported as a new run with 'replace'. With 'resume' the artifacts of a run whose params, metrics and tags were all logged are imported again in place and other partially imported runs are replaced. Runs are recognized by a source run tag added by these two modes or by the metadata run ID tag of --import-metadata-tags."
+
+reference_artifacts = "Do not download run artifacts. Record each run's artifact URI and the path and size of each artifact file in run.json. The importer copies the artifacts directly from the source artifact store, which must be reachable from the importing machine. Files are copied inside the store if both artifact stores are S3, both are GCS or both are the same Azure storage account. Otherwise each file is downloaded and uploaded by the importer."
+
+reference_model_sources = "Create model versions with their source model URI in the source artifact store instead of the imported run's copy of the model. For exports made with --reference-artifacts from an artifact store shared by source and destination."
@@ -0,0 +1,275 @@
+"""
+Per-file transfer of run artifacts with concurrency, progress and resume.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import posixpath
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from mlflow.store.artifact.artifact_repository_registry import get_artifact_repository
+from mlflow.store.artifact.local_artifact_repo import LocalArtifactRepository
+from mlflow.store.artifact.s3_artifact_repo import S3ArtifactRepository
+from mlflow.store.artifact.gcs_artifact_repo import GCSArtifactRepository
+from mlflow.store.artifact.azure_blob_artifact_repo import AzureBlobArtifactRepository
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common.filesystem import mk_local_path
+
+PROGRESS_INTERVAL = 100
+AZURE_COPY_POLL_INTERVAL = 1.0
+
+
+class ArtifactDownloader():
+    """
+    Lists a run's artifact tree and downloads its files concurrently.
+    A file that already exists locally with the size listed by the artifact store is skipped
+    so an interrupted export resumes where it stopped. MLflow does not expose artifact checksums
+    so the size is the only check. A file whose size is not listed is always downloaded.
+    """
+    def __init__(self, mlflow_client, max_workers=8):
+        """
+        :param mlflow_client: MLflow client.
+        :param max_workers: Maximum number of concurrent artifact listings and file downloads.
+        """
+        self.mlflow_client = mlflow_client
+        self.max_workers = max(1, max_workers)
+
+    def download(self, run_id, dst_dir):
+        """
+        Downloads all artifacts of a run.
+        :param run_id: Run ID.
+        :param dst_dir: Local destination directory. Artifact paths are relative to it.
+        :return: Dict of download stats - files, skipped files, downloaded bytes and duration.
+        """
+        dst_dir = mk_local_path(dst_dir)
+        start_time = time.time()
+        stats = { "files": 0, "skipped": 0, "bytes": 0 }
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            files = self._list_files(executor, run_id)
+            stats["files"] = len(files)
+            futures = [ executor.submit(contextvars.copy_context().run, self._download_file, run_id, file, dst_dir) for file in files ]
+            for j,future in enumerate(futures):
+                size = future.result()
+                if size is None:
+                    stats["skipped"] += 1
+                else:
+                    stats["bytes"] += size
+                if (j+1) % PROGRESS_INTERVAL == 0:
+                    print(f"Downloaded {j+1}/{len(files)} artifact files of run {run_id}")
+        stats["duration"] = round(time.time() - start_time, 1)
+        if stats["files"] > 0:
+            print(f"Downloaded {stats['files']-stats['skipped']}/{stats['files']} artifact files ({stats['bytes']} bytes) of run {run_id}. Skipped {stats['skipped']} existing files.")
+        return stats
+
+    def list_files(self, run_id):
+        """ Returns the FileInfo of each artifact file of a run. """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return self._list_files(executor, run_id)
+
+    def _list_files(self, executor, run_id):
+        return _list_files(self.mlflow_client, executor, run_id)
+
+    def _download_file(self, run_id, file, dst_dir):
+        """ Returns the number of downloaded bytes or None if the file was skipped. """
+        local_path = os.path.join(dst_dir, *file.path.split("/"))
+        if file.file_size is not None and os.path.exists(local_path) and os.path.getsize(local_path) == file.file_size:
+            return None
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        self.mlflow_client.download_artifacts(run_id, file.path, dst_path=dst_dir)
+        return os.path.getsize(local_path)
+
+
+class ArtifactUploader():
+    """
+    Walks a local artifact tree and uploads its files concurrently to a run.
+    A file that already exists at the destination with the same size is skipped so an interrupted import
+    resumes where it stopped. The destination tree is listed once before the upload.
+    """
+    def __init__(self, mlflow_client, max_workers=8):
+        """
+        :param mlflow_client: MLflow client.
+        :param max_workers: Maximum number of artifact listings and file uploads running concurrently.
+        """
+        self.mlflow_client = mlflow_client
+        self.max_workers = max(1, max_workers)
+
+    def upload(self, run_id, src_dir):
+        """
+        Uploads all files of a local directory to a run's artifact root.
+        :param run_id: Run ID.
+        :param src_dir: Local source directory. Artifact paths are relative to it. Symbolic links to files are followed.
+        :return: Dict of upload stats - files, skipped files, uploaded bytes, duration and bytes per second.
+        """
+        src_dir = mk_local_path(src_dir)
+        start_time = time.time()
+        files = _walk_files(src_dir)
+        stats = { "files": len(files), "skipped": 0, "bytes": 0 }
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            existing = { info.path: info.file_size for info in _list_files(self.mlflow_client, executor, run_id) }
+            futures = [ executor.submit(contextvars.copy_context().run, self._upload_file, run_id, path, local_path, existing.get(path))
+                for path, local_path in files ]
+            for j,future in enumerate(futures):
+                size = future.result()
+                if size is None:
+                    stats["skipped"] += 1
+                else:
+                    stats["bytes"] += size
+                if (j+1) % PROGRESS_INTERVAL == 0:
+                    print(f"Uploaded {j+1}/{len(files)} artifact files of run {run_id}")
+        duration = time.time() - start_time
+        stats["duration"] = round(duration, 1)
+        stats["bytes_per_second"] = round(stats["bytes"] / duration) if duration > 0 else 0
+        if stats["files"] > 0:
+            print(f"Uploaded {stats['files']-stats['skipped']}/{stats['files']} artifact files ({stats['bytes']} bytes, {stats['bytes_per_second']} bytes/sec) to run {run_id}. Skipped {stats['skipped']} existing files.")
+        return stats
+
+    def _upload_file(self, run_id, path, local_path, existing_size):
+        """ Returns the number of uploaded bytes or None if the file was skipped. """
+        size = os.path.getsize(local_path)
+        if existing_size is not None and existing_size == size:
+            return None
+        self.mlflow_client.log_artifact(run_id, local_path, posixpath.dirname(path) or None)
+        return size
+
+
+class ArtifactCopier():
+    """
+    Copies the artifacts of a reference-only export from the source artifact store to a destination run's
+    artifact location without going through the export directory.
+    If both locations are local paths, such as a shared volume or a local stand-in for an object store,
+    files are copied on the file system. If both are in the same kind of object store, files are copied
+    inside the store - S3 copy, GCS rewrite or, within one Azure storage account, a blob copy from URL.
+    Otherwise, such as from S3 to Azure, each file is downloaded to a temporary file and uploaded.
+    The copied size of each file is checked against the size recorded at export.
+    The artifact repositories are used directly rather than through the MLflow client so each of their
+    calls acquires a token of the 'artifacts' class from the shared rate limiter.
+    """
+    def __init__(self, max_workers=8):
+        """
+        :param max_workers: Maximum number of files copied concurrently.
+        """
+        self.max_workers = max(1, max_workers)
+
+    def copy(self, src_artifact_uri, files, dst_artifact_uri):
+        """
+        :param src_artifact_uri: Artifact URI of the source run.
+        :param files: List of { path, size } dicts of the files to copy.
+        :param dst_artifact_uri: Artifact URI of the destination run.
+        :return: Dict of copy stats - files, bytes and duration.
+        """
+        start_time = time.time()
+        src_repo = get_artifact_repository(src_artifact_uri)
+        dst_repo = get_artifact_repository(dst_artifact_uri)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [ executor.submit(contextvars.copy_context().run, self._copy_file, src_repo, dst_repo, file) for file in files ]
+            num_bytes = sum(future.result() for future in futures)
+        stats = { "files": len(files), "bytes": num_bytes, "duration": round(time.time() - start_time, 1) }
+        print(f"Copied {stats['files']} artifact files ({stats['bytes']} bytes) from '{src_artifact_uri}' to '{dst_artifact_uri}'")
+        return stats
+
+    def _copy_file(self, src_repo, dst_repo, file):
+        path = file["path"]
+        limiter = rate_limiter.get_rate_limiter()
+        if isinstance(src_repo, LocalArtifactRepository) and isinstance(dst_repo, LocalArtifactRepository):
+            limiter.acquire("artifacts")
+            dst_path = os.path.join(dst_repo.artifact_dir, *path.split("/"))
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            shutil.copyfile(os.path.join(src_repo.artifact_dir, *path.split("/")), dst_path)
+            return _check_size(dst_path, file)
+        copy_in_store = _get_copy_in_store(src_repo, dst_repo)
+        if copy_in_store:
+            limiter.acquire("artifacts")
+            return _check_copied_size(copy_in_store(src_repo, dst_repo, path), file)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            limiter.acquire("artifacts")
+            local_path = src_repo.download_artifacts(path, tmp_dir)
+            size = _check_size(local_path, file)
+            limiter.acquire("artifacts")
+            dst_repo.log_artifact(local_path, posixpath.dirname(path) or None)
+        return size
+
+
+def _list_files(mlflow_client, executor, run_id):
+    """ Lists the artifact tree breadth first. The directories of each level are listed concurrently. """
+    files = []
+    dirs = [ "" ]
+    while dirs:
+        listings = executor.map(lambda path: contextvars.copy_context().run(mlflow_client.list_artifacts, run_id, path), dirs)
+        dirs = []
+        for listing in listings:
+            for info in listing:
+                if info.is_dir:
+                    dirs.append(info.path)
+                else:
+                    files.append(info)
+    return files
+
+def _walk_files(src_dir):
+    """ Returns the artifact path and local path of each file of a local directory. """
+    files = []
+    for root, dirs, names in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(names):
+            local_path = os.path.join(root, name)
+            files.append((os.path.relpath(local_path, src_dir).replace(os.sep, "/"), local_path))
+    return files
+
+def _check_size(local_path, file):
+    return _check_copied_size(os.path.getsize(local_path), file)
+
+def _check_copied_size(size, file):
+    if file.get("size") is not None and size != file["size"]:
+        raise MlflowExportImportException(f"Artifact '{file['path']}' has {size} bytes but {file['size']} bytes were exported")
+    return size
+
+def _get_copy_in_store(src_repo, dst_repo):
+    """ Returns the function that copies a file inside the object store of both repositories or None. """
+    if isinstance(src_repo, S3ArtifactRepository) and isinstance(dst_repo, S3ArtifactRepository):
+        return _copy_s3
+    if isinstance(src_repo, GCSArtifactRepository) and isinstance(dst_repo, GCSArtifactRepository):
+        return _copy_gcs
+    if isinstance(src_repo, AzureBlobArtifactRepository) and isinstance(dst_repo, AzureBlobArtifactRepository):
+        src_account = AzureBlobArtifactRepository.parse_wasbs_uri(src_repo.artifact_uri)[1]
+        dst_account = AzureBlobArtifactRepository.parse_wasbs_uri(dst_repo.artifact_uri)[1]
+        if src_account == dst_account: # a copy from another account needs a SAS token on the source URL
+            return _copy_azure
+    return None
+
+def _copy_s3(src_repo, dst_repo, path):
+    """ Copies with the managed S3 copy which uses multipart copy for large objects. Returns the copied size. """
+    src_bucket, src_key = S3ArtifactRepository.parse_s3_uri(src_repo.artifact_uri)
+    dst_bucket, dst_key = S3ArtifactRepository.parse_s3_uri(dst_repo.artifact_uri)
+    dst_key = posixpath.join(dst_key, path)
+    s3_client = dst_repo._get_s3_client()
+    s3_client.copy({ "Bucket": src_bucket, "Key": posixpath.join(src_key, path) }, dst_bucket, dst_key)
+    return s3_client.head_object(Bucket=dst_bucket, Key=dst_key)["ContentLength"]
+
+def _copy_gcs(src_repo, dst_repo, path):
+    """ Copies with GCS rewrite calls which large objects or a change of location need several of. Returns the copied size. """
+    src_bucket, src_key = GCSArtifactRepository.parse_gcs_uri(src_repo.artifact_uri)
+    dst_bucket, dst_key = GCSArtifactRepository.parse_gcs_uri(dst_repo.artifact_uri)
+    src_blob = src_repo._get_bucket(src_bucket).blob(posixpath.join(src_key, path))
+    dst_blob = dst_repo._get_bucket(dst_bucket).blob(posixpath.join(dst_key, path))
+    token, _, _ = dst_blob.rewrite(src_blob)
+    while token is not None:
+        token, _, _ = dst_blob.rewrite(src_blob, token=token)
+    dst_blob.reload()
+    return dst_blob.size
+
+def _copy_azure(src_repo, dst_repo, path):
+    """ Starts an Azure blob copy from URL and waits until it completes. Returns the copied size. """
+    src_container, _, src_key, _ = AzureBlobArtifactRepository.parse_wasbs_uri(src_repo.artifact_uri)
+    dst_container, _, dst_key, _ = AzureBlobArtifactRepository.parse_wasbs_uri(dst_repo.artifact_uri)
+    src_blob = src_repo.client.get_blob_client(src_container, posixpath.join(src_key, path))
+    dst_blob = dst_repo.client.get_blob_client(dst_container, posixpath.join(dst_key, path))
+    dst_blob.start_copy_from_url(src_blob.url)
+    props = dst_blob.get_blob_properties()
+    while props.copy.status == "pending":
+        time.sleep(AZURE_COPY_POLL_INTERVAL)
+        props = dst_blob.get_blob_properties()
+    if props.copy.status != "success":
+        raise MlflowExportImportException(f"Copy of artifact '{path}' to '{dst_repo.artifact_uri}' ended with status '{props.copy.status}'")
+    return props.size
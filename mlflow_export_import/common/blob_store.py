@@ -0,0 +1,120 @@
+"""
+Content-addressed store of run artifact files shared by all runs of an export.
+Each distinct file content is stored once as <blobs_dir>/<first two hex digits>/<SHA-256>.
+A run's artifact tree is replaced by artifacts.json in the run directory which lists the relative path,
+size and SHA-256 of each file and the blob store directory relative to the run directory.
+Importers rehydrate the artifact tree from the blobs.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from mlflow_export_import.common.filesystem import mk_local_path
+from mlflow_export_import.common import encoding
+
+BLOBS_DIR = "blobs"
+ARTIFACTS_MANIFEST = "artifacts.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore():
+    """ Thread-safe content-addressed blob store. Runs exported concurrently may share one store. """
+    def __init__(self, blobs_dir):
+        """
+        :param blobs_dir: Directory of the blobs. Usually 'blobs' in the export root directory.
+        """
+        self.blobs_dir = mk_local_path(blobs_dir)
+        self.lock = threading.Lock()
+        self.stats = { "files": 0, "blobs": 0, "bytes": 0, "deduplicated_bytes": 0 }
+
+    def get_blob_path(self, sha256):
+        return os.path.join(self.blobs_dir, sha256[:2], sha256)
+
+    def put_file(self, path):
+        """
+        Moves a file into the store. If its content is already stored the file is just deleted.
+        :return: SHA-256 and size of the file.
+        """
+        sha256 = sha256_file(path)
+        size = os.path.getsize(path)
+        blob_path = self.get_blob_path(sha256)
+        is_new = not os.path.exists(blob_path)
+        if is_new:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            shutil.move(path, blob_path)
+        else:
+            os.remove(path)
+        with self.lock:
+            self.stats["files"] += 1
+            self.stats["bytes"] += size
+            if is_new:
+                self.stats["blobs"] += 1
+            else:
+                self.stats["deduplicated_bytes"] += size
+        return sha256, size
+
+    def dedup_artifacts(self, run_dir):
+        """ Moves the files of the run's 'artifacts' directory into the store and replaces the directory with artifacts.json. """
+        run_dir = mk_local_path(run_dir)
+        artifacts_dir = os.path.join(run_dir, "artifacts")
+        if not os.path.exists(artifacts_dir):
+            return
+        files = []
+        for root, dirs, names in os.walk(artifacts_dir):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                sha256, size = self.put_file(path)
+                files.append({ "path": os.path.relpath(path, artifacts_dir).replace(os.sep, "/"), "size": size, "sha256": sha256 })
+        manifest = {
+            "blobs_dir": os.path.relpath(self.blobs_dir, run_dir),
+            "files": files
+        }
+        with encoding.open_text(os.path.join(run_dir, ARTIFACTS_MANIFEST), "w") as f:
+            f.write(encoding.dumps(manifest))
+        shutil.rmtree(artifacts_dir)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+def sha256_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+@contextmanager
+def artifacts_dir(run_dir):
+    """
+    Yields the local artifacts directory of an exported run or None if the run has no artifacts.
+    For a deduplicated export the tree is rehydrated into a temporary directory with hard links to the blobs
+    (or copies if the blobs are on another file system) so its files must not be modified in place.
+    """
+    run_dir = mk_local_path(run_dir)
+    path = os.path.join(run_dir, "artifacts")
+    manifest_path = os.path.join(run_dir, ARTIFACTS_MANIFEST)
+    if os.path.exists(path) or not os.path.exists(manifest_path):
+        yield path if os.path.exists(path) else None
+        return
+    with encoding.open_text(manifest_path, "r") as f:
+        manifest = json.loads(f.read())
+    blobs_dir = os.path.normpath(os.path.join(run_dir, manifest["blobs_dir"]))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for file in manifest["files"]:
+            dst_path = os.path.join(tmp_dir, *file["path"].split("/"))
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            _link_or_copy(os.path.join(blobs_dir, file["sha256"][:2], file["sha256"]), dst_path)
+        yield tmp_dir
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
@@ -0,0 +1,150 @@
+"""
+Opt-in read-through cache for MLflow client lookups of experiments and registered models by ID or name.
+Runs are never cached since their status, end time and tags change while they run and outside this client.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from mlflow_export_import.common.client_proxy import ClientProxy
+
+# Cached read methods and the group of objects they read
+CACHED_METHODS = {
+    "get_experiment": "experiment",
+    "get_experiment_by_name": "experiment",
+    "get_registered_model": "model"
+}
+
+# Write methods that invalidate a group
+_INVALIDATING_METHODS = {
+    "create_experiment": "experiment",
+    "rename_experiment": "experiment",
+    "delete_experiment": "experiment",
+    "restore_experiment": "experiment",
+    "set_experiment_tag": "experiment",
+    "create_registered_model": "model",
+    "rename_registered_model": "model",
+    "update_registered_model": "model",
+    "delete_registered_model": "model",
+    "set_registered_model_tag": "model",
+    "delete_registered_model_tag": "model",
+    "create_model_version": "model",
+    "update_model_version": "model",
+    "delete_model_version": "model",
+    "transition_model_version_stage": "model",
+    "set_model_version_tag": "model",
+    "delete_model_version_tag": "model"
+}
+
+_enabled = False
+
+def configure(enabled):
+    """ Enables or disables the cache for the clients created afterwards by mlflow_utils.create_mlflow_client(). """
+    global _enabled
+    _enabled = bool(enabled)
+
+def is_enabled():
+    return _enabled
+
+def get_cache_stats(client):
+    """ Returns the cache stats of a client or None if it is not cached. """
+    return client.get_cache_stats() if isinstance(client, CachedMlflowClient) else None
+
+
+class LruTtlCache():
+    """ Thread-safe LRU cache whose entries expire after a time to live. """
+    def __init__(self, max_size=10000, ttl=300):
+        """
+        :param max_size: Maximum number of entries.
+        :param ttl: Seconds an entry stays valid.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """ Returns a tuple of (found, value). """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def remove_if(self, predicate):
+        with self.lock:
+            for key in [ k for k in self.entries if predicate(k) ]:
+                del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class CachedMlflowClient(ClientProxy):
+    """
+    MLflow client wrapper that memoizes the reads in CACHED_METHODS and counts hits and misses.
+    Writes made through this client invalidate the cached objects they can change.
+    Writes made elsewhere, such as by fluent mlflow calls or other processes, are only picked up once the entry's
+    time to live expires. So only use it when the experiments and models are not changed during the run.
+    """
+    def __init__(self, client, max_size=10000, ttl=300):
+        """
+        :param client: MLflow client to wrap.
+        :param max_size: Maximum number of cached objects.
+        :param ttl: Seconds a cached object stays valid.
+        """
+        super().__init__(client)
+        self._cache = LruTtlCache(max_size, ttl)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _invoke(self, name, method, args, kwargs):
+        group = CACHED_METHODS.get(name)
+        if group is None:
+            self._invalidate(name)
+            return method(*args, **kwargs)
+        key = (group, name, args, tuple(sorted(kwargs.items())))
+        try:
+            found, value = self._cache.get(key)
+        except TypeError: # unhashable arguments
+            return method(*args, **kwargs)
+        self._count(name, found)
+        if found:
+            return value
+        value = method(*args, **kwargs)
+        if value is not None:
+            self._cache.put(key, value)
+        return value
+
+    def _invalidate(self, name):
+        group = _INVALIDATING_METHODS.get(name)
+        if group:
+            self._cache.remove_if(lambda key: key[0] == group)
+
+    def _count(self, name, hit):
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, { "hits": 0, "misses": 0 })
+            stats["hits" if hit else "misses"] += 1
+
+    def get_cache_stats(self):
+        """ Returns the hit and miss counters per cached method. """
+        with self._stats_lock:
+            methods = { k: dict(v) for k,v in sorted(self._stats.items()) }
+        return {
+            "size": len(self._cache),
+            "hits": sum(v["hits"] for v in methods.values()),
+            "misses": sum(v["misses"] for v in methods.values()),
+            "methods": methods
+        }
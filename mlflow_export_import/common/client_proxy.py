@@ -0,0 +1,30 @@
+"""
+Base class for wrappers around an MLflow client that intercept its method calls.
+"""
+
+class ClientProxy():
+    """
+    Delegates attribute access to the wrapped client. Public method calls go through _invoke() which subclasses override.
+    Proxies can be stacked - each one wraps the next.
+    """
+    def __init__(self, client):
+        self._client = client
+
+    def _invoke(self, name, method, args, kwargs):
+        return method(*args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        def call(*args, **kwargs):
+            return self._invoke(name, attr, args, kwargs)
+        return call
+
+    def unwrap(self):
+        """ Returns the innermost client. """
+        client = self._client
+        return client.unwrap() if isinstance(client, ClientProxy) else client
+
+    def __repr__(self):
+        return repr(self._client)
@@ -8,8 +8,13 @@ import mlflow
 INDENT = "  "
 MAX_LEVEL = 1
 TS_FORMAT = "%Y-%m-%d_%H:%M:%S"
-client = mlflow.tracking.MlflowClient()
-print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+_client = None
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = mlflow.tracking.MlflowClient()
+    return _client
 
 def dump_run(run, max_level=1, indent=""):
     dump_run_info(run.info,indent)
@@ -28,12 +33,12 @@ def dump_run(run, max_level=1, indent=""):
     return run, num_bytes, num_artifacts
         
 def dump_run_id(run_id, max_level=1, indent=""):
-    run = client.get_run(run_id)
+    run = _get_client().get_run(run_id)
     return dump_run(run,max_level,indent)
 
 def dump_run_info(info, indent=""):
     print("{}RunInfo:".format(indent))
-    exp = client.get_experiment(info.experiment_id)
+    exp = _get_client().get_experiment(info.experiment_id)
     if exp is None:
         print(f"ERROR: Cannot find experiment ID '{info.experiment_id}'")
         return 
@@ -59,7 +64,7 @@ def _dump_time(info, k, indent=""):
 def dump_artifacts(run_id, path, level, max_level, indent):
     if level+1 > max_level: 
         return 0,0
-    artifacts = client.list_artifacts(run_id,path)
+    artifacts = _get_client().list_artifacts(run_id,path)
     num_bytes, num_artifacts = (0,0)
     for j,art in enumerate(artifacts):
         print("{}Artifact {}/{} - level {}:".format(indent,j+1,len(artifacts),level))
@@ -80,6 +85,7 @@ if __name__ == "__main__":
     parser.add_argument("--run_id", dest="run_id", help="Run ID", required=True)
     parser.add_argument("--artifact_max_level", dest="artifact_max_level", help="Number of artifact levels to recurse", required=False, default=1, type=int)
     args = parser.parse_args()
+    print("MLflow Tracking URI:", mlflow.get_tracking_uri())
     print("Arguments:")
     for arg in vars(args):
         print(f"  {arg}: {getattr(args, arg)}")
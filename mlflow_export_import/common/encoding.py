@@ -0,0 +1,75 @@
+"""
+Encoding of the JSON files of an export - run.json, experiment and bulk manifests and model.json.
+The encoding is chosen once per process with configure(). Readers detect it from the file's magic bytes
+so any export can be imported regardless of how it was written.
+"""
+
+import io
+import json
+import gzip
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common.filesystem import mk_local_path
+
+ENCODINGS = [ "json", "compact", "gzip", "zstd" ]
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_encoding = "json"
+
+def configure(encoding):
+    """
+    Sets the process-wide encoding of written JSON files.
+    :param encoding: 'json' (indented), 'compact' (no whitespace), 'gzip' or 'zstd' (compact and compressed).
+                     'zstd' requires the zstandard package.
+    """
+    global _encoding
+    encoding = encoding or "json"
+    if encoding not in ENCODINGS:
+        raise MlflowExportImportException(f"Encoding '{encoding}' must be one of {ENCODINGS}")
+    if encoding == "zstd":
+        _import_zstandard()
+    _encoding = encoding
+
+def get_encoding():
+    return _encoding
+
+def is_compact():
+    return _encoding != "json"
+
+def is_compressed():
+    return _encoding in ("gzip", "zstd")
+
+def dumps(obj):
+    if is_compact():
+        return json.dumps(obj, separators=(",", ":"))
+    return json.dumps(obj, indent=2)
+
+def open_text(path, mode="r"):
+    """
+    Opens a JSON file as text. For reading the compression is detected from the magic bytes.
+    For writing the configured compression is used.
+    :param mode: 'r' or 'w'.
+    """
+    path = mk_local_path(path)
+    if mode == "r":
+        with open(path, "rb") as f:
+            magic = f.read(4)
+        if magic.startswith(_GZIP_MAGIC):
+            return gzip.open(path, "rt", encoding="utf-8")
+        if magic.startswith(_ZSTD_MAGIC):
+            reader = _import_zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+            return io.TextIOWrapper(reader, encoding="utf-8")
+        return open(path, "r", encoding="utf-8")
+    if _encoding == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    if _encoding == "zstd":
+        writer = _import_zstandard().ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(writer, encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+def _import_zstandard():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise MlflowExportImportException("The 'zstd' encoding requires the zstandard package: pip install zstandard")
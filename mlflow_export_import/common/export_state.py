@@ -0,0 +1,131 @@
+"""
+Change tracking for incremental exports.
+A state file in the output directory keeps a content fingerprint of each exported run and registered model.
+A later export into the same directory skips entities whose fingerprint is unchanged and whose output exists.
+The output of a changed entity is removed before it is exported again so deleted or rewritten artifacts do not survive.
+Artifacts logged to a run after it ended do not change its fingerprint, so such a run is not exported again.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from mlflow_export_import.common.filesystem import mk_local_path
+
+STATE_FILE = "export_state.json"
+
+
+class ExportState():
+    """ Thread-safe fingerprints of exported runs and models, persisted in export_state.json. """
+    def __init__(self, output_dir):
+        """
+        :param output_dir: Export output directory. An existing state file is loaded.
+        """
+        self.path = os.path.join(mk_local_path(output_dir), STATE_FILE)
+        self.lock = threading.Lock()
+        self.state = { "runs": {}, "models": {} }
+        self.num_skipped = { "runs": 0, "models": 0 }
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.state.update(json.loads(f.read()))
+            print(f"Loaded export state of {len(self.state['runs'])} runs and {len(self.state['models'])} models from '{self.path}'")
+
+    def is_run_unchanged(self, run, run_dir, options=None):
+        """
+        Returns True and counts a skip if the run was exported before with the same export options,
+        has not changed and its run.json exists.
+        :param options: Dict of the export options that change a run's output - see RunExporter.get_export_options().
+        """
+        return self._is_unchanged("runs", run.info.run_id, fingerprint_run(run, options), os.path.join(run_dir, "run.json"))
+
+    def update_run(self, run, options=None):
+        self._update("runs", run.info.run_id, fingerprint_run(run, options), { "end_time": run.info.end_time })
+
+    def is_model_unchanged(self, model, versions, model_dir, stages=None):
+        """
+        Returns True and counts a skip if the model and its versions have not changed, the model was exported
+        with the same stages filter and its model.json exists.
+        """
+        return self._is_unchanged("models", model["name"], fingerprint_model(model, versions, stages), os.path.join(model_dir, "model.json"))
+
+    def update_model(self, model, versions, stages=None):
+        self._update("models", model["name"], fingerprint_model(model, versions, stages), { "last_updated_timestamp": model.get("last_updated_timestamp") })
+
+    def remove_output(self, output_dir):
+        """ Removes the previous output of a changed run or model so it is exported into an empty directory. """
+        path = mk_local_path(output_dir)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+    def _is_unchanged(self, kind, key, fingerprint, output_path):
+        with self.lock:
+            entry = self.state[kind].get(key)
+        unchanged = fingerprint is not None and entry is not None and entry["fingerprint"] == fingerprint \
+            and os.path.exists(mk_local_path(output_path))
+        if unchanged:
+            with self.lock:
+                self.num_skipped[kind] += 1
+        return unchanged
+
+    def _update(self, kind, key, fingerprint, fields):
+        with self.lock:
+            self.state[kind][key] = { **fields, "fingerprint": fingerprint }
+
+    def save(self):
+        """
+        Atomically writes the state file. The lock is held for the whole write since the experiment
+        exporters of a threaded bulk export share one state and each of them saves it.
+        """
+        with self.lock:
+            dir = os.path.dirname(self.path)
+            os.makedirs(dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=dir, prefix=f"{STATE_FILE}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(json.dumps(self.state))
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+
+    def get_stats(self):
+        with self.lock:
+            return { "skipped_runs": self.num_skipped["runs"], "skipped_models": self.num_skipped["models"] }
+
+
+def fingerprint_run(run, options=None):
+    """
+    SHA-256 of the run's mutable content - status, end time, lifecycle stage, params, latest metric values and tags -
+    and of the export options that change the run's output.
+    A run that is still running is never unchanged since its end time is not yet set.
+    Artifacts are not part of the fingerprint since listing them would cost as much as an export of small runs.
+    Artifacts logged after the run ended are therefore only exported by a non-incremental export.
+    """
+    info = run.info
+    if info.end_time is None:
+        return None
+    return _sha256({
+        "status": info.status,
+        "end_time": info.end_time,
+        "lifecycle_stage": info.lifecycle_stage,
+        "params": run.data.params,
+        "metrics": run.data.metrics,
+        "tags": run.data.tags,
+        "options": options or {}
+    })
+
+def fingerprint_model(model, versions, stages=None):
+    """
+    SHA-256 of the registered model, its versions and the stages filter of the export.
+    Includes each version's stage, status and tags.
+    """
+    return _sha256({
+        "model": model,
+        "versions": [ dict(vr) for vr in versions ],
+        "stages": sorted(stages or [])
+    })
+
+def _sha256(dct):
+    return hashlib.sha256(json.dumps(dct, sort_keys=True, default=str).encode("utf-8")).hexdigest()
@@ -7,13 +7,14 @@ import os
 import click
 import mlflow
 
-client = mlflow.tracking.MlflowClient()
-print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+def find_artifacts(run_id, path, target, max_level=sys.maxsize, mlflow_client=None):
+    """
+    :param mlflow_client: MLflow client or if None use the default client.
+    """
+    client = mlflow_client or mlflow.tracking.MlflowClient()
+    return _find_artifacts(client, run_id, path, target, max_level, 0, [])
 
-def find_artifacts(run_id, path, target, max_level=sys.maxsize):
-    return _find_artifacts(run_id, path, target, max_level, 0, [])
-
-def _find_artifacts(run_id, path, target, max_level, level, matches):
+def _find_artifacts(client, run_id, path, target, max_level, level, matches):
     if level+1 > max_level: 
         return matches
     artifacts = client.list_artifacts(run_id,path)
@@ -23,7 +24,7 @@ def _find_artifacts(run_id, path, target, max_level, level, matches):
         if filename == target:
             matches.append(art.path)
         if art.is_dir:
-            _find_artifacts(run_id, art.path, target, max_level, level+1, matches)
+            _find_artifacts(client, run_id, art.path, target, max_level, level+1, matches)
     return matches
 
 @click.command()
@@ -35,6 +36,7 @@ def main(run_id, path, target, max_level): # pragma: no cover
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    print("MLflow Tracking URI:", mlflow.get_tracking_uri())
     matches = find_artifacts(run_id, path, target, max_level)
     print("Matches:")
     for x in matches:
@@ -1,18 +1,44 @@
 import os
+import sys
 import json
+import time
+import random
+import email.utils
 import requests
+from requests.adapters import HTTPAdapter
 import click
 from mlflow_export_import.common import mlflow_utils
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import instrumentation
 from mlflow_export_import.common import MlflowExportImportException
 from mlflow_export_import.common import USER_AGENT
 
+RETRY_STATUS_CODES = { 429, 500, 502, 503, 504 }
+
+# Status codes of requests the server rejected without processing them. Non-idempotent requests are only retried on these
+# since a request that failed with another error or timed out may have been committed and would be replayed.
+RETRY_STATUS_CODES_NON_IDEMPOTENT = { 429, 503 }
+
 class HttpClient():
-    """ Wrapper for GET and POST methods for Databricks REST APIs  - standard Databricks API and MLflow API. """
-    def __init__(self, api_name, host=None, token=None):
+    """
+    Wrapper for GET and POST methods for Databricks REST APIs  - standard Databricks API and MLflow API. 
+    Requests go through a keep-alive connection pool and are retried with exponential backoff and jitter 
+    on connection errors, timeouts and on 429 and 5XX responses, honoring the 'Retry-After' header.
+    POST requests are only retried on 429 and 503 responses unless they are flagged as idempotent.
+    A client is thread-safe and is meant to be shared.
+    """
+    def __init__(self, api_name, host=None, token=None, pool_size=10, max_retries=5, backoff_factor=1.0, max_backoff=60, connect_timeout=10, read_timeout=None):
         """
         :param api_name: Name of base API such as 'api/2.0' or 'api/2.0/mlflow'.
         :param host: Host name of tracking server.
         :param token: Databricks token.
+        :param pool_size: Maximum number of pooled connections.
+        :param max_retries: Number of retries for failed requests. 
+        :param backoff_factor: Base seconds for exponential backoff between retries.
+        :param max_backoff: Maximum seconds to sleep between retries.
+        :param connect_timeout: Seconds to wait for a connection.
+        :param read_timeout: Seconds to wait for the server between bytes of the response.
+                             If None MLFLOW_HTTP_REQUEST_TIMEOUT or 120 seconds as for MLflow's own REST calls.
         """
         self.api_uri = "?"
         if host is None:
@@ -21,33 +47,112 @@ class HttpClient():
                 raise MlflowExportImportException("MLflow host or token is not configured correctly")
         self.api_uri = os.path.join(host,api_name)
         self.token = token
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        if read_timeout is None:
+            read_timeout = float(os.environ.get("MLFLOW_HTTP_REQUEST_TIMEOUT", 120))
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
-    def _get(self, resource, params=None):
+    def _get(self, resource, params=None, stream=False):
         """ Executes an HTTP GET call
         :param resource: Relative path name of resource such as cluster/list
         :param params: Dict of query parameters 
+        :param stream: Do not read the response body until it is iterated with iter_content().
         """
         uri = self._mk_uri(resource)
-        rsp = requests.get(uri, headers=self._mk_headers(), json=params)
+        rsp = self._execute("GET", resource, uri, True, json=params, stream=stream)
         self._check_response(rsp, uri, params)
         return rsp
 
     def get(self, resource, params=None):
         return json.loads(self._get(resource, params).text)
 
-    def _post(self, resource, data):
+    def _post(self, resource, data, stream=False, idempotent=False):
         """ Executes an HTTP POST call
         :param resource: Relative path name of resource such as runs/search
         :param data: Post request payload
+        :param stream: Do not read the response body until it is iterated with iter_content().
+        :param idempotent: The request can be safely replayed, such as a search, and is retried like a GET.
         """
         uri = self._mk_uri(resource)
         data = json.dumps(data)
-        rsp = requests.post(uri, headers=self._mk_headers(), data=data)
+        rsp = self._execute("POST", resource, uri, idempotent, data=data, stream=stream)
         self._check_response(rsp,uri)
         return rsp
 
-    def post(self, resource, data):
-        return json.loads(self._post(resource, data).text)
+    def post(self, resource, data, idempotent=False):
+        return json.loads(self._post(resource, data, idempotent=idempotent).text)
+
+    def paginate(self, method, resource, params=None):
+        """ 
+        Generator of the response pages of a paginated resource such as registered-models/list or runs/search.
+        Follows 'next_page_token' and sends it back as 'page_token'. Only one page is held in memory.
+        Paginated resources are reads so POST requests are retried as idempotent.
+        :param method: GET or POST.
+        :param resource: Relative path name of resource.
+        :param params: Dict of query parameters (GET) or request payload (POST).
+        """
+        params = dict(params or {})
+        while True:
+            page = self.get(resource, params) if method == "GET" else self.post(resource, params, idempotent=True)
+            yield page
+            token = page.get("next_page_token")
+            if not token:
+                break
+            params["page_token"] = token
+
+    def download(self, method, resource, params, path, chunk_size=1024*1024, idempotent=False):
+        """
+        Streams a response body to a file in chunks without loading it into memory.
+        :param idempotent: A POST request can be safely replayed.
+        :return: Number of bytes written.
+        """
+        rsp = self._get(resource, params, stream=True) if method == "GET" else self._post(resource, params, stream=True, idempotent=idempotent)
+        num_bytes = 0
+        with rsp, open(path, "wb") as f:
+            for chunk in rsp.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                num_bytes += len(chunk)
+        return num_bytes
+
+    def _execute(self, method, resource, uri, idempotent, **kwargs):
+        """ 
+        Executes the request and retries on connection errors, timeouts and retryable status codes. 
+        A non-idempotent request is not retried on connection errors or timeouts and only retried on the status codes
+        of requests the server did not process.
+        Every attempt is rate limited and recorded by the instrumentation under the resource name.
+        """
+        endpoint_class = rate_limiter.get_http_endpoint_class(method, resource)
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else RETRY_STATUS_CODES_NON_IDEMPOTENT
+        for attempt in range(self.max_retries+1):
+            rate_limiter.get_rate_limiter().acquire(endpoint_class)
+            start = time.monotonic()
+            try:
+                rsp = self.session.request(method, uri, headers=self._mk_headers(), timeout=self.timeout, **kwargs)
+                num_bytes = len(kwargs.get("data") or "") + int(rsp.headers.get("Content-Length", 0))
+                instrumentation.record(resource, time.monotonic()-start, num_bytes, rsp.status_code >= 400)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                instrumentation.record(resource, time.monotonic()-start, error=True)
+                if attempt == self.max_retries or not idempotent:
+                    raise MlflowExportImportException(f"HTTP request failed after {attempt+1} attempts: {type(e).__name__}. URI: {uri}.") from e
+                self._sleep_before_retry(attempt, None, uri, e)
+                continue
+            if rsp.status_code not in retry_status_codes or attempt == self.max_retries:
+                return rsp
+            rsp.close()
+            self._sleep_before_retry(attempt, rsp.headers.get("Retry-After"), uri, f"HTTP status code: {rsp.status_code}")
+
+    def _sleep_before_retry(self, attempt, retry_after, uri, reason):
+        backoff = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        secs = _parse_retry_after(retry_after)
+        secs = random.uniform(0, backoff) if secs is None else min(self.max_backoff, secs) + random.uniform(0, 1)
+        print(f"WARNING: Retry {attempt+1}/{self.max_retries} in {round(secs,1)} seconds. {reason}. URI: {uri}.")
+        time.sleep(secs)
 
     def _mk_headers(self):
         headers = { "User-Agent": USER_AGENT }
@@ -66,12 +171,38 @@ class HttpClient():
         return self.api_uri
 
 class DatabricksHttpClient(HttpClient):
-    def __init__(self, host=None, token=None):
-        super().__init__("api/2.0", host, token)
+    def __init__(self, host=None, token=None, **kwargs):
+        super().__init__("api/2.0", host, token, **kwargs)
 
 class MlflowHttpClient(HttpClient):
-    def __init__(self, host=None, token=None):
-        super().__init__("api/2.0/mlflow", host, token)
+    def __init__(self, host=None, token=None, **kwargs):
+        super().__init__("api/2.0/mlflow", host, token, **kwargs)
+
+def get_page_items(page):
+    """ Returns the items of a response page - the values of its list fields such as 'registered_models'. """
+    return [ item for k,v in page.items() if k != "next_page_token" and isinstance(v, list) for item in v ]
+
+def write_pages_as_json_lines(pages, f):
+    """ Writes the items of each page as one JSON object per line. Returns the number of items. """
+    num_items = 0
+    for page in pages:
+        for item in get_page_items(page):
+            f.write(json.dumps(item)+"\n")
+            num_items += 1
+    return num_items
+
+def _parse_retry_after(value):
+    """ 'Retry-After' is either delay seconds or an HTTP date. """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 
 @click.command()
@@ -81,17 +212,15 @@ class MlflowHttpClient(HttpClient):
 @click.option("--params", help="HTTP GET query parameters as JSON.", required=False, type=str)
 @click.option("--data", help="HTTP POST data as JSON.", required=False, type=str)
 @click.option("--output-file", help="Output file.", required=False, type=str)
+@click.option("--paginate", 
+    help="Follow 'next_page_token' of a paginated resource and write each item as a JSON line.", 
+    type=bool, 
+    default=False, 
+    show_default=True
+)
 @click.option("--verbose", help="Verbose.", type=bool, default=False, show_default=True)
 
-def main(api, resource, method, params, data, output_file, verbose):
-    def write_output(rsp, output_file):
-        if output_file:
-            print(f"Output file: {output_file}")
-            with open(output_file, "w") as f:
-                f.write(rsp.text)
-        else:
-            print(rsp.text)
-
+def main(api, resource, method, params, data, output_file, paginate, verbose):
     if verbose:
         print("Options:")
         for k,v in locals().items():
@@ -99,16 +228,32 @@ def main(api, resource, method, params, data, output_file, verbose):
 
     client = DatabricksHttpClient() if api == "databricks" else MlflowHttpClient()
     method = method.upper() 
-    if "GET" == method:
-        if params:
-            params = json.loads(params)
-        rsp = client._get(resource, params)
-        write_output(rsp, output_file)
-    elif "POST" == method:
-        rsp = client._post(resource, data)
-        write_output(rsp, output_file)
-    else:
+    if method not in [ "GET", "POST" ]:
         print(f"ERROR: Unsupported HTTP method '{method}'")
+        return
+    params = json.loads(params) if params else None
+    if method == "POST":
+        params = json.loads(data) if data else {}
+
+    if paginate:
+        pages = client.paginate(method, resource, params)
+        if output_file:
+            with open(output_file, "w") as f:
+                num_items = write_pages_as_json_lines(pages, f)
+            print(f"Output file: {output_file}")
+            print(f"Wrote {num_items} items")
+        else:
+            write_pages_as_json_lines(pages, sys.stdout)
+    elif output_file:
+        num_bytes = client.download(method, resource, params, output_file)
+        print(f"Output file: {output_file}")
+        print(f"Wrote {num_bytes} bytes")
+    else:
+        rsp = client._get(resource, params, stream=True) if method == "GET" else client._post(resource, params, stream=True)
+        with rsp:
+            for chunk in rsp.iter_content(chunk_size=1024*1024, decode_unicode=True):
+                sys.stdout.write(chunk)
+        print()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,138 @@
+"""
+Latency, call count, error count and byte instrumentation of MLflow client and HttpClient calls grouped by operation.
+Failed calls are recorded too so throttled and failing operations show up in the stats.
+Calls are recorded in a process-wide recorder and in every recorder opened with scope() in the current context,
+such as one per exported run.
+"""
+
+import os
+import time
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from mlflow_export_import.common.client_proxy import ClientProxy
+
+MAX_SAMPLES = 10000
+
+
+class _OperationStats():
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.bytes = 0
+        self.samples = []
+
+    def add(self, seconds, num_bytes, error=False):
+        self.count += 1
+        self.errors += 1 if error else 0
+        self.total_time += seconds
+        self.bytes += num_bytes
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else: # reservoir sampling keeps the percentiles unbiased with bounded memory
+            idx = random.randrange(self.count)
+            if idx < MAX_SAMPLES:
+                self.samples[idx] = seconds
+
+    def to_dict(self):
+        samples = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_time": round(self.total_time, 3),
+            "p50": _percentile(samples, 50),
+            "p95": _percentile(samples, 95),
+            "p99": _percentile(samples, 99),
+            "bytes": self.bytes
+        }
+
+
+def _percentile(samples, pct):
+    """ Nearest-rank percentile of sorted samples. """
+    if not samples:
+        return 0.0
+    idx = max(0, -(-len(samples) * pct // 100) - 1)
+    return round(samples[int(idx)], 4)
+
+
+class Recorder():
+    """ Thread-safe collection of stats per operation. """
+    def __init__(self):
+        self.operations = {}
+        self.lock = threading.Lock()
+
+    def record(self, operation, seconds, num_bytes=0, error=False):
+        with self.lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = _OperationStats()
+            stats.add(seconds, num_bytes, error)
+
+    def get_stats(self):
+        """ Returns count, error count, total time, p50/p95/p99 latency in seconds and bytes per operation. """
+        with self.lock:
+            return { k: v.to_dict() for k,v in sorted(self.operations.items()) }
+
+
+_recorder = Recorder()
+_scoped_recorders = contextvars.ContextVar("scoped_recorders", default=())
+
+def get_recorder():
+    """ Returns the process-wide recorder. """
+    return _recorder
+
+@contextmanager
+def scope():
+    """
+    Opens a recorder that receives the calls made in the current context until the scope exits.
+    Scopes nest. Threads do not inherit the context, so work submitted to a pool must be run with
+    contextvars.copy_context().run to be recorded in the submitter's scopes.
+    """
+    recorder = Recorder()
+    token = _scoped_recorders.set(_scoped_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _scoped_recorders.reset(token)
+
+def record(operation, seconds, num_bytes=0, error=False):
+    """
+    :param error: The call failed - it raised or, for an HTTP call, returned an error status code.
+    """
+    _recorder.record(operation, seconds, num_bytes, error)
+    for recorder in _scoped_recorders.get():
+        recorder.record(operation, seconds, num_bytes, error)
+
+
+class InstrumentedMlflowClient(ClientProxy):
+    """ MLflow client wrapper that records the latency and transferred bytes of each call, including failed calls. """
+    def _invoke(self, name, method, args, kwargs):
+        start = time.monotonic()
+        failed = True
+        try:
+            result = method(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            seconds = time.monotonic() - start
+            record(name, seconds, 0 if failed else _get_num_bytes(name, args, kwargs, result), failed)
+
+
+def _get_num_bytes(name, args, kwargs, result):
+    """ Bytes are known for artifact transfers only - the size of the local files written or read. """
+    if name == "download_artifacts":
+        return _get_size(result)
+    if name == "log_artifacts":
+        return _get_size(kwargs.get("local_dir", args[1] if len(args) > 1 else None))
+    if name == "log_artifact":
+        return _get_size(kwargs.get("local_path", args[1] if len(args) > 1 else None))
+    return 0
+
+def _get_size(path):
+    if not path or not os.path.exists(path):
+        return 0
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(dir, f)) for dir,_,files in os.walk(path) for f in files)
@@ -1,7 +1,19 @@
+import math
+import queue
+import threading
+import weakref
 from abc import abstractmethod, ABCMeta
+from mlflow.utils.search_utils import SearchUtils
+from mlflow_export_import.common import MlflowExportImportException
 
 MAX_RESULTS = 500
 
+# Seconds a background producer waits on a full queue before checking again whether its consumer stopped.
+_PUT_TIMEOUT = 1.0
+
+# Numeric run attributes that can be null and the queries of the runs that can have a null value for them.
+_NULLABLE_ATTRIBUTES = { "end_time": [ "attributes.status = 'RUNNING'", "attributes.status = 'SCHEDULED'" ] }
+
 class BaseIterator(metaclass=ABCMeta):
     """
     Base clase to iterate for list methods that return PageList.
@@ -12,17 +24,35 @@ class BaseIterator(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    def _call_next(self):
+    def _call_next(self, page_token):
         pass
 
-    def __init__(self, client, max_results=MAX_RESULTS):
+    def __init__(self, client, max_results=MAX_RESULTS, prefetch=0):
+        """
+        :param client: MLflow client.
+        :param max_results: Page size.
+        :param prefetch: Number of pages to fetch ahead in a background thread. If 0 pages are fetched on demand.
+        """
         self.client = client
         self.max_results = max_results
+        self.prefetch = prefetch
         self.idx = 0
         self.paged_list = None
+        self._pages = None
+        self._stop = None
+        self._thread = None
 
     def __iter__(self):
-        self.paged_list = self._call_iter()
+        self.close()
+        self.idx = 0
+        if self.prefetch > 0:
+            self._pages = queue.Queue(maxsize=self.prefetch)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=_fetch_pages, args=(weakref.ref(self), self._pages, self._stop), daemon=True)
+            self._thread.start()
+            self.paged_list = self._next_prefetched_page()
+        else:
+            self.paged_list = self._call_iter()
         return self
 
     def __next__(self):
@@ -33,12 +63,62 @@ class BaseIterator(metaclass=ABCMeta):
         elif self.paged_list.token is None or self.paged_list.token == "":
             raise StopIteration
         else:
-            self.paged_list = self._call_next()
+            if self._pages is not None:
+                self.paged_list = self._next_prefetched_page()
+            else:
+                self.paged_list = self._call_next(self.paged_list.token)
             if len(self.paged_list) == 0:
                 raise StopIteration
             self.idx = 1
             return self.paged_list[0]
 
+    def close(self):
+        """
+        Stops the background producer of a prefetching iteration. Called when the iteration is restarted
+        and when the iterator is garbage collected, so a consumer that stops early does not leave it blocked.
+        """
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+            self._pages = None
+
+    def __del__(self):
+        self.close()
+
+    def _next_prefetched_page(self):
+        page = self._pages.get()
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+def _put(items, item, stop):
+    """ Puts an item into a bounded queue unless the consumer stopped. Returns False if it stopped. """
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _fetch_pages(iterator_ref, pages, stop):
+    """
+    Background producer - fetches pages until the last one or until the consumer stops. The bounded queue caps the lookahead.
+    The iterator is only referenced weakly between calls so an abandoned iterator can be collected, which stops the producer.
+    """
+    try:
+        page = None
+        while page is None or page.token:
+            iterator = iterator_ref()
+            if iterator is None or stop.is_set():
+                return
+            page = iterator._call_iter() if page is None else iterator._call_next(page.token)
+            del iterator
+            if not _put(pages, page, stop):
+                return
+    except Exception as e:
+        _put(pages, e, stop)
+
 class ListExperimentsIterator(BaseIterator):
     """
     Usage:
@@ -50,8 +130,8 @@ class ListExperimentsIterator(BaseIterator):
     def _call_iter(self):
         return self.client.list_experiments(max_results=self.max_results)
 
-    def _call_next(self):
-        return self.client.list_experiments(max_results=self.max_results, page_token=self.paged_list.token)
+    def _call_next(self, page_token):
+        return self.client.list_experiments(max_results=self.max_results, page_token=page_token)
 
 class ListRegisteredModelsIterator(BaseIterator):
     """
@@ -64,29 +144,139 @@ class ListRegisteredModelsIterator(BaseIterator):
     def _call_iter(self):
         return self.client.list_registered_models(max_results=self.max_results)
 
-    def _call_next(self):
-        return self.client.list_registered_models(max_results=self.max_results, page_token=self.paged_list.token)
+    def _call_next(self, page_token):
+        return self.client.list_registered_models(max_results=self.max_results, page_token=page_token)
+
+
+class SearchExperimentsIterator(BaseIterator):
+    """
+    Iterates over the experiments matching a filter such as "name LIKE 'team_a%'".
+    Requires MlflowClient.search_experiments (MLflow 1.28 and later).
+    """
+    def __init__(self, client, max_results=MAX_RESULTS, query="", prefetch=0):
+        super().__init__(client, max_results, prefetch)
+        self.query = query
+
+    def _call_iter(self):
+        return self.client.search_experiments(filter_string=self.query, max_results=self.max_results)
+
+    def _call_next(self, page_token):
+        return self.client.search_experiments(filter_string=self.query, max_results=self.max_results, page_token=page_token)
 
 
 class SearchRunsIterator(BaseIterator):
-    def __init__(self, client, experiment_id, max_results=MAX_RESULTS, query=""):
-        super().__init__(client, max_results)
+    def __init__(self, client, experiment_id, max_results=MAX_RESULTS, query="", prefetch=0):
+        super().__init__(client, max_results, prefetch)
         self.experiment_id = experiment_id
         self.query = query
 
     def _call_iter(self):
         return self.client.search_runs(self.experiment_id, self.query, max_results=self.max_results)
 
-    def _call_next(self):
-        return self.client.search_runs(self.experiment_id, self.query, max_results=self.max_results, page_token=self.paged_list.token)
+    def _call_next(self, page_token):
+        return self.client.search_runs(self.experiment_id, self.query, max_results=self.max_results, page_token=page_token)
 
 class SearchRegisteredModelsIterator(BaseIterator):
-    def __init__(self, client, max_results=MAX_RESULTS, query=""):
-        super().__init__(client, max_results)
+    def __init__(self, client, max_results=MAX_RESULTS, query="", prefetch=0):
+        super().__init__(client, max_results, prefetch)
         self.query = query
 
     def _call_iter(self):
         return self.client.search_registered_models(self.query, max_results=self.max_results)
 
-    def _call_next(self):
-        return self.client.search_registered_models(self.query, max_results=self.max_results, page_token=self.paged_list.token)
+    def _call_next(self, page_token):
+        return self.client.search_registered_models(self.query, max_results=self.max_results, page_token=page_token)
+
+class PartitionedSearchRunsIterator():
+    """
+    Searches the runs of a large experiment by splitting it into ranges of a numeric run attribute (default 'attributes.start_time').
+    Each range is searched concurrently with its own SearchRunsIterator and the results are merged into one stream without duplicates.
+    Runs without a value for the attribute match no range. If the attribute can be null, such as 'end_time' of a run
+    that has not ended, they are found by a concurrent search bounded to these runs. A run always has a 'start_time'.
+    Usage:
+        runs = PartitionedSearchRunsIterator(client, experiment_id, num_partitions=8)
+        for run in runs:
+            print(run.info.run_id)
+    """
+    def __init__(self, client, experiment_id, num_partitions=4, max_results=MAX_RESULTS, query="", partition_key="attributes.start_time"):
+        """
+        :param partition_key: Numeric run attribute to partition by such as 'attributes.start_time'.
+        """
+        prefix, _, attr = partition_key.partition(".")
+        if prefix != "attributes" or attr not in SearchUtils.NUMERIC_ATTRIBUTES:
+            raise MlflowExportImportException(f"Partition key '{partition_key}' must be one of the numeric run attributes " +
+                f"{[ 'attributes.'+attr for attr in sorted(SearchUtils.NUMERIC_ATTRIBUTES) ]}")
+        self.client = client
+        self.experiment_id = experiment_id
+        self.num_partitions = num_partitions
+        self.max_results = max_results
+        self.query = query
+        self.partition_key = partition_key
+        self.partition_attr = attr
+
+    def __iter__(self):
+        return self._merge(self._mk_partition_queries())
+
+    def _get_bound(self, order):
+        runs = self.client.search_runs(self.experiment_id, self.query, max_results=1, order_by=[f"{self.partition_key} {order}"])
+        if len(runs) == 0:
+            return None
+        return getattr(runs[0].info, self.partition_attr)
+
+    def _mk_partition_queries(self):
+        low = self._get_bound("ASC")
+        if low is None:
+            return []
+        high = self._get_bound("DESC")
+        step = max(1, math.ceil((high - low + 1) / self.num_partitions))
+        queries = []
+        for start in range(low, high+1, step):
+            query = f"{self.partition_key} >= {start} and {self.partition_key} < {start+step}"
+            queries.append(f"{self.query} and {query}" if self.query else query)
+        return queries
+
+    def _search_partition(self, query):
+        return SearchRunsIterator(self.client, self.experiment_id, self.max_results, query)
+
+    def _search_without_key(self):
+        """
+        Generator of the runs without a value for the partition attribute, which match no range.
+        Such runs are searched with the bounded queries of _NULLABLE_ATTRIBUTES, e.g. the runs that have not ended.
+        """
+        for query in _NULLABLE_ATTRIBUTES[self.partition_attr]:
+            query = f"{self.query} and {query}" if self.query else query
+            for run in self._search_partition(query):
+                if getattr(run.info, self.partition_attr) is None:
+                    yield run
+
+    def _merge(self, queries):
+        searches = [ (self._search_partition, query) for query in queries ]
+        if searches and self.partition_attr in _NULLABLE_ATTRIBUTES:
+            searches.append((self._search_without_key,))
+        runs = queue.Queue(maxsize=self.max_results * max(1, len(searches)))
+        stop = threading.Event()
+        done = object()
+        def search(func, *args):
+            try:
+                for run in func(*args):
+                    if not _put(runs, run, stop):
+                        return
+                _put(runs, done, stop)
+            except Exception as e:
+                _put(runs, e, stop)
+        for args in searches:
+            threading.Thread(target=search, args=args, daemon=True).start()
+        try:
+            seen = set()
+            num_done = 0
+            while num_done < len(searches):
+                run = runs.get()
+                if run is done:
+                    num_done += 1
+                elif isinstance(run, Exception):
+                    raise run
+                elif run.info.run_id not in seen:
+                    seen.add(run.info.run_id)
+                    yield run
+        finally:
+            stop.set()
@@ -1,5 +1,15 @@
 import os
+import threading
 import mlflow
+from mlflow.entities import LifecycleStage
+from mlflow.exceptions import MlflowException
+from mlflow.protos.databricks_pb2 import ErrorCode, RESOURCE_ALREADY_EXISTS
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common.client_proxy import ClientProxy
+from mlflow_export_import.common.rate_limiter import RateLimitedMlflowClient
+from mlflow_export_import.common import cached_client
+from mlflow_export_import.common.cached_client import CachedMlflowClient
+from mlflow_export_import.common.instrumentation import InstrumentedMlflowClient
 
 def dump_mlflow_info():
     print("MLflow Info:")
@@ -30,6 +40,34 @@ def get_mlflow_host_token():
         print("WARNING:",e)
         return (None,None)
 
+def create_mlflow_client(mlflow_client=None, cache_lookups=None):
+    """
+    Returns the MLflow client wrapped so that all its calls to the tracking server are rate limited and instrumented.
+    Optionally repeated experiment and registered model lookups are served from a cache. Cache hits are neither rate limited nor instrumented.
+    :param mlflow_client: MLflow client or if None create default client. An already wrapped client is returned as is.
+    :param cache_lookups: Cache experiment and registered model lookups. If None use the setting of cached_client.configure().
+    """
+    if isinstance(mlflow_client, ClientProxy):
+        return mlflow_client
+    client = RateLimitedMlflowClient(InstrumentedMlflowClient(mlflow_client or mlflow.tracking.MlflowClient()))
+    if cache_lookups is None:
+        cache_lookups = cached_client.is_enabled()
+    return CachedMlflowClient(client) if cache_lookups else client
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_default_mlflow_client():
+    """
+    Returns a process-wide client created with create_mlflow_client() on first use.
+    Modules use it instead of creating a client at import time so that importing them has no side effects.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = create_mlflow_client()
+        return _default_client
+
 def get_experiment(mlflow_client, exp_id_or_name):
     """ Gets an experiment either by ID or name.  """
     exp = mlflow_client.get_experiment_by_name(exp_id_or_name)
@@ -45,17 +83,30 @@ def create_workspace_dir(dbx_client, workspace_dir):
     Create Databricks workspace directory.
     """
     print(f"Creating Databricks workspace directory '{workspace_dir}'")
-    dbx_client.post("workspace/mkdirs", { "path": workspace_dir })
+    dbx_client.post("workspace/mkdirs", { "path": workspace_dir }, idempotent=True)
 
-def set_experiment(dbx_client, exp_name):
+def set_experiment(mlflow_client, get_dbx_client, exp_name):
     """
-    Set experiment name. 
+    Gets or creates an experiment by name with the client instead of the fluent API so the calls are rate limited.
     For Databricks, create the workspace directory if it doesn't exist.
+    :param get_dbx_client: Function returning the Databricks client. Only called when importing into Databricks.
+    :return: Experiment ID.
     """
     from mlflow_export_import import utils
     if utils.importing_into_databricks():
-        create_workspace_dir(dbx_client, os.path.dirname(exp_name))
-    mlflow.set_experiment(exp_name)
+        create_workspace_dir(get_dbx_client(), os.path.dirname(exp_name))
+    exp = mlflow_client.get_experiment_by_name(exp_name)
+    if exp is None:
+        try:
+            return mlflow_client.create_experiment(exp_name)
+        except MlflowException as e:
+            if e.error_code != ErrorCode.Name(RESOURCE_ALREADY_EXISTS):
+                raise
+            exp = mlflow_client.get_experiment_by_name(exp_name)
+    if exp.lifecycle_stage == LifecycleStage.DELETED:
+        raise MlflowExportImportException(f"Cannot set a deleted experiment '{exp_name}' as the active experiment. " +
+            "You can restore the experiment, or permanently delete the experiment to create a new one.")
+    return exp.experiment_id
 
 # BUG
 def _get_experiment(mlflow_client, exp_id_or_name):
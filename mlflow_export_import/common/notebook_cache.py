@@ -0,0 +1,69 @@
+"""
+Cache of exported Databricks notebooks keyed by notebook path, revision and format.
+Runs launched from the same notebook revision share one workspace export call.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import weakref
+from concurrent.futures import Future
+
+
+class NotebookCache():
+    """
+    Thread-safe cache of notebook exports. Each unique (path, revision, format) is fetched once into a temporary
+    cache directory and hard linked (or copied) into each run's notebook directory. Concurrent requests for a key
+    wait for the first fetch. A failed fetch is cached too so a missing notebook is not requested once per run.
+    The cache directory is removed when the cache is garbage collected.
+    """
+    def __init__(self):
+        self.cache_dir = tempfile.mkdtemp(prefix="notebook_cache_")
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.stats = { "hits": 0, "misses": 0 }
+
+    def export_notebook(self, path, revision, format, dst_path, fetch):
+        """
+        Writes a notebook export to dst_path.
+        :param path: Notebook workspace path.
+        :param revision: Notebook revision ID.
+        :param format: Notebook format.
+        :param dst_path: Local destination file.
+        :param fetch: Function that returns the content of the notebook export as bytes. Called once per key.
+        """
+        key = (path, revision, format)
+        with self.lock:
+            future = self.futures.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.futures[key] = future
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+        if is_owner:
+            try:
+                cache_path = os.path.join(self.cache_dir, hashlib.sha256(repr(key).encode("utf-8")).hexdigest())
+                with open(cache_path, "wb") as f:
+                    f.write(fetch())
+                future.set_result(cache_path)
+            except Exception as e:
+                future.set_exception(e)
+        _link_or_copy(future.result(), dst_path)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+def _link_or_copy(src, dst):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
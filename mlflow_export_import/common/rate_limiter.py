@@ -0,0 +1,163 @@
+"""
+Token bucket rate limiting of outbound API calls - both MLflow client calls and HttpClient calls.
+One process-wide limiter is shared by all threads so bulk tools run at a known, bounded load.
+"""
+
+import time
+import threading
+from collections import deque
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common.client_proxy import ClientProxy
+
+ENDPOINT_CLASSES = [ "read", "search", "write", "artifacts" ]
+DEFAULT_CLASS = "default"
+
+_SEARCH_METHODS = { "list_experiments", "list_registered_models", "list_run_infos" }
+_ARTIFACT_METHODS = { "list_artifacts", "download_artifacts", "log_artifact", "log_artifacts" }
+_ARTIFACT_RESOURCES = { "workspace/export", "workspace/import" }
+
+def get_endpoint_class(method_name):
+    """ Returns the endpoint class of an MlflowClient method. """
+    if method_name in _ARTIFACT_METHODS:
+        return "artifacts"
+    if method_name.startswith("search_") or method_name in _SEARCH_METHODS:
+        return "search"
+    if method_name.startswith("get_"):
+        return "read"
+    return "write"
+
+def get_http_endpoint_class(http_method, resource):
+    """ Returns the endpoint class of an HttpClient request. """
+    if resource in _ARTIFACT_RESOURCES:
+        return "artifacts"
+    return "read" if http_method == "GET" else "write"
+
+
+class TokenBucket():
+    """ Thread-safe token bucket. Callers reserve a token and sleep outside the lock until it is due. """
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Tokens (requests) per second.
+        :param capacity: Maximum burst size. Default is one second's worth of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Takes one token, waiting if needed. Returns the seconds waited. """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class _ClassStats():
+    def __init__(self, window):
+        self.window = window
+        self.requests = 0
+        self.wait_time = 0.0
+        self.recent = deque()
+
+    def add(self, wait):
+        now = time.monotonic()
+        self.requests += 1
+        self.wait_time += wait
+        self.recent.append(now)
+        while self.recent and self.recent[0] < now - self.window:
+            self.recent.popleft()
+
+    def to_dict(self, elapsed):
+        now = time.monotonic()
+        recent = [ t for t in self.recent if t >= now - self.window ]
+        return {
+            "requests": self.requests,
+            "wait_time": round(self.wait_time, 2),
+            "requests_per_second": round(self.requests / elapsed, 2) if elapsed > 0 else 0.0,
+            "current_requests_per_second": round(len(recent) / self.window, 2)
+        }
+
+
+class RateLimiter():
+    """ Rate limits requests per endpoint class and keeps throughput stats. """
+    def __init__(self, rates=None, window=10):
+        """
+        :param rates: Dict of endpoint class to requests per second. The 'default' key applies to classes
+                      not listed. Classes with no rate are not limited.
+        :param window: Seconds of the sliding window for the current throughput.
+        """
+        self.rates = dict(rates or {})
+        self.buckets = { k: TokenBucket(v) for k,v in self.rates.items() if v }
+        self.window = window
+        self.stats = {}
+        self.start_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, endpoint_class):
+        bucket = self.buckets.get(endpoint_class, self.buckets.get(DEFAULT_CLASS))
+        wait = bucket.acquire() if bucket else 0.0
+        with self.lock:
+            stats = self.stats.get(endpoint_class)
+            if stats is None:
+                stats = self.stats[endpoint_class] = _ClassStats(self.window)
+            stats.add(wait)
+
+    def get_stats(self):
+        """ Returns live throughput stats per endpoint class. """
+        elapsed = time.monotonic() - self.start_time
+        with self.lock:
+            return {
+                "rates": self.rates,
+                "endpoint_classes": { k: v.to_dict(elapsed) for k,v in sorted(self.stats.items()) }
+            }
+
+
+class RateLimitedMlflowClient(ClientProxy):
+    """ MLflow client wrapper that acquires a token from the shared rate limiter before each call. """
+    def __init__(self, client, rate_limiter=None):
+        super().__init__(client)
+        self._rate_limiter = rate_limiter
+
+    def _invoke(self, name, method, args, kwargs):
+        (self._rate_limiter or get_rate_limiter()).acquire(get_endpoint_class(name))
+        return method(*args, **kwargs)
+
+
+_rate_limiter = RateLimiter()
+
+def get_rate_limiter():
+    return _rate_limiter
+
+def configure(rates):
+    """
+    Replaces the process-wide rate limiter.
+    :param rates: Dict or string such as 'read=20,search=5,write=10,artifacts=4,default=10' of requests per second.
+    """
+    global _rate_limiter
+    _rate_limiter = RateLimiter(parse_rates(rates))
+    return _rate_limiter
+
+def parse_rates(rates):
+    if not rates:
+        return {}
+    if isinstance(rates, dict):
+        return rates
+    dct = {}
+    for item in rates.split(","):
+        if item == "": continue
+        k,_,v = item.partition("=")
+        k = k.strip()
+        if k not in ENDPOINT_CLASSES and k != DEFAULT_CLASS:
+            raise MlflowExportImportException(f"Unknown endpoint class '{k}'. Must be one of {ENDPOINT_CLASSES+[DEFAULT_CLASS]}")
+        try:
+            dct[k] = float(v)
+        except ValueError:
+            raise MlflowExportImportException(f"Rate for endpoint class '{k}' must be a number: '{v}'")
+    return dct
@@ -25,9 +25,14 @@ class ExperimentCopier(BaseCopier):
         print("src_experiment_name:",src_exp.name)
         print("src_experiment_id:",src_exp.experiment_id)
         run_ids_map = {}
-        for j,run in enumerate(SearchRunsIterator(self.src_client, src_exp.experiment_id)):
-            dst_run_id, src_parent_run_id = self.run_copier._copy_run(run.info.run_id, dst_exp.experiment_id)
-            run_ids_map[run.info.run_id] = { "dst_run_id": dst_run_id, "src_parent_run_id": src_parent_run_id }
+        src_parent_run_ids = { run.info.run_id: run.data.tags.get(utils.TAG_PARENT_ID)
+            for run in SearchRunsIterator(self.src_client, src_exp.experiment_id) }
+        for level in utils.group_by_nesting_level(src_parent_run_ids):
+            for src_run_id in level:
+                parent = run_ids_map.get(src_parent_run_ids[src_run_id])
+                dst_parent_run_id = parent["dst_run_id"] if parent else None
+                dst_run_id, src_parent_run_id = self.run_copier._copy_run(src_run_id, dst_exp.experiment_id, dst_parent_run_id)
+                run_ids_map[src_run_id] = { "dst_run_id": dst_run_id, "src_parent_run_id": src_parent_run_id, "dst_parent_run_id": dst_parent_run_id }
         utils.nested_tags(self.dst_client, run_ids_map)
 
 @click.command()
@@ -7,19 +7,32 @@ import click
 import mlflow
 from mlflow_export_import.common import filesystem as _filesystem
 from mlflow_export_import.common import mlflow_utils
-from mlflow_export_import.common.iterators import SearchRunsIterator
+from mlflow_export_import.common import instrumentation
+from mlflow_export_import.common import encoding as _encoding
+from mlflow_export_import.common.iterators import SearchRunsIterator, PartitionedSearchRunsIterator
 from mlflow_export_import.run.export_run import RunExporter
+from mlflow_export_import.run import columnar_metrics
+from mlflow_export_import.common.blob_store import BlobStore, BLOBS_DIR
 from mlflow_export_import import utils, click_doc
 
 class ExperimentExporter():
-    def __init__(self, mlflow_client=None, export_metadata_tags=False, notebook_formats=[]):
+    def __init__(self, mlflow_client=None, export_metadata_tags=False, notebook_formats=[], search_partitions=1, metrics_format="json", export_state=None, blob_store=None, artifact_workers=8, reference_artifacts=False):
         """
         :param mlflow_client: MLflow client or if None create default client.
         :param export_metadata_tags: Export source run metadata tags.
         :param notebook_formats: List of notebook formats to export. Values are SOURCE, HTML, JUPYTER or DBC.
+        :param search_partitions: Number of start_time ranges to search an experiment's runs concurrently. If 1 search serially.
+        :param metrics_format: Format of run metric histories - 'json' in run.json or 'npz' in a columnar metrics.npz file.
+        :param export_state: ExportState for an incremental export. Runs that have not changed since the last export are skipped.
+        :param blob_store: BlobStore to deduplicate artifact files into. If None artifacts are stored in each run's directory.
+        :param artifact_workers: Maximum number of artifact files of a run downloaded concurrently.
+        :param reference_artifacts: Do not download artifacts. Record each run's artifact URI and the path and size of each artifact file in run.json.
         """
-        self.mlflow_client = mlflow_client or mlflow.tracking.MlflowClient()
-        self.run_exporter = RunExporter(self.mlflow_client, export_metadata_tags, notebook_formats)
+        self.mlflow_client = mlflow_utils.create_mlflow_client(mlflow_client)
+        self.run_exporter = RunExporter(self.mlflow_client, export_metadata_tags, notebook_formats, metrics_format=metrics_format, blob_store=blob_store, \
+            artifact_workers=artifact_workers, reference_artifacts=reference_artifacts)
+        self.search_partitions = search_partitions
+        self.export_state = export_state
 
     def export_experiment(self, exp_id_or_name, output_dir, run_ids=None):
         """
@@ -28,33 +41,44 @@ class ExperimentExporter():
         :param run_ids: List of run IDs to export. If None export all run IDs.
         :return: Number of successful and number of failed runs.
         """
-        exp = mlflow_utils.get_experiment(self.mlflow_client, exp_id_or_name)
-        exp_id = exp.experiment_id
-        print(f"Exporting experiment '{exp.name}' (ID {exp.experiment_id}) to '{output_dir}'")
-        fs = _filesystem.get_filesystem(output_dir)
-        print("Filesystem:",type(fs).__name__)
-        fs.mkdirs(output_dir)
-        exp = self.mlflow_client.get_experiment(exp_id)
+        with instrumentation.scope() as recorder:
+            exp = mlflow_utils.get_experiment(self.mlflow_client, exp_id_or_name)
+            exp_id = exp.experiment_id
+            print(f"Exporting experiment '{exp.name}' (ID {exp.experiment_id}) to '{output_dir}'")
+            fs = _filesystem.get_filesystem(output_dir)
+            print("Filesystem:",type(fs).__name__)
+            fs.mkdirs(output_dir)
+            exp = self.mlflow_client.get_experiment(exp_id)
+            ok_run_ids = []
+            failed_run_ids = []
+            skipped_run_ids = []
+            j = -1
+            if run_ids:
+                for j,run_id in enumerate(run_ids):
+                    run = self.mlflow_client.get_run(run_id)
+                    self._export_run(j, run, output_dir, ok_run_ids, failed_run_ids, skipped_run_ids)
+            else:
+                for j,run in enumerate(self._search_runs(exp_id)):
+                    self._export_run(j, run, output_dir, ok_run_ids, failed_run_ids, skipped_run_ids)
+        self._write_manifest(fs, output_dir, exp, j+1, ok_run_ids, failed_run_ids, recorder.get_stats(), len(skipped_run_ids))
+        if self.export_state:
+            self.export_state.save()
+        return len(ok_run_ids), len(failed_run_ids) 
+
+    def _write_manifest(self, fs, output_dir, exp, num_total_runs, ok_run_ids, failed_run_ids, instrumentation_stats=None, num_skipped_runs=0):
         dct = {"experiment": utils.strip_underscores(exp)}
-        ok_run_ids = []
-        failed_run_ids = []
-        j = -1
-        if run_ids:
-            for j,run_id in enumerate(run_ids):
-                run = self.mlflow_client.get_run(run_id)
-                self._export_run(j, run, output_dir, ok_run_ids, failed_run_ids)
-        else:
-            for j,run in enumerate(SearchRunsIterator(self.mlflow_client, exp_id)):
-                self._export_run(j, run, output_dir, ok_run_ids, failed_run_ids)
         dct["export_info"] = { 
             "mlflow_version": mlflow.__version__,
             "mlflow_tracking_uri": mlflow.get_tracking_uri(),
             "export_time": utils.get_now_nice(), 
-            "num_total_runs": (j+1),
+            "encoding": _encoding.get_encoding(),
+            "num_total_runs": num_total_runs,
             "num_ok_runs": len(ok_run_ids),
             "ok_runs": ok_run_ids,
             "num_failed_runs": len(failed_run_ids),
-            "failed_runs": failed_run_ids }
+            "failed_runs": failed_run_ids,
+            "num_skipped_runs": num_skipped_runs,
+            "instrumentation": instrumentation_stats or {} }
 
         path = os.path.join(output_dir,"manifest.json")
         utils.write_json_file(fs, path, dct)
@@ -62,16 +86,29 @@ class ExperimentExporter():
         if len(failed_run_ids) == 0:
             print(f"All {len(ok_run_ids)} runs succesfully exported {msg}")
         else:
-            print(f"{len(ok_run_ids)/j} runs succesfully exported {msg}")
-            print(f"{len(failed_run_ids)/j} runs failed {msg}")
-        return len(ok_run_ids), len(failed_run_ids) 
+            print(f"{len(ok_run_ids)}/{num_total_runs} runs succesfully exported {msg}")
+            print(f"{len(failed_run_ids)}/{num_total_runs} runs failed {msg}")
+
+    def _search_runs(self, exp_id):
+        if self.search_partitions > 1:
+            return PartitionedSearchRunsIterator(self.mlflow_client, exp_id, self.search_partitions)
+        return SearchRunsIterator(self.mlflow_client, exp_id, prefetch=1)
 
-    def _export_run(self, idx, run, output_dir, ok_run_ids, failed_run_ids):
+    def _export_run(self, idx, run, output_dir, ok_run_ids, failed_run_ids, skipped_run_ids):
         run_dir = os.path.join(output_dir, run.info.run_id)
+        if self.export_state and self.export_state.is_run_unchanged(run, run_dir, self.run_exporter.get_export_options()):
+            print(f"Skipping unchanged run {idx+1}: {run.info.run_id}")
+            ok_run_ids.append(run.info.run_id)
+            skipped_run_ids.append(run.info.run_id)
+            return
         print(f"Exporting run {idx+1}: {run.info.run_id}")
-        res = self.run_exporter.export_run(run.info.run_id, run_dir)
+        if self.export_state:
+            self.export_state.remove_output(run_dir)
+        res = self.run_exporter.export_run(run.info.run_id, run_dir, run)
         if res:
             ok_run_ids.append(run.info.run_id)
+            if self.export_state:
+                self.export_state.update_run(run, self.run_exporter.get_export_options())
         else:
             failed_run_ids.append(run.info.run_id)
 
@@ -98,16 +135,61 @@ class ExperimentExporter():
     default="", 
     show_default=True
 )
+@click.option("--search-partitions",
+    help=click_doc.search_partitions,
+    type=int,
+    default=1,
+    show_default=True
+)
+@click.option("--metrics-format",
+    help=click_doc.metrics_format,
+    type=click.Choice(columnar_metrics.METRICS_FORMATS),
+    default="json",
+    show_default=True
+)
+@click.option("--dedup-artifacts",
+    help=click_doc.dedup_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--artifact-workers",
+    help=click_doc.artifact_workers,
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
 
-def main(experiment, output_dir, export_metadata_tags, notebook_formats):
+def main(experiment, output_dir, export_metadata_tags, notebook_formats, search_partitions, metrics_format, dedup_artifacts, artifact_workers, reference_artifacts, encoding):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    _encoding.configure(encoding)
+    blob_store = BlobStore(os.path.join(output_dir, BLOBS_DIR)) if dedup_artifacts else None
     exporter = ExperimentExporter(
         mlflow_client=None, 
         export_metadata_tags=export_metadata_tags, 
-        notebook_formats=utils.string_to_list(notebook_formats))
+        notebook_formats=utils.string_to_list(notebook_formats),
+        search_partitions=search_partitions,
+        metrics_format=metrics_format,
+        blob_store=blob_store,
+        artifact_workers=artifact_workers,
+        reference_artifacts=reference_artifacts)
     exporter.export_experiment(experiment, output_dir)
+    if blob_store:
+        print("Artifact blob store:", blob_store.get_stats())
 
 if __name__ == "__main__":
     main()
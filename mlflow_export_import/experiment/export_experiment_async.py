@@ -0,0 +1,300 @@
+"""
+Exports an experiment to a directory with an asyncio engine. Writes the same format as export_experiment.py.
+"""
+
+import os
+import asyncio
+import functools
+import contextvars
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import click
+from mlflow_export_import.common import filesystem as _filesystem
+from mlflow_export_import.common import mlflow_utils
+from mlflow_export_import.common import instrumentation
+from mlflow_export_import.experiment.export_experiment import ExperimentExporter
+from mlflow_export_import.run.export_run import _metric_history_to_list
+from mlflow_export_import.run import columnar_metrics
+from mlflow_export_import.common.blob_store import BlobStore, BLOBS_DIR
+from mlflow_export_import import utils, click_doc
+from mlflow_export_import.common import encoding as _encoding
+
+class AsyncExperimentExporter(ExperimentExporter):
+    """
+    Exports the runs of an experiment as coroutines. Each run's steps (get_run, get_metric_history per key,
+    the artifact listing and the download of each artifact file) are awaited under two semaphores - one for
+    metadata calls and one for artifact transfers - so many runs are in flight at once.
+    Since the MLflow client is blocking, concurrency is still bound by threads: its calls are run on one thread pool
+    sized to the two semaphores, and the artifact files of all runs share the artifact semaphore instead of each run
+    opening its own download pool. So the number of threads does not grow with the number of runs in flight.
+    """
+    def __init__(self, mlflow_client=None, export_metadata_tags=False, notebook_formats=[], search_partitions=1, \
+            max_metadata_requests=32, max_artifact_requests=8, metrics_format="json", export_state=None, blob_store=None, artifact_workers=8, \
+            reference_artifacts=False):
+        """
+        :param mlflow_client: MLflow client or if None create default client.
+        :param export_metadata_tags: Export source run metadata tags.
+        :param notebook_formats: List of notebook formats to export. Values are SOURCE, HTML, JUPYTER or DBC.
+        :param search_partitions: Number of start_time ranges to search an experiment's runs concurrently.
+        :param max_metadata_requests: Maximum concurrent metadata requests (runs, metric histories, artifact listings).
+        :param max_artifact_requests: Maximum concurrent artifact file downloads and notebook exports over all runs.
+        :param metrics_format: Format of run metric histories - 'json' in run.json or 'npz' in a columnar metrics.npz file.
+        :param export_state: ExportState of an incremental export. Unchanged runs are skipped. If None export all runs.
+        :param blob_store: BlobStore to deduplicate artifact files into. If None artifacts are stored in each run's directory.
+        :param artifact_workers: Not used - the artifact files of all runs are downloaded under the max_artifact_requests semaphore.
+        :param reference_artifacts: Do not download artifacts. Record each run's artifact URI and the path and size of each artifact file in run.json.
+        """
+        super().__init__(mlflow_client, export_metadata_tags, notebook_formats, search_partitions, metrics_format, export_state, blob_store, artifact_workers, reference_artifacts)
+        self.max_metadata_requests = max_metadata_requests
+        self.max_artifact_requests = max_artifact_requests
+
+    def export_experiment(self, exp_id_or_name, output_dir, run_ids=None):
+        """
+        :param exp_id_or_name: Experiment ID or name.
+        :param output_dir: Output directory.
+        :param run_ids: List of run IDs to export. If None export all run IDs.
+        :return: Number of successful and number of failed runs.
+        """
+        return asyncio.run(self._export_experiment(exp_id_or_name, output_dir, run_ids))
+
+    async def _export_experiment(self, exp_id_or_name, output_dir, run_ids):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_metadata_requests + self.max_artifact_requests)
+        self._metadata_semaphore = asyncio.Semaphore(self.max_metadata_requests)
+        self._artifact_semaphore = asyncio.Semaphore(self.max_artifact_requests)
+        try:
+            with instrumentation.scope() as recorder:
+                exp = await self._call_metadata(mlflow_utils.get_experiment, self.mlflow_client, exp_id_or_name)
+                print(f"Exporting experiment '{exp.name}' (ID {exp.experiment_id}) to '{output_dir}' asynchronously")
+                fs = _filesystem.get_filesystem(output_dir)
+                fs.mkdirs(output_dir)
+                ok_run_ids = []
+                failed_run_ids = []
+                skipped_run_ids = []
+                num_runs = await self._export_runs(exp.experiment_id, output_dir, run_ids, fs, ok_run_ids, failed_run_ids, skipped_run_ids)
+            self._write_manifest(fs, output_dir, exp, num_runs, ok_run_ids, failed_run_ids, recorder.get_stats(), len(skipped_run_ids))
+            if self.export_state:
+                self.export_state.save()
+            return len(ok_run_ids), len(failed_run_ids)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    async def _export_runs(self, exp_id, output_dir, run_ids, fs, ok_run_ids, failed_run_ids, skipped_run_ids):
+        """ Schedules one task per run. The number of runs in flight is bounded by the metadata semaphore size. """
+        loop = asyncio.get_running_loop()
+        runs_in_flight = asyncio.Semaphore(self.max_metadata_requests)
+        iterator = iter(run_ids) if run_ids else iter(self._search_runs(exp_id))
+        tasks = set()
+        num_runs = 0
+        async def export_run(idx, run_or_id):
+            try:
+                run_id = run_or_id if isinstance(run_or_id, str) else run_or_id.info.run_id
+                if self.export_state:
+                    run = run_or_id if not isinstance(run_or_id, str) else await self._call_metadata(self.mlflow_client.get_run, run_id)
+                    if self.export_state.is_run_unchanged(run, os.path.join(output_dir, run_id), self.run_exporter.get_export_options()):
+                        print(f"Skipping unchanged run {idx+1}: {run_id}")
+                        ok_run_ids.append(run_id)
+                        skipped_run_ids.append(run_id)
+                        return
+                    self.export_state.remove_output(os.path.join(output_dir, run_id))
+                print(f"Exporting run {idx+1}: {run_id}")
+                ok = await self._export_run_async(run_or_id, output_dir, fs)
+                (ok_run_ids if ok else failed_run_ids).append(run_id)
+                if ok and self.export_state:
+                    self.export_state.update_run(run, self.run_exporter.get_export_options())
+            finally:
+                runs_in_flight.release()
+        while True:
+            run_or_id = await loop.run_in_executor(self._executor, next, iterator, None)
+            if run_or_id is None:
+                break
+            await runs_in_flight.acquire()
+            task = asyncio.ensure_future(export_run(num_runs, run_or_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            num_runs += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        return num_runs
+
+    async def _export_run_async(self, run_or_id, output_dir, fs):
+        run_id = run_or_id if isinstance(run_or_id, str) else run_or_id.info.run_id
+        run_dir = os.path.join(output_dir, run_id)
+        try:
+            with instrumentation.scope() as recorder:
+                run = run_or_id if not isinstance(run_or_id, str) else await self._call_metadata(self.mlflow_client.get_run, run_id)
+                fs.mkdirs(run_dir)
+                tags = await self._call_metadata(utils.create_tags_for_metadata, self.mlflow_client, run, self.run_exporter.export_metadata_tags)
+                keys = list(run.data.metrics.keys())
+                histories = await asyncio.gather(*[ self._call_metadata(self.mlflow_client.get_metric_history, run_id, key) for key in keys ])
+                metrics = { key: _metric_history_to_list(history) for key,history in zip(keys, histories) }
+                artifacts = None
+                if self.run_exporter.reference_artifacts:
+                    files = await self._list_artifact_files(run_id)
+                    artifacts = {
+                        "artifact_uri": run.info.artifact_uri,
+                        "files": [ { "path": file.path, "size": file.file_size } for file in files ]
+                    }
+                ok = await self._export_artifacts_async(run, run_dir, tags, fs)
+            await self._call(None, self.run_exporter._write_run, fs, run_dir, run, tags, metrics, recorder.get_stats(), artifacts)
+            return ok
+        except Exception as e:
+            print("ERROR: run_id:", run_id, "Exception:", e)
+            traceback.print_exc()
+            return False
+
+    async def _export_artifacts_async(self, run, run_dir, tags, fs):
+        run_id = run.info.run_id
+        try:
+            if not self.run_exporter.reference_artifacts:
+                await self._download_artifacts(run_id, os.path.join(run_dir, "artifacts"))
+            await self._call_artifact(self.run_exporter._export_notebook_if_tagged, run_dir, run, tags, fs)
+            if self.run_exporter.blob_store:
+                await self._call_artifact(self.run_exporter.blob_store.dedup_artifacts, run_dir)
+            return True
+        except Exception as e:
+            print("ERROR: run_id:", run_id, "Exception:", e)
+            traceback.print_exc()
+            return False
+
+    async def _list_artifact_files(self, run_id):
+        """ Lists a run's artifact tree breadth first. The directories of each level are listed concurrently. """
+        files = []
+        dirs = [ "" ]
+        while dirs:
+            listings = await asyncio.gather(*[ self._call_metadata(self.mlflow_client.list_artifacts, run_id, path) for path in dirs ])
+            dirs = []
+            for listing in listings:
+                for info in listing:
+                    if info.is_dir:
+                        dirs.append(info.path)
+                    else:
+                        files.append(info)
+        return files
+
+    async def _download_artifacts(self, run_id, dst_dir):
+        """
+        Downloads each artifact file of a run as its own call under the artifact semaphore.
+        Files already downloaded with the listed size are skipped as with ArtifactDownloader.
+        """
+        dst_dir = _filesystem.mk_local_path(dst_dir)
+        files = await self._list_artifact_files(run_id)
+        downloader = self.run_exporter.artifact_downloader
+        sizes = await asyncio.gather(*[ self._call_artifact(downloader._download_file, run_id, file, dst_dir) for file in files ])
+        if files:
+            num_skipped = sum(1 for size in sizes if size is None)
+            num_bytes = sum(size for size in sizes if size is not None)
+            print(f"Downloaded {len(files)-num_skipped}/{len(files)} artifact files ({num_bytes} bytes) of run {run_id}. Skipped {num_skipped} existing files.")
+
+    async def _call_metadata(self, func, *args, **kwargs):
+        return await self._call(self._metadata_semaphore, func, *args, **kwargs)
+
+    async def _call_artifact(self, func, *args, **kwargs):
+        return await self._call(self._artifact_semaphore, func, *args, **kwargs)
+
+    async def _call(self, semaphore, func, *args, **kwargs):
+        """ 
+        Runs a blocking call on the thread pool, optionally bounded by a semaphore.
+        The call runs in a copy of the task's context so it is recorded in the task's instrumentation scopes.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        if semaphore is None:
+            return await loop.run_in_executor(self._executor, call)
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, call)
+
+@click.command()
+@click.option("--experiment",
+    help="Experiment name or ID.",
+    type=str,
+    required=True
+)
+@click.option("--output-dir",
+    help="Output directory.",
+    type=str,
+    required=True
+)
+@click.option("--export-metadata-tags",
+    help=click_doc.export_metadata_tags,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--notebook-formats",
+    help=click_doc.notebook_formats,
+    type=str,
+    default="",
+    show_default=True
+)
+@click.option("--search-partitions",
+    help=click_doc.search_partitions,
+    type=int,
+    default=1,
+    show_default=True
+)
+@click.option("--max-metadata-requests",
+    help="Maximum concurrent metadata requests (runs, metric histories and artifact listings).",
+    type=int,
+    default=32,
+    show_default=True
+)
+@click.option("--max-artifact-requests",
+    help="Maximum concurrent artifact file downloads and notebook exports over all runs.",
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--metrics-format",
+    help=click_doc.metrics_format,
+    type=click.Choice(columnar_metrics.METRICS_FORMATS),
+    default="json",
+    show_default=True
+)
+@click.option("--dedup-artifacts",
+    help=click_doc.dedup_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--artifact-workers",
+    help="Not used by the asyncio engine - artifact files of all runs are downloaded under '--max-artifact-requests'.",
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
+
+def main(experiment, output_dir, export_metadata_tags, notebook_formats, search_partitions, max_metadata_requests, max_artifact_requests, metrics_format, dedup_artifacts, artifact_workers, reference_artifacts, encoding):
+    print("Options:")
+    for k,v in locals().items():
+        print(f"  {k}: {v}")
+    _encoding.configure(encoding)
+    blob_store = BlobStore(os.path.join(output_dir, BLOBS_DIR)) if dedup_artifacts else None
+    exporter = AsyncExperimentExporter(
+        mlflow_client=None,
+        export_metadata_tags=export_metadata_tags,
+        notebook_formats=utils.string_to_list(notebook_formats),
+        search_partitions=search_partitions,
+        max_metadata_requests=max_metadata_requests,
+        max_artifact_requests=max_artifact_requests,
+        metrics_format=metrics_format,
+        blob_store=blob_store,
+        artifact_workers=artifact_workers,
+        reference_artifacts=reference_artifacts)
+    exporter.export_experiment(experiment, output_dir)
+    if blob_store:
+        print("Artifact blob store:", blob_store.get_stats())
+
+if __name__ == "__main__":
+    main()
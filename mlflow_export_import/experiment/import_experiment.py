@@ -3,29 +3,40 @@ Exports an experiment to a directory.
 """
 
 import os
-import mlflow
 import click
 from mlflow_export_import import click_doc
 from mlflow_export_import import peek_at_experiment
 from mlflow_export_import.run.import_run import RunImporter
+from mlflow_export_import.run.run_import_pipeline import RunImportPipeline
+from mlflow_export_import.run import imported_run_index
+from mlflow_export_import.run import run_json
 from mlflow_export_import import utils
 from mlflow_export_import.common import mlflow_utils
-from mlflow_export_import.common.http_client import DatabricksHttpClient
+from mlflow_export_import.common import MlflowExportImportException
 
 class ExperimentImporter():
-    def __init__(self, mlflow_client=None, mlmodel_fix=True, use_src_user_id=False, import_metadata_tags=False):
+    def __init__(self, mlflow_client=None, mlmodel_fix=True, use_src_user_id=False, import_metadata_tags=False, artifact_workers=8, run_workers=4, existing_runs="duplicate"):
         """
         :param mlflow_client: MLflow client or if None create default client.
         :param use_src_user_id: Set the destination user ID to the source user ID.
                                 Source user ID is ignored when importing into
         :param import_metadata_tags: Import mlflow_export_import tags.
+        :param artifact_workers: Maximum number of artifact files of a run uploaded concurrently.
+        :param run_workers: Maximum number of runs in each stage of a pipelined import. If 1 runs are imported one at a time.
+        :param existing_runs: What to do with source runs already imported into the destination experiment - 'duplicate',
+                              'resume' or 'replace'. See imported_run_index.EXISTING_RUNS_MODES.
         """
-        self.mlflow_client = mlflow_client or mlflow.tracking.MlflowClient()
+        if existing_runs not in imported_run_index.EXISTING_RUNS_MODES:
+            raise MlflowExportImportException(f"Existing runs mode '{existing_runs}' must be one of {imported_run_index.EXISTING_RUNS_MODES}")
+        self.mlflow_client = mlflow_utils.create_mlflow_client(mlflow_client)
         self.run_importer = RunImporter(self.mlflow_client, mlmodel_fix=mlmodel_fix, \
             use_src_user_id=use_src_user_id, \
-            import_metadata_tags=import_metadata_tags, dst_notebook_dir_add_run_id=True)
+            import_metadata_tags=import_metadata_tags, dst_notebook_dir_add_run_id=True, \
+            artifact_workers=artifact_workers, \
+            source_run_tag=existing_runs != "duplicate")
+        self.run_workers = run_workers
+        self.existing_runs = existing_runs
         print("MLflowClient:",self.mlflow_client)
-        self.dbx_client = DatabricksHttpClient()
 
     def import_experiment(self, exp_name, input_dir, dst_notebook_dir=None):
         """
@@ -33,7 +44,7 @@ class ExperimentImporter():
         :param: input_dir: Source experiment directory.
         :return: A map of source run IDs and destination run.info.
         """
-        mlflow_utils.set_experiment(self.dbx_client, exp_name)
+        mlflow_utils.set_experiment(self.mlflow_client, lambda: self.run_importer.dbx_client, exp_name)
         manifest_path = os.path.join(input_dir,"manifest.json")
         dct = utils.read_json_file(manifest_path)
         run_ids = dct["export_info"]["ok_runs"]
@@ -41,17 +52,75 @@ class ExperimentImporter():
         print(f"Importing {len(run_ids)} runs into experiment '{exp_name}' from {input_dir}")
         run_ids_map = {}
         run_info_map = {}
+        src_parent_run_ids = self._get_src_parent_run_ids(input_dir, run_ids)
+        results, import_run_ids, existing_runs = self._get_existing_runs(exp_name, run_ids, src_parent_run_ids)
+        existing_runs = dict(zip(import_run_ids, existing_runs))
+        pipeline = RunImportPipeline(self.run_importer, self.run_workers) if self.run_workers > 1 else None
+        for level in utils.group_by_nesting_level({ src_run_id: src_parent_run_ids[src_run_id] for src_run_id in import_run_ids }):
+            dst_parent_run_ids = [ self._get_dst_parent_run_id(results, src_parent_run_ids[src_run_id]) for src_run_id in level ]
+            input_dirs = [ os.path.join(input_dir,src_run_id) for src_run_id in level ]
+            level_existing_runs = [ existing_runs[src_run_id] for src_run_id in level ]
+            if pipeline:
+                imported = pipeline.import_runs(exp_name, input_dirs, dst_notebook_dir, level_existing_runs, dst_parent_run_ids)
+            else:
+                imported = [ self.run_importer.import_run(exp_name, run_dir, dst_notebook_dir, existing_run, dst_parent_run_id)
+                    for run_dir, existing_run, dst_parent_run_id in zip(input_dirs, level_existing_runs, dst_parent_run_ids) ]
+            results.update(zip(level, [ (run, src_parent_run_id, dst_parent_run_id)
+                for (run, src_parent_run_id), dst_parent_run_id in zip(imported, dst_parent_run_ids) ]))
         for src_run_id in run_ids:
-            dst_run, src_parent_run_id = self.run_importer.import_run(exp_name, os.path.join(input_dir,src_run_id), dst_notebook_dir)
+            dst_run, src_parent_run_id, dst_parent_run_id = results[src_run_id]
             dst_run_id = dst_run.info.run_id
-            run_ids_map[src_run_id] = { "dst_run_id": dst_run_id, "src_parent_run_id": src_parent_run_id }
+            run_ids_map[src_run_id] = { "dst_run_id": dst_run_id, "src_parent_run_id": src_parent_run_id, "dst_parent_run_id": dst_parent_run_id }
             run_info_map[src_run_id] = dst_run.info
-        print(f"Imported {len(run_ids)} runs into experiment '{exp_name}' from {input_dir}")
+        print(f"Imported {len(import_run_ids)} runs into experiment '{exp_name}' from {input_dir}")
         if len(failed_run_ids) > 0:
             print(f"Warning: {len(failed_run_ids)} failed runs were not imported - see {manifest_path}")
-        utils.nested_tags(self.mlflow_client, run_ids_map)
+        utils.nested_tags(self.mlflow_client, run_ids_map, self.run_workers)
         return run_info_map
 
+    def _get_src_parent_run_ids(self, input_dir, run_ids):
+        """ Reads the source parent run ID, or None, of each source run so parent runs can be imported before their child runs. """
+        src_parent_run_ids = {}
+        for src_run_id in run_ids:
+            src_run_dct = run_json.read_run(os.path.join(input_dir, src_run_id, "run.json"), fields=[ "tags" ])
+            src_parent_run_ids[src_run_id] = src_run_dct["tags"].get(utils.TAG_PARENT_ID)
+        return src_parent_run_ids
+
+    def _get_dst_parent_run_id(self, results, src_parent_run_id):
+        """ Returns the destination run ID of an already imported or skipped parent run or None. """
+        res = results.get(src_parent_run_id)
+        return res[0].info.run_id if res else None
+
+    def _get_existing_runs(self, exp_name, run_ids, src_parent_run_ids):
+        """
+        Looks up the source runs already imported into the destination experiment.
+        :param src_parent_run_ids: Dict of source run ID to its source parent run ID.
+        :return: Dict of the skipped source run IDs to their destination run, source parent run ID and destination parent run ID,
+                 list of the source run IDs to import and list of the destination run to resume, or None, for each of them.
+        """
+        if self.existing_runs == "duplicate":
+            return {}, run_ids, [ None ] * len(run_ids)
+        exp = self.mlflow_client.get_experiment_by_name(exp_name)
+        index = imported_run_index.index_imported_runs(self.mlflow_client, exp.experiment_id)
+        skipped, import_run_ids, existing_runs = {}, [], []
+        num_resumed, num_replaced = 0, 0
+        for src_run_id in run_ids:
+            dst_run = index.get(src_run_id)
+            if dst_run and imported_run_index.is_finished(dst_run):
+                skipped[src_run_id] = (dst_run, src_parent_run_ids[src_run_id], dst_run.data.tags.get(utils.TAG_PARENT_ID))
+                continue
+            if dst_run and (self.existing_runs == "replace" or not imported_run_index.is_data_imported(dst_run)):
+                print(f"Deleting partially imported run '{dst_run.info.run_id}' of source run '{src_run_id}'")
+                self.mlflow_client.delete_run(dst_run.info.run_id)
+                num_replaced += 1
+                dst_run = None
+            elif dst_run:
+                num_resumed += 1
+            import_run_ids.append(src_run_id)
+            existing_runs.append(dst_run)
+        print(f"Existing runs in '{exp_name}': skipping {len(skipped)} imported runs, resuming {num_resumed} and replacing {num_replaced} partially imported runs")
+        return skipped, import_run_ids, existing_runs
+
 
 @click.command()
 @click.option("--input-dir", 
@@ -85,8 +154,26 @@ class ExperimentImporter():
     required=False,
     show_default=True
 )
+@click.option("--artifact-workers",
+    help=click_doc.import_artifact_workers,
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--run-workers",
+    help=click_doc.run_workers,
+    type=int,
+    default=4,
+    show_default=True
+)
+@click.option("--existing-runs",
+    help=click_doc.existing_runs,
+    type=click.Choice(imported_run_index.EXISTING_RUNS_MODES),
+    default="duplicate",
+    show_default=True
+)
 
-def main(input_dir, experiment_name, just_peek, use_src_user_id, import_metadata_tags, dst_notebook_dir):
+def main(input_dir, experiment_name, just_peek, use_src_user_id, import_metadata_tags, dst_notebook_dir, artifact_workers, run_workers, existing_runs):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
@@ -96,7 +183,10 @@ def main(input_dir, experiment_name, just_peek, use_src_user_id, import_metadata
         importer = ExperimentImporter(
             mlflow_client=None, 
             use_src_user_id=use_src_user_id, 
-            import_metadata_tags=import_metadata_tags)
+            import_metadata_tags=import_metadata_tags,
+            artifact_workers=artifact_workers,
+            run_workers=run_workers,
+            existing_runs=existing_runs)
         importer.import_experiment(experiment_name, input_dir, dst_notebook_dir)
 
 if __name__ == "__main__":
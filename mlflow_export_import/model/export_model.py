@@ -9,23 +9,31 @@ from mlflow_export_import.common.http_client import MlflowHttpClient
 from mlflow_export_import.common import filesystem as _filesystem
 from mlflow_export_import.run.export_run import RunExporter
 from mlflow_export_import import utils, click_doc
+from mlflow_export_import.common import encoding as _encoding
+from mlflow_export_import.common import mlflow_utils
+from mlflow_export_import.common.blob_store import BlobStore, BLOBS_DIR
 
 class ModelExporter():
-    def __init__(self,  mlflow_client=None, export_metadata_tags=False, notebook_formats=None, stages=None, export_run=True):
+    def __init__(self,  mlflow_client=None, export_metadata_tags=False, notebook_formats=None, stages=None, export_run=True, export_state=None, blob_store=None, reference_artifacts=False):
         """
         :param mlflow_client: MLflow client or if None create default client.
         :param export_metadata_tags: Export source run metadata tags.
         :param notebook_formats: List of notebook formats to export. Values are SOURCE, HTML, JUPYTER or DBC.
         :param stages: Stages to export. Default is all stages. Values are Production, Staging, Archived and None.
         :param export_run: Export the run that generated a registered model's version.
+        :param export_state: ExportState for an incremental export. Models whose versions have not changed since the last export are skipped.
+        :param blob_store: BlobStore to deduplicate the artifact files of version runs into. If None artifacts are stored in each run's directory.
+        :param reference_artifacts: Do not download the artifacts of version runs. Record their artifact URIs and the path and size of each file in run.json.
         """
         if notebook_formats is None:
             notebook_formats = []
-        self.mlflow_client = mlflow_client or mlflow.tracking.MlflowClient()
+        self.mlflow_client = mlflow_utils.create_mlflow_client(mlflow_client)
         self.http_client = MlflowHttpClient()
-        self.run_exporter = RunExporter(self.mlflow_client, export_metadata_tags=export_metadata_tags, notebook_formats=notebook_formats)
+        self.run_exporter = RunExporter(self.mlflow_client, export_metadata_tags=export_metadata_tags, notebook_formats=notebook_formats, \
+            blob_store=blob_store, reference_artifacts=reference_artifacts)
         self.stages = self._normalize_stages(stages)
         self.export_run = export_run
+        self.export_state = export_state
 
     def export_model(self, model_name, output_dir):
         """
@@ -43,9 +51,15 @@ class ModelExporter():
     def _export_model(self, model_name, output_dir):
         fs = _filesystem.get_filesystem(output_dir)
         model = self.http_client.get(f"registered-models/get", {"name": model_name})
+        versions = self.mlflow_client.search_model_versions(f"name='{model_name}'")
+        if self.export_state:
+            if self.export_state.is_model_unchanged(model["registered_model"], versions, output_dir, self.stages):
+                print(f"Skipping unchanged model {model_name}")
+                return []
+            self.export_state.remove_output(output_dir)
+        model_fingerprint = dict(model["registered_model"])
         fs.mkdirs(output_dir)
         model["registered_model"]["latest_versions"] = []
-        versions = self.mlflow_client.search_model_versions(f"name='{model_name}'")
         print(f"Found {len(versions)} versions for model {model_name}")
         manifest = []
         exported_versions = 0
@@ -64,7 +78,7 @@ class ModelExporter():
                 run = self.mlflow_client.get_run(run_id)
                 dct = dict(vr)
                 dct["_run_artifact_uri"] = run.info.artifact_uri
-                experiment = mlflow.get_experiment(run.info.experiment_id)
+                experiment = self.mlflow_client.get_experiment(run.info.experiment_id)
                 dct["_experiment_name"] = experiment.name
                 model["registered_model"]["latest_versions"].append(dct)
                 exported_versions += 1
@@ -77,6 +91,8 @@ class ModelExporter():
         print(f"Exported {exported_versions}/{len(versions)} versions for model {model_name}")
         path = os.path.join(output_dir, "model.json")
         utils.write_json_file(fs, path, model)
+        if self.export_state:
+            self.export_state.update_model(model_fingerprint, versions, self.stages)
         return manifest
 
     def _normalize_stages(self, stages):
@@ -113,13 +129,36 @@ class ModelExporter():
     default="", 
     show_default=True
 )
+@click.option("--dedup-artifacts",
+    help=click_doc.dedup_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
 
-def main(model, output_dir, stages, notebook_formats):
+def main(model, output_dir, stages, notebook_formats, dedup_artifacts, reference_artifacts, encoding):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
-    exporter = ModelExporter(stages=stages, notebook_formats=utils.string_to_list(notebook_formats))
+    _encoding.configure(encoding)
+    blob_store = BlobStore(os.path.join(output_dir, BLOBS_DIR)) if dedup_artifacts else None
+    exporter = ModelExporter(stages=stages, notebook_formats=utils.string_to_list(notebook_formats), \
+        blob_store=blob_store, reference_artifacts=reference_artifacts)
     exporter.export_model(model, output_dir)
+    if blob_store:
+        print("Artifact blob store:", blob_store.get_stats())
 
 if __name__ == "__main__":
     main()
@@ -3,12 +3,13 @@ Import a registered model and all the experiment runs associated with its latest
 """
 
 import os
+import urllib.parse
 import click
-import mlflow
 from mlflow.exceptions import RestException
 from mlflow_export_import.run.import_run import RunImporter
 from mlflow_export_import import utils, click_doc
 from mlflow_export_import.common import model_utils
+from mlflow_export_import.common import mlflow_utils
 
 class BaseModelImporter():
     """ Base class of ModelImporter subclasses. """
@@ -18,7 +19,7 @@ class BaseModelImporter():
         :param run_importer: RunImporter instance.
         :param await_creation_for: Seconds to wait for model version crreation.
         """
-        self.mlflow_client = mlflow_client or mlflow.tracking.MlflowClient()
+        self.mlflow_client = mlflow_utils.create_mlflow_client(mlflow_client)
         self.run_importer = run_importer if run_importer else RunImporter(self.mlflow_client, mlmodel_fix=True)
         self.await_creation_for = await_creation_for 
 
@@ -32,7 +33,7 @@ class BaseModelImporter():
         """
         src_current_stage = src_vr["current_stage"]
         dst_source = dst_source.replace("file://","") # OSS MLflow
-        if not dst_source.startswith("dbfs:") and not os.path.exists(dst_source):
+        if _is_local_path(dst_source) and not os.path.exists(dst_source):
             raise Exception(f"'source' argument for MLflowClient.create_model_version does not exist: {dst_source}")
         kwargs = {"await_creation_for": self.await_creation_for } if self.await_creation_for else {}
         version = self.mlflow_client.create_model_version(model_name, dst_source, dst_run_id, **kwargs)
@@ -90,7 +91,7 @@ class ModelImporter(BaseModelImporter):
         :return: Model import manifest.
         """
         model_dct = self._import_model(model_name, input_dir, delete_model, verbose, sleep_time)
-        mlflow.set_experiment(experiment_name)
+        mlflow_utils.set_experiment(self.mlflow_client, lambda: self.run_importer.dbx_client, experiment_name)
         print("Importing versions:")
         for vr in model_dct["latest_versions"]:
             run_id = self._import_run(input_dir, experiment_name, vr)
@@ -130,9 +131,15 @@ class ModelImporter(BaseModelImporter):
 
 class AllModelImporter(BaseModelImporter):
     """ High-level 'bulk' model importer  """
-    def __init__(self, run_info_map, run_importer=None, await_creation_for=None):
+    def __init__(self, run_info_map, run_importer=None, await_creation_for=None, reference_sources=False):
+        """
+        :param run_info_map: Map of source run ID to the destination RunInfo.
+        :param reference_sources: Create versions with their source model URI in the source artifact store
+                                  instead of the imported run's copy. For reference-only exports of a shared store.
+        """
         super().__init__(run_importer, await_creation_for=await_creation_for)
         self.run_info_map = run_info_map
+        self.reference_sources = reference_sources
 
     def import_model(self, model_name, input_dir, delete_model=False, verbose=False, sleep_time=30):
         """
@@ -148,16 +155,19 @@ class AllModelImporter(BaseModelImporter):
         for vr in model_dct["latest_versions"]:
             src_run_id = vr["run_id"]
             dst_run_id = self.run_info_map[src_run_id].run_id
-            mlflow.set_experiment(vr["_experiment_name"])
+            mlflow_utils.set_experiment(self.mlflow_client, lambda: self.run_importer.dbx_client, vr["_experiment_name"])
             self.import_version(model_name, vr, dst_run_id, sleep_time)
         if verbose:
             model_utils.dump_model_versions(self.mlflow_client, model_name)
 
     def import_version(self, model_name, src_vr, dst_run_id, sleep_time):
         src_run_id = src_vr["run_id"]
-        model_path = _extract_model_path(src_vr["source"], src_run_id)
-        dst_artifact_uri = self.run_info_map[src_run_id].artifact_uri
-        dst_source = f"{dst_artifact_uri}/{model_path}"
+        if self.reference_sources:
+            dst_source = src_vr["source"]
+        else:
+            model_path = _extract_model_path(src_vr["source"], src_run_id)
+            dst_artifact_uri = self.run_info_map[src_run_id].artifact_uri
+            dst_source = f"{dst_artifact_uri}/{model_path}"
         self._import_version(model_name, src_vr, dst_run_id, dst_source, sleep_time)
 
 
@@ -168,6 +178,11 @@ def _extract_model_path(source, run_id):
         model_path = model_path.replace("artifacts/","")
     return model_path
 
+def _is_local_path(path):
+    """ A path without a URI scheme such as dbfs: or s3:. A one letter scheme is a Windows drive. """
+    scheme = urllib.parse.urlparse(path).scheme
+    return len(scheme) <= 1
+
 def _path_join(x,y):
     """ Account for DOS backslash """
     path = os.path.join(x,y)
@@ -1,26 +1,52 @@
 """ 
-Lists all registered models.
+Lists all registered models. By default one call of registered-models/list is written as a JSON file.
+With --paginate all pages are followed and written as JSON Lines - one model per line.
 """
 
 import os
-import json
 import click
-from mlflow_export_import.common.http_client import MlflowHttpClient
+from mlflow_export_import.common.http_client import MlflowHttpClient, write_pages_as_json_lines
+
+def write_registered_models(client, path):
+    """
+    Streams the response of one registered-models/list call to a JSON file in chunks as returned by the server.
+    :return: Number of bytes written.
+    """
+    return client.download("GET", "registered-models/list", None, path)
+
+def list_registered_models(client, path, max_results=1000):
+    """
+    Writes all registered models to a JSON Lines file one page at a time.
+    :return: Number of registered models.
+    """
+    pages = client.paginate("GET", "registered-models/list", { "max_results": max_results })
+    with open(path, "w") as f:
+        return write_pages_as_json_lines(pages, f)
 
 @click.command()
 @click.option("--output-dir", help="Output directory.", default=".", type=str)
-def main(output_dir):  # pragma: no cover
+@click.option("--paginate",
+    help="Follow all pages of registered-models/list and write registered_models.jsonl with one model per line instead of registered_models.json.",
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--max-results", help="Maximum number of models per page with --paginate.", default=1000, type=int, show_default=True)
+def main(output_dir, paginate, max_results):  # pragma: no cover
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
     client = MlflowHttpClient()
     print("HTTP client:",client)
-    rsp = client._get("registered-models/list")
-    path = os.path.join(output_dir,"registered_models.json")
-    print("Output file:",path)
-    dct = json.loads(rsp.text)
-    with open(path, "w") as f:
-        f.write(json.dumps(dct,indent=2)+"\n")
+    if paginate:
+        path = os.path.join(output_dir,"registered_models.jsonl")
+        num_models = list_registered_models(client, path, max_results)
+        print("Output file:",path)
+        print(f"Listed {num_models} registered models")
+    else:
+        path = os.path.join(output_dir,"registered_models.json")
+        write_registered_models(client, path)
+        print("Output file:",path)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+"""
+Columnar storage of a run's metric histories in a NumPy .npz file.
+All steps of all keys are stored in three concatenated arrays (step, timestamp, value).
+The 'offsets' array delimits each key's slice, so keys with any characters are supported.
+"""
+
+import numpy as np
+from mlflow.entities import Metric
+from mlflow_export_import.common.filesystem import mk_local_path
+from mlflow_export_import.common import encoding
+
+METRICS_FILE = "metrics.npz"
+METRICS_FORMATS = [ "json", "npz" ]
+
+def write_metrics(path, metrics):
+    """
+    :param path: Output .npz file.
+    :param metrics: Dict of metric key to list of steps as exported in run.json - { value, timestamp, step }.
+    """
+    keys = list(metrics.keys())
+    offsets = np.zeros(len(keys)+1, dtype=np.int64)
+    for j,key in enumerate(keys):
+        offsets[j+1] = offsets[j] + len(metrics[key])
+    num_steps = int(offsets[-1])
+    steps = np.empty(num_steps, dtype=np.int64)
+    timestamps = np.empty(num_steps, dtype=np.int64)
+    values = np.empty(num_steps, dtype=np.float64)
+    idx = 0
+    for key in keys:
+        for m in metrics[key]:
+            steps[idx] = m["step"]
+            timestamps[idx] = m["timestamp"]
+            values[idx] = m["value"]
+            idx += 1
+    savez = np.savez_compressed if encoding.is_compressed() else np.savez
+    with open(mk_local_path(path), "wb") as f:
+        savez(f, keys=np.array(keys, dtype=np.str_), offsets=offsets, step=steps, timestamp=timestamps, value=values)
+
+def read_metrics(path):
+    """ Generator of (key, steps, timestamps, values) arrays per metric key. """
+    with np.load(mk_local_path(path)) as npz:
+        keys, offsets = npz["keys"], npz["offsets"]
+        steps, timestamps, values = npz["step"], npz["timestamp"], npz["value"]
+    for j,key in enumerate(keys):
+        start, end = offsets[j], offsets[j+1]
+        yield str(key), steps[start:end], timestamps[start:end], values[start:end]
+
+def iter_metric_entities(path):
+    """ Generator of MLflow Metric entities of each step without building intermediate dicts. """
+    for key, steps, timestamps, values in read_metrics(path):
+        for step, timestamp, value in zip(steps.tolist(), timestamps.tolist(), values.tolist()):
+            yield Metric(key, value, timestamp, step)
+
+def read_metrics_as_dict(path):
+    """ Returns the metrics in the run.json layout. """
+    return { key: [ { "value": v, "timestamp": t, "step": s } for s,t,v in zip(steps.tolist(), timestamps.tolist(), values.tolist()) ]
+        for key, steps, timestamps, values in read_metrics(path) }
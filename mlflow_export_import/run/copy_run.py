@@ -10,9 +10,6 @@ from mlflow.entities import Metric, Param, RunTag
 from mlflow_export_import import utils, click_doc
 from mlflow_export_import import BaseCopier, create_client
 
-print("MLflow Version:", mlflow.__version__)
-print("MLflow Tracking URI:", mlflow.get_tracking_uri())
-
 @deprecated()
 class RunCopier(BaseCopier):
     def __init__(self, src_client, dst_client, use_src_user_id=False, export_metadata_tags=False):
@@ -27,20 +24,26 @@ class RunCopier(BaseCopier):
         print("  dst_exp.id:",dst_exp.experiment_id)
         return self._copy_run(src_run_id, dst_exp.experiment_id)
 
-    def _copy_run(self, src_run_id, dst_experiment_id):
+    def _copy_run(self, src_run_id, dst_experiment_id, dst_parent_run_id=None):
+        """
+        :param dst_parent_run_id: Destination run ID of the run's parent run. If set it replaces the source parent run tag.
+        :return: The destination run ID and the source parent run ID if the run is a nested run.
+        """
         src_run = self.src_client.get_run(src_run_id)
         dst_run = self.dst_client.create_run(dst_experiment_id) # NOTE: does not set user_id; is 'unknown'
-        self._copy_run_data(src_run, dst_run.info.run_id)
+        self._copy_run_data(src_run, dst_run.info.run_id, dst_parent_run_id)
         local_path = self.src_client.download_artifacts(src_run_id,"")
         self.dst_client.log_artifacts(dst_run.info.run_id,local_path)
         self.dst_client.set_terminated(dst_run.info.run_id, src_run.info.status)
         return (dst_run.info.run_id, src_run.data.tags.get("mlflow.parentRunId",None))
 
-    def _copy_run_data(self, src_run, dst_run_id):
+    def _copy_run_data(self, src_run, dst_run_id, dst_parent_run_id=None):
         now = int(time.time()+.5)
         params = [ Param(k,v) for k,v in src_run.data.params.items() ]
         metrics = [ Metric(k,v,now,0) for k,v in src_run.data.metrics.items() ] # TODO: timestamp and step semantics?
         tags = utils.create_tags_for_metadata(self.src_client, src_run, self.export_metadata_tags)
+        if dst_parent_run_id:
+            tags[utils.TAG_PARENT_ID] = dst_parent_run_id
         tags = [ RunTag(k,str(v)) for k,v in tags.items() ]
         utils.set_dst_user_id(tags, src_run.info.user_id, self.use_src_user_id)
         self.dst_client.log_batch(dst_run_id, metrics, params, tags)
@@ -83,6 +86,8 @@ def main(src_uri, dst_uri, src_run_id, dst_experiment_name, use_src_user_id, exp
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    print("MLflow Version:", mlflow.__version__)
+    print("MLflow Tracking URI:", mlflow.get_tracking_uri())
     src_client = create_client(src_uri)
     dst_client = create_client(dst_uri)
     print("src_client:",src_client)
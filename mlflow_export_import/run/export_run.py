@@ -5,6 +5,10 @@ Exports a run to a directory.
 import os
 import json
 import traceback
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import mlflow
 import click
 
@@ -12,80 +16,190 @@ from mlflow_export_import.common import filesystem as _filesystem
 from mlflow_export_import.common.filesystem import mk_local_path
 from mlflow_export_import.common.http_client import DatabricksHttpClient
 from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common import instrumentation
+from mlflow_export_import.common.artifact_transfer import ArtifactDownloader
+from mlflow_export_import.common.notebook_cache import NotebookCache
+from mlflow_export_import.common import encoding as _encoding
+from mlflow_export_import.run import columnar_metrics
+from mlflow_export_import.run import run_json
 from mlflow_export_import import utils, click_doc
-
-print("MLflow Version:", mlflow.version.VERSION)
-print("MLflow Tracking URI:", mlflow.get_tracking_uri())
+from mlflow_export_import.common import mlflow_utils
 
 
 class RunExporter:
-    def __init__(self, mlflow_client=None, export_metadata_tags=False, notebook_formats=None):
+    def __init__(self, mlflow_client=None, export_metadata_tags=False, notebook_formats=None, metric_history_workers=8, metrics_format="json", blob_store=None, artifact_workers=8, reference_artifacts=False):
         """
         :param mlflow_client: MLflow client or if None create default client.
         :param export_metadata_tags: Export source run metadata tags.
         :param notebook_formats: List of notebook formats to export. Values are SOURCE, HTML, JUPYTER or DBC.
+        :param metric_history_workers: Maximum number of metric histories of a run fetched concurrently.
+        :param metrics_format: Format of the metric histories - 'json' in run.json or 'npz' in a columnar metrics.npz file.
+        :param blob_store: BlobStore to deduplicate artifact files into. If None artifacts are stored in each run's directory.
+        :param artifact_workers: Maximum number of artifact files of a run downloaded concurrently.
+        :param reference_artifacts: Do not download artifacts. Record the run's artifact URI and the path and size of each artifact file in run.json.
         """
+        if metrics_format not in columnar_metrics.METRICS_FORMATS:
+            raise MlflowExportImportException(f"Metrics format '{metrics_format}' must be one of {columnar_metrics.METRICS_FORMATS}")
         if notebook_formats is None:
             notebook_formats = []
-        self.mlflow_client = mlflow_client or mlflow.tracking.MlflowClient()
-        self.dbx_client = DatabricksHttpClient()
-        print("Databricks REST client:", self.dbx_client)
+        self.mlflow_client = mlflow_utils.create_mlflow_client(mlflow_client)
+        self._dbx_client = None
+        self._dbx_client_lock = threading.Lock()
         self.export_metadata_tags = export_metadata_tags
         self.notebook_formats = notebook_formats
+        self.metric_history_workers = metric_history_workers
+        self.metrics_format = metrics_format
+        self.blob_store = blob_store
+        self.artifact_downloader = ArtifactDownloader(self.mlflow_client, artifact_workers)
+        self.reference_artifacts = reference_artifacts
+        self.notebook_cache = NotebookCache()
+
+    @property
+    def dbx_client(self):
+        """ Databricks REST client. Created on first use since only notebook export needs it. """
+        with self._dbx_client_lock:
+            if self._dbx_client is None:
+                self._dbx_client = DatabricksHttpClient()
+                print("Databricks REST client:", self._dbx_client)
+            return self._dbx_client
+
+    @dbx_client.setter
+    def dbx_client(self, dbx_client):
+        self._dbx_client = dbx_client
 
     def _get_metrics_with_steps(self, run):
-        metrics_with_steps = {}
-        for metric in run.data.metrics.keys():
-            metric_history = self.mlflow_client.get_metric_history(run.info.run_id,metric)
-            lst = [utils.strip_underscores(m) for m in metric_history]
-            for x in lst:
-                del x["key"] 
-            metrics_with_steps[metric] = lst
-        return metrics_with_steps
-
-    def export_run(self, run_id, output_dir):
-        """
-        :param run_id: Run ID.
-        :param output_dir: Output directory.
-        :return: whether export succeeded.
+        return { key: _metric_history_to_list(history) for key,history in self._iter_metric_histories(run) }
+
+    def _iter_metric_histories(self, run):
+        """ 
+        Generator of (key, history) for each metric key in key order. Histories are fetched concurrently with a 
+        bounded pool and at most twice the pool size of them are held in memory at once.
+        MLflow has no bulk metric history endpoint in its public REST API so there is one call per key.
         """
-        fs = _filesystem.get_filesystem(output_dir)
-        run = self.mlflow_client.get_run(run_id)
-        fs.mkdirs(output_dir)
-        tags = utils.create_tags_for_metadata(self.mlflow_client, run, self.export_metadata_tags)
+        run_id = run.info.run_id
+        keys = list(run.data.metrics.keys())
+        if len(keys) <= 1 or self.metric_history_workers <= 1:
+            for key in keys:
+                yield key, self.mlflow_client.get_metric_history(run_id, key)
+            return
+        max_workers = min(self.metric_history_workers, len(keys))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = deque()
+            for key in keys:
+                futures.append((key, executor.submit(contextvars.copy_context().run, self.mlflow_client.get_metric_history, run_id, key)))
+                if len(futures) >= 2 * max_workers:
+                    key, future = futures.popleft()
+                    yield key, future.result()
+            while futures:
+                key, future = futures.popleft()
+                yield key, future.result()
+
+    def get_export_options(self):
+        """ Returns the options that change the exported files of a run. An incremental export re-exports a run if one of them changed. """
+        return {
+            "metrics_format": self.metrics_format,
+            "reference_artifacts": self.reference_artifacts,
+            "export_metadata_tags": self.export_metadata_tags,
+            "notebook_formats": sorted(self.notebook_formats),
+            "dedup_artifacts": self.blob_store is not None,
+            "encoding": _encoding.get_encoding()
+        }
+
+    def _get_artifact_references(self, run):
+        """ Returns the artifact URI and the path and size of each artifact file of a reference-only export. """
+        files = self.artifact_downloader.list_files(run.info.run_id)
+        return {
+            "artifact_uri": run.info.artifact_uri,
+            "files": [ { "path": file.path, "size": file.file_size } for file in files ]
+        }
+
+    def _mk_run_dict(self, run, tags, metrics, artifacts=None, metrics_file=None):
+        """ Returns the run.json dict. 'metrics' is the last field so readers of the other fields can stop before the metric histories. """
         dct = {
             "export_info": {
                 "mlflow_version": mlflow.__version__,
                 "mlflow_tracking_uri": mlflow.get_tracking_uri(),
-                "export_time": utils.get_now_nice()},
+                "export_time": utils.get_now_nice(),
+                "encoding": _encoding.get_encoding()},
             "info": utils.strip_underscores(run.info),
             "params": run.data.params,
-            "metrics": self._get_metrics_with_steps(run),
             "tags": tags,
         }
-        path = os.path.join(output_dir, "run.json")
-        utils.write_json_file(fs, path, dct)
+        if artifacts is not None:
+            dct["artifacts"] = artifacts
+        if metrics_file is not None:
+            dct["metrics_file"] = metrics_file
+        dct["metrics"] = metrics
+        return dct
 
-        # copy artifacts
+    def export_run(self, run_id, output_dir, run=None):
+        """
+        :param run_id: Run ID.
+        :param output_dir: Output directory.
+        :param run: Run of run_id if already fetched, e.g. by a search. If None the run is fetched.
+        :return: whether export succeeded.
+        """
+        fs = _filesystem.get_filesystem(output_dir)
+        with instrumentation.scope() as recorder:
+            if run is None:
+                run = self.mlflow_client.get_run(run_id)
+            fs.mkdirs(output_dir)
+            tags = utils.create_tags_for_metadata(self.mlflow_client, run, self.export_metadata_tags)
+            artifacts = self._get_artifact_references(run) if self.reference_artifacts else None
+            if self.metrics_format == "json":
+                return self._export_run_streaming(output_dir, run, tags, fs, recorder, artifacts)
+            metrics = self._get_metrics_with_steps(run)
+            ok = self._export_artifacts(output_dir, run, tags, fs)
+        self._write_run(fs, output_dir, run, tags, metrics, recorder.get_stats(), artifacts)
+        return ok
+
+    def _export_run_streaming(self, output_dir, run, tags, fs, recorder, artifacts=None):
+        """ Appends each metric history to run.json as soon as it is fetched so a run's metrics are never all in memory. """
+        with run_json.RunJsonWriter(os.path.join(output_dir, "run.json")) as writer:
+            for k,v in self._mk_run_dict(run, tags, None, artifacts).items():
+                if k != "metrics":
+                    writer.write_field(k, v)
+            writer.begin_metrics()
+            for key, history in self._iter_metric_histories(run):
+                writer.write_metric(key, _metric_history_to_list(history))
+            writer.end_metrics()
+            ok = self._export_artifacts(output_dir, run, tags, fs)
+            writer.write_field("instrumentation", recorder.get_stats())
+        return ok
+
+    def _write_run(self, fs, output_dir, run, tags, metrics, instrumentation_stats, artifacts=None):
+        """ Writes run.json and with the 'npz' metrics format the columnar metrics file. """
+        if self.metrics_format == "npz":
+            columnar_metrics.write_metrics(os.path.join(output_dir, columnar_metrics.METRICS_FILE), metrics)
+            dct = self._mk_run_dict(run, tags, {}, artifacts, columnar_metrics.METRICS_FILE)
+        else:
+            dct = self._mk_run_dict(run, tags, metrics, artifacts)
+        dct["instrumentation"] = instrumentation_stats
+        utils.write_json_file(fs, os.path.join(output_dir, "run.json"), dct)
+
+    def _export_artifacts(self, output_dir, run, tags, fs):
         dst_path = os.path.join(output_dir,"artifacts")
         try:
-            TAG_NOTEBOOK_PATH = "mlflow.databricks.notebookPath"
-            artifacts = self.mlflow_client.list_artifacts(run.info.run_id)
-            if len(artifacts) > 0: # Because of https://github.com/mlflow/mlflow/issues/2839
-                fs.mkdirs(dst_path)
-                self.mlflow_client.download_artifacts(run.info.run_id, "", dst_path=mk_local_path(dst_path))
-            notebook = tags.get(TAG_NOTEBOOK_PATH, None)
-            if notebook is not None:
-                if len(self.notebook_formats) > 0:
-                    self._export_notebook(output_dir, notebook, run.data.tags, fs)
-            elif len(self.notebook_formats) > 0:
-                print(f"WARNING: Cannot export notebook since tag '{TAG_NOTEBOOK_PATH}' is not set.")
+            if not self.reference_artifacts:
+                self.artifact_downloader.download(run.info.run_id, dst_path)
+            self._export_notebook_if_tagged(output_dir, run, tags, fs)
+            if self.blob_store:
+                self.blob_store.dedup_artifacts(output_dir)
             return True
         except Exception as e:
             print("ERROR: run_id:", run.info.run_id, "Exception:", e)
             traceback.print_exc()
             return False
 
+    def _export_notebook_if_tagged(self, output_dir, run, tags, fs):
+        TAG_NOTEBOOK_PATH = "mlflow.databricks.notebookPath"
+        notebook = tags.get(TAG_NOTEBOOK_PATH, None)
+        if notebook is not None:
+            if len(self.notebook_formats) > 0:
+                self._export_notebook(output_dir, notebook, run.data.tags, fs)
+        elif len(self.notebook_formats) > 0:
+            print(f"WARNING: Cannot export notebook since tag '{TAG_NOTEBOOK_PATH}' is not set.")
+
     def _export_notebook(self, output_dir, notebook, tags, fs):
         notebook_dir = os.path.join(output_dir, "artifacts", "notebooks")
         fs.mkdirs(notebook_dir)
@@ -98,8 +212,15 @@ class RunExporter:
            "mlflow.databricks.export-notebook-revision": revision_id }
         path = os.path.join(notebook_dir, "manifest.json")
         fs.write(path, (json.dumps(manifest, indent=2)+"\n"))
-        for format in self.notebook_formats:
-            self._export_notebook_format(notebook_dir, notebook, format, format.lower(), notebook_name, revision_id)
+        if len(self.notebook_formats) == 1:
+            self._export_notebook_format(notebook_dir, notebook, self.notebook_formats[0], self.notebook_formats[0].lower(), notebook_name, revision_id)
+            return
+        with ThreadPoolExecutor(max_workers=len(self.notebook_formats)) as executor:
+            futures = [ executor.submit(contextvars.copy_context().run, self._export_notebook_format, \
+                    notebook_dir, notebook, format, format.lower(), notebook_name, revision_id) \
+                for format in self.notebook_formats ]
+            for future in futures:
+                future.result()
 
     def _export_notebook_format(self, notebook_dir, notebook, format, extension, notebook_name, revision_id):
         params = { 
@@ -109,12 +230,18 @@ class RunExporter:
             "revision_timestamp": revision_id 
         }
         try:
-            rsp = self.dbx_client._get("workspace/export", params)
             notebook_path = os.path.join(notebook_dir, f"{notebook_name}.{extension}")
-            utils.write_file(notebook_path, rsp.content)
+            self.notebook_cache.export_notebook(notebook, revision_id, format, mk_local_path(notebook_path), \
+                lambda: self.dbx_client._get("workspace/export", params).content)
         except MlflowExportImportException as e:
             print(f"WARNING: Cannot save notebook '{notebook}'. {e}")
 
+def _metric_history_to_list(metric_history):
+    lst = [utils.strip_underscores(m) for m in metric_history]
+    for x in lst:
+        del x["key"]
+    return lst
+
 @click.command()
 @click.option("--run-id", 
     help="Run ID.", 
@@ -138,15 +265,43 @@ class RunExporter:
     default="", 
     show_default=True
 )
+@click.option("--metrics-format", 
+    help=click_doc.metrics_format, 
+    type=click.Choice(columnar_metrics.METRICS_FORMATS),
+    default="json", 
+    show_default=True
+)
+@click.option("--artifact-workers",
+    help=click_doc.artifact_workers,
+    type=int,
+    default=8,
+    show_default=True
+)
+@click.option("--reference-artifacts",
+    help=click_doc.reference_artifacts,
+    type=bool,
+    default=False,
+    show_default=True
+)
+@click.option("--encoding",
+    help=click_doc.encoding,
+    type=click.Choice(_encoding.ENCODINGS),
+    default="json",
+    show_default=True
+)
 
-def main(run_id, output_dir, export_metadata_tags, notebook_formats):
+def main(run_id, output_dir, export_metadata_tags, notebook_formats, metrics_format, artifact_workers, reference_artifacts, encoding):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
+    _encoding.configure(encoding)
     exporter = RunExporter(
       mlflow_client=None, 
       export_metadata_tags=export_metadata_tags, 
-      notebook_formats=utils.string_to_list(notebook_formats))
+      notebook_formats=utils.string_to_list(notebook_formats),
+      metrics_format=metrics_format,
+      artifact_workers=artifact_workers,
+      reference_artifacts=reference_artifacts)
     exporter.export_run(run_id, output_dir)
 
 if __name__ == "__main__":
@@ -4,112 +4,162 @@ Imports a run from a directory.
 
 import os
 import yaml
+import shutil
 import tempfile
+import threading
+import posixpath
+from contextlib import contextmanager, nullcontext
 import click
 import base64
-import mlflow
-from mlflow.entities import RunStatus
-from mlflow.utils.validation import MAX_PARAMS_TAGS_PER_BATCH, MAX_METRICS_PER_BATCH
+from mlflow.entities import RunStatus, RunTag
 
 from mlflow_export_import import utils, click_doc
-from mlflow_export_import import mk_local_path
 from mlflow_export_import.common.find_artifacts import find_artifacts
 from mlflow_export_import.common.http_client import DatabricksHttpClient
 from mlflow_export_import.common import mlflow_utils
-from mlflow_export_import.common import filesystem as _filesystem
+from mlflow_export_import.common import blob_store
+from mlflow_export_import.common.artifact_transfer import ArtifactUploader, ArtifactCopier
 from mlflow_export_import.run import run_data_importer
+from mlflow_export_import.run import run_json
+from mlflow_export_import.run import imported_run_index
 from mlflow_export_import.common import MlflowExportImportException
 
 class RunImporter():
     def __init__(self, mlflow_client=None, mlmodel_fix=True, use_src_user_id=False, \
-            import_metadata_tags=False, dst_notebook_dir_add_run_id=False):
+            import_metadata_tags=False, dst_notebook_dir_add_run_id=False, artifact_workers=8, source_run_tag=False):
         """ 
         :param mlflow_client: MLflow client or if None create default client.
         :param mlmodel_fix: Add correct run ID in destination MLmodel artifact. 
-                            Can be expensive for deeply nested artifacts.
+                            MLmodel files are patched locally before the artifacts are uploaded.
         :param use_src_user_id: Set the destination user ID to the source user ID. 
                                 Source user ID is ignored when importing into 
                                 Databricks since setting it is not allowed.
         :param import_metadata_tags: Import mlflow_export_import tags.
         :param dst_notebook_dir: Databricks destination workpsace directory for notebook import.
         :param dst_notebook_dir_add_run_id: Add the run ID to the destination notebook directory.
+        :param artifact_workers: Maximum number of artifact files of a run uploaded or copied concurrently.
+        :param source_run_tag: Tag the destination run with the source run ID so a later import can find it.
         """
-        self.mlflow_client = mlflow_client or mlflow.tracking.MlflowClient()
+        self.mlflow_client = mlflow_utils.create_mlflow_client(mlflow_client)
         self.mlmodel_fix = mlmodel_fix
         self.use_src_user_id = use_src_user_id
         self.import_metadata_tags = import_metadata_tags
         self.in_databricks = "DATABRICKS_RUNTIME_VERSION" in os.environ
         self.dst_notebook_dir_add_run_id = dst_notebook_dir_add_run_id
-        self.dbx_client = DatabricksHttpClient()
+        self._dbx_client = None
+        self._dbx_client_lock = threading.Lock()
+        self.artifact_uploader = ArtifactUploader(self.mlflow_client, artifact_workers)
+        self.artifact_copier = ArtifactCopier(artifact_workers)
+        self.source_run_tag = source_run_tag
         print(f"in_databricks: {self.in_databricks}")
         print(f"importing_into_databricks: {utils.importing_into_databricks()}")
 
-    def import_run(self, exp_name, input_dir, dst_notebook_dir=None):
+    @property
+    def dbx_client(self):
+        """ Databricks REST client. Created on first use since only experiment creation and notebook import need it. """
+        with self._dbx_client_lock:
+            if self._dbx_client is None:
+                self._dbx_client = DatabricksHttpClient()
+            return self._dbx_client
+
+    @dbx_client.setter
+    def dbx_client(self, dbx_client):
+        self._dbx_client = dbx_client
+
+    def import_run(self, exp_name, input_dir, dst_notebook_dir=None, existing_run=None, dst_parent_run_id=None):
         """ 
         Imports a run into the specified experiment.
         :param exp_name: Experiment name.
         :param input_dir: Source input directory that contains the exported run.
         :param dst_notebook_dir: Databricks destination workpsace directory for notebook.
+        :param existing_run: Partially imported destination run to resume instead of creating a new run.
+                             Its params, metrics and tags must all have been logged - see imported_run_index.is_data_imported().
+                             Only its artifacts are imported again and files that were already uploaded are skipped.
+        :param dst_parent_run_id: Destination run ID of the run's parent run. If set the parent run tag is
+                                  logged with the run's first batch of data instead of being fixed afterwards.
         :return: The run and its parent run ID if the run is a nested run.
         """
         print(f"Importing run from '{input_dir}'")
-        res = self._import_run(exp_name, input_dir, dst_notebook_dir)
+        res = self._import_run(exp_name, input_dir, dst_notebook_dir, existing_run, dst_parent_run_id)
         print(f"Imported run into '{exp_name}/{res[0].info.run_id}'")
         return res
 
-    def _import_run(self, dst_exp_name, input_dir, dst_notebook_dir):
-        mlflow_utils.set_experiment(self.dbx_client, dst_exp_name)
-        exp = self.mlflow_client.get_experiment_by_name(dst_exp_name)
+    def _import_run(self, dst_exp_name, input_dir, dst_notebook_dir, existing_run=None, dst_parent_run_id=None):
+        experiment_id = mlflow_utils.set_experiment(self.mlflow_client, lambda: self.dbx_client, dst_exp_name)
+        run, src_run_dct = self._create_run(experiment_id, input_dir, existing_run)
+        run_id = run.info.run_id
+        if not existing_run:
+            self._run_stage(run_id, self._import_run_data, src_run_dct, run_id, src_run_dct["info"]["user_id"], input_dir, dst_parent_run_id)
+        self._run_stage(run_id, self._import_artifacts, run, src_run_dct, input_dir)
+        return self._finish_run(run, src_run_dct, input_dir, dst_notebook_dir)
+
+    def _create_run(self, experiment_id, input_dir, existing_run=None):
         src_run_path = os.path.join(input_dir,"run.json")
-        src_run_dct = utils.read_json_file(src_run_path)
+        src_run_dct = run_json.read_run(src_run_path, skip_metrics=True)
+        if existing_run:
+            print(f"Resuming import of run '{existing_run.info.run_id}' with status {existing_run.info.status}")
+            self.mlflow_client.set_terminated(existing_run.info.run_id, RunStatus.to_string(RunStatus.RUNNING))
+            return existing_run, src_run_dct
+        tags = { imported_run_index.TAG_SRC_RUN_ID: src_run_dct["info"]["run_id"] } if self.source_run_tag else None
+        run = self.mlflow_client.create_run(experiment_id, tags=tags)
+        return run, src_run_dct
 
-        run = self.mlflow_client.create_run(exp.experiment_id)
+    def _import_artifacts(self, run, src_run_dct, input_dir):
         run_id = run.info.run_id
-        try:
-            self._import_run_data(src_run_dct, run_id, src_run_dct["info"]["user_id"])
-            path = os.path.join(input_dir,"artifacts")
-            if os.path.exists(_filesystem.mk_local_path(path)):
-                self.mlflow_client.log_artifacts(run_id, mk_local_path(path))
+        with blob_store.artifacts_dir(input_dir) as path:
+            if path:
+                with _mlmodel_fixed_dir(path, run_id) if self.mlmodel_fix else nullcontext(path) as upload_dir:
+                    self.artifact_uploader.upload(run_id, upload_dir)
+        artifacts = src_run_dct.get("artifacts")
+        if artifacts:
+            self.artifact_copier.copy(artifacts["artifact_uri"], artifacts["files"], run.info.artifact_uri)
             if self.mlmodel_fix:
-                self._update_mlmodel_run_id(run_id)
-            self.mlflow_client.set_terminated(run_id, RunStatus.to_string(RunStatus.FINISHED))
+                mlmodel_paths = [ file["path"] for file in artifacts["files"] if posixpath.basename(file["path"]) == "MLmodel" ]
+                self._update_mlmodel_run_id(run_id, mlmodel_paths)
+
+    def _finish_run(self, run, src_run_dct, input_dir, dst_notebook_dir):
+        """ Terminates the run and imports its notebook. Returns the run and its source parent run ID. """
+        run_id = run.info.run_id
+        self._run_stage(run_id, self.mlflow_client.set_terminated, run_id, RunStatus.to_string(RunStatus.FINISHED))
+        if utils.importing_into_databricks() and dst_notebook_dir:
+            ndir = os.path.join(dst_notebook_dir, run_id) if self.dst_notebook_dir_add_run_id else dst_notebook_dir
+            self._upload_databricks_notebook(input_dir, src_run_dct, ndir)
+        return (run, src_run_dct["tags"].get(utils.TAG_PARENT_ID,None))
+
+    def _run_stage(self, run_id, func, *args):
+        """ Calls a stage of a run import. If it fails the destination run is marked as FAILED. """
+        try:
+            return func(*args)
         except Exception as e:
             self.mlflow_client.set_terminated(run_id, RunStatus.to_string(RunStatus.FAILED))
             import traceback
             traceback.print_exc()
             raise MlflowExportImportException from e
-        if utils.importing_into_databricks() and dst_notebook_dir:
-            ndir = os.path.join(dst_notebook_dir, run_id) if self.dst_notebook_dir_add_run_id else dst_notebook_dir
-            self._upload_databricks_notebook(input_dir, src_run_dct, ndir)
-        return (run, src_run_dct["tags"].get(utils.TAG_PARENT_ID,None))
 
-    def _update_mlmodel_run_id(self, run_id):
-        """ Patch to fix the run_id in the destination MLmodel file since there is no API to get all model artifacts of a run. """
-        mlmodel_paths = find_artifacts(run_id, "", "MLmodel")
+    def _update_mlmodel_run_id(self, run_id, mlmodel_paths=None):
+        """
+        Patch to fix the run_id in the destination MLmodel files of artifacts that were not uploaded from a local directory.
+        :param mlmodel_paths: Artifact paths of the MLmodel files. If None they are found by listing the run's artifacts.
+        """
+        if mlmodel_paths is None:
+            mlmodel_paths = find_artifacts(run_id, "", "MLmodel", mlflow_client=self.mlflow_client)
         for mlmodel_path in mlmodel_paths:
-            model_path = mlmodel_path.replace("/MLmodel","")
+            model_path = posixpath.dirname(mlmodel_path) or None
             local_path = self.mlflow_client.download_artifacts(run_id, mlmodel_path)
-            with open(local_path, "r") as f:
-                mlmodel = yaml.safe_load(f)
-            mlmodel["run_id"] = run_id
             with tempfile.TemporaryDirectory() as dir:
                 output_path = os.path.join(dir, "MLmodel")
-                with open(output_path, "w") as f:
-                    yaml.dump(mlmodel, f)
-                self.mlflow_client.log_artifact(run_id, output_path,  f"{model_path}")
-
-    def _import_run_data(self, run_dct, run_id, src_user_id):
-        run_data_importer.log_params(self.mlflow_client, run_dct, run_id, MAX_PARAMS_TAGS_PER_BATCH)
-        run_data_importer.log_metrics(self.mlflow_client, run_dct, run_id, MAX_METRICS_PER_BATCH)
-        run_data_importer.log_tags(
-            self.mlflow_client, 
-            run_dct, 
-            run_id, 
-            MAX_PARAMS_TAGS_PER_BATCH, 
-            self.import_metadata_tags, 
-            self.in_databricks, 
-            src_user_id, 
-            self.use_src_user_id)
+                _write_mlmodel_with_run_id(local_path, output_path, run_id)
+                self.mlflow_client.log_artifact(run_id, output_path, model_path)
+
+    def _import_run_data(self, run_dct, run_id, src_user_id, input_dir=None, dst_parent_run_id=None):
+        params = run_data_importer.get_params(run_dct)
+        metrics = run_data_importer.iter_metrics(run_dct, input_dir)
+        tags = run_data_importer.get_tags(run_dct, self.import_metadata_tags, self.in_databricks, src_user_id, self.use_src_user_id)
+        if dst_parent_run_id:
+            tags = [ RunTag(tag.key, dst_parent_run_id) if tag.key == utils.TAG_PARENT_ID else tag for tag in tags ]
+        run_data_importer.log_run_data(self.mlflow_client, run_id, params, metrics, tags)
+        if self.source_run_tag:
+            self.mlflow_client.set_tag(run_id, imported_run_index.TAG_DATA_IMPORTED, "true")
 
     def _upload_databricks_notebook(self, input_dir, src_run_dct, dst_notebook_dir):
         run_id = src_run_dct["info"]["run_id"]
@@ -121,13 +171,13 @@ class RunImporter():
         notebook_name = os.path.basename(src_notebook_path)
 
         format = "source" 
-        notebook_path = os.path.join(input_dir,"artifacts","notebooks",f"{notebook_name}.{format}")
-        if not os.path.exists(notebook_path): 
-            print(f"WARNING: Source '{notebook_path}' does not exist for run_id '{run_id}'")
-            return
-
-        with open(notebook_path, "r") as f:
-            content = f.read()
+        with blob_store.artifacts_dir(input_dir) as artifacts_dir:
+            notebook_path = os.path.join(artifacts_dir or os.path.join(input_dir,"artifacts"),"notebooks",f"{notebook_name}.{format}")
+            if not os.path.exists(notebook_path): 
+                print(f"WARNING: Source '{notebook_path}' does not exist for run_id '{run_id}'")
+                return
+            with open(notebook_path, "r") as f:
+                content = f.read()
         dst_notebook_path = os.path.join(dst_notebook_dir,notebook_name)
         content = base64.b64encode(content.encode()).decode("utf-8")
         data = {
@@ -145,6 +195,44 @@ class RunImporter():
             print(f"WARNING: Cannot save notebook '{dst_notebook_path}'. {e}")
 
 
+def _write_mlmodel_with_run_id(src_path, dst_path, run_id):
+    with open(src_path, "r") as f:
+        mlmodel = yaml.safe_load(f)
+    mlmodel["run_id"] = run_id
+    with open(dst_path, "w") as f:
+        yaml.dump(mlmodel, f)
+
+@contextmanager
+def _mlmodel_fixed_dir(artifacts_dir, run_id):
+    """
+    Yields a view of a local artifacts directory whose MLmodel files have the destination run ID so they are
+    uploaded once already patched. If there are no MLmodel files the directory itself is yielded. Otherwise the
+    tree is mirrored in a temporary directory with symbolic links to the files (or copies where links are not
+    supported) and patched MLmodel files. The exported files, which may be hard links to shared blobs, are not modified.
+    """
+    mlmodel_found = any("MLmodel" in names for _, _, names in os.walk(artifacts_dir))
+    if not mlmodel_found:
+        yield artifacts_dir
+        return
+    with tempfile.TemporaryDirectory() as staging_dir:
+        for root, _, names in os.walk(artifacts_dir):
+            dst_root = os.path.join(staging_dir, os.path.relpath(root, artifacts_dir))
+            os.makedirs(dst_root, exist_ok=True)
+            for name in names:
+                src_path = os.path.join(root, name)
+                dst_path = os.path.join(dst_root, name)
+                if name == "MLmodel":
+                    _write_mlmodel_with_run_id(src_path, dst_path, run_id)
+                else:
+                    _symlink_or_copy(os.path.abspath(src_path), dst_path)
+        yield staging_dir
+
+def _symlink_or_copy(src, dst):
+    try:
+        os.symlink(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
 @click.command()
 @click.option("--input-dir",
     help="Source input directory that contains the exported run.", 
@@ -157,7 +245,7 @@ class RunImporter():
     required=True
 )
 @click.option("--mlmodel-fix",
-    help="Add correct run ID in destination MLmodel artifact. Can be expensive for deeply nested artifacts.", 
+    help="Add correct run ID in destination MLmodel artifact. MLmodel files are patched locally before upload.", 
     type=bool, 
     default=True, 
     show_default=True
@@ -186,8 +274,14 @@ class RunImporter():
     required=False, 
     show_default=True
 )
+@click.option("--artifact-workers",
+    help=click_doc.import_artifact_workers,
+    type=int,
+    default=8,
+    show_default=True
+)
 def main(input_dir, experiment_name, mlmodel_fix, use_src_user_id, \
-        import_metadata_tags, dst_notebook_dir, dst_notebook_dir_add_run_id):
+        import_metadata_tags, dst_notebook_dir, dst_notebook_dir_add_run_id, artifact_workers):
     print("Options:")
     for k,v in locals().items():
         print(f"  {k}: {v}")
@@ -196,7 +290,8 @@ def main(input_dir, experiment_name, mlmodel_fix, use_src_user_id, \
         mlmodel_fix=mlmodel_fix, 
         use_src_user_id=use_src_user_id, 
         import_metadata_tags=import_metadata_tags, 
-        dst_notebook_dir_add_run_id=dst_notebook_dir_add_run_id)
+        dst_notebook_dir_add_run_id=dst_notebook_dir_add_run_id,
+        artifact_workers=artifact_workers)
     importer.import_run(experiment_name, input_dir, dst_notebook_dir)
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+"""
+Index of the runs of a destination experiment by the source run they were imported from.
+Lets an experiment import be rerun without duplicating the runs that were already imported.
+"""
+
+from mlflow.entities import RunStatus
+from mlflow_export_import import utils
+from mlflow_export_import.common.iterators import SearchRunsIterator
+
+# What to do with a source run that was already imported into the destination experiment.
+# 'duplicate' imports it again. 'resume' and 'replace' skip FINISHED runs. A partially imported run
+# is imported again in place with 'resume' and is deleted and imported as a new run with 'replace'.
+# 'resume' only continues a run whose params, metrics and tags were all logged and imports its artifacts again.
+# A run whose data was partially logged is replaced since stores such as FileStore would append its metric steps again.
+EXISTING_RUNS_MODES = [ "duplicate", "resume", "replace" ]
+
+TAG_SRC_RUN_ID = f"{utils.TAG_PREFIX_SRC_RUN}.run_id"
+TAG_DATA_IMPORTED = f"{utils.TAG_PREFIX_SRC_RUN}.data_imported"
+TAG_METADATA_RUN_ID = f"{utils.TAG_PREFIX_METADATA}.run_id"
+
+
+def get_source_run_id(run):
+    """ Returns the source run ID of an imported run from its source run tag or its import metadata tag. """
+    tags = run.data.tags
+    return tags.get(TAG_SRC_RUN_ID) or tags.get(TAG_METADATA_RUN_ID)
+
+def index_imported_runs(mlflow_client, experiment_id):
+    """
+    Indexes the runs of an experiment with one paged search.
+    If a source run was imported more than once the FINISHED run is preferred and then the latest one.
+    :return: Dict of source run ID to destination run.
+    """
+    index = {}
+    for run in SearchRunsIterator(mlflow_client, experiment_id):
+        src_run_id = get_source_run_id(run)
+        if src_run_id and (src_run_id not in index or _preference(run) > _preference(index[src_run_id])):
+            index[src_run_id] = run
+    return index
+
+def is_finished(run):
+    return run.info.status == RunStatus.to_string(RunStatus.FINISHED)
+
+def is_data_imported(run):
+    """ Returns True if all params, metrics and tags of the run were logged. """
+    return run.data.tags.get(TAG_DATA_IMPORTED) == "true"
+
+def _preference(run):
+    return (is_finished(run), run.info.start_time or 0)
@@ -3,65 +3,159 @@ Module to account for importing MLflow run data (params, metrics and tags) that
 See: https://www.mlflow.org/docs/latest/rest-api.html#request-limits.
 """
 
-import mlflow
-import math 
+import os
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from mlflow.entities import Metric, Param, RunTag
+from mlflow.utils.validation import MAX_PARAMS_TAGS_PER_BATCH, MAX_METRICS_PER_BATCH, MAX_ENTITIES_PER_BATCH, MAX_BATCH_LOG_REQUEST_SIZE
 from mlflow_export_import import utils
+from mlflow_export_import.run import columnar_metrics
+from mlflow_export_import.run import run_json
 
-def _log_data(run_dct, run_id, batch_size, get_data, log_data, args_get_data=None):
-    metadata = get_data(run_dct, args_get_data)
-    num_batches = int(math.ceil(len(metadata) / batch_size))
-    res = []
-    for j in range(0,num_batches):
-        start = j * batch_size 
-        end = start + batch_size
-        batch = metadata[start:end]
-        log_data(run_id, batch)
-        res = res + batch
-    
-def log_params(client, run_dct, run_id, batch_size):
-    def get_data(run_dct, args):
-        return [ Param(k,v) for k,v in run_dct["params"].items() ]
-    def log_data(run_id, params):
-        client.log_batch(run_id, params=params)
-    _log_data(run_dct, run_id, batch_size, get_data, log_data)
+# Estimated JSON bytes of an entity beyond its key and value, and of the request envelope.
+_ENTITY_OVERHEAD_SIZE = 100
+_REQUEST_OVERHEAD_SIZE = 1000
 
-def log_metrics(client, run_dct, run_id, batch_size):
-    def get_data(run_dct, args=None):
-        metrics = []
-        for metric,steps in  run_dct["metrics"].items():
+def get_params(run_dct):
+    return [ Param(k,v) for k,v in run_dct["params"].items() ]
+
+def iter_metrics(run_dct, input_dir=None):
+    """
+    Generator of the Metric entities of each metric step. If the run was exported in the columnar format they are read
+    from its metrics file in input_dir. If run_dct was read without its metrics they are streamed from input_dir's run.json.
+    """
+    metrics_file = run_dct.get("metrics_file")
+    if metrics_file:
+        yield from columnar_metrics.iter_metric_entities(os.path.join(input_dir, metrics_file))
+    elif "metrics" not in run_dct:
+        for key,step in run_json.iter_metrics(os.path.join(input_dir, "run.json")):
+            yield Metric(key, step["value"], step["timestamp"], step["step"])
+    else:
+        for metric,steps in run_dct["metrics"].items():
             for step in steps:
-                metrics.append(Metric(metric,step["value"],step["timestamp"],step["step"]))
-        return metrics
-    def log_data(run_id, metrics):
-        client.log_batch(run_id, metrics=metrics)
-    _log_data(run_dct, run_id, batch_size, get_data, log_data)
+                yield Metric(metric,step["value"],step["timestamp"],step["step"])
+
+def get_tags(run_dct, import_metadata_tags, in_databricks, src_user_id, use_src_user_id):
+    tags = run_dct["tags"]
+    if not import_metadata_tags: # remove mlflow_export_import tags
+        tags = { k:v for k,v in tags.items() if not k.startswith(utils.TAG_PREFIX_METADATA) }
+    # remove the source run tags of a run that was itself imported - this import sets its own
+    tags = { k:v for k,v in tags.items() if not k.startswith(utils.TAG_PREFIX_SRC_RUN) }
+    tags = utils.create_mlflow_tags_for_databricks_import(tags) # remove "mlflow" tags that cannot be imported into Databricks
+    tags = [ RunTag(k,str(v)) for k,v in tags.items() ]
+    if not in_databricks:
+        utils.set_dst_user_id(tags, src_user_id, use_src_user_id)
+    return tags
+
+
+class _Batch():
+    def __init__(self, params=None, tags=None):
+        self.params = params or []
+        self.tags = tags or []
+        self.metrics = []
+        self.size = _REQUEST_OVERHEAD_SIZE + sum(_entity_size(e) for e in self.params + self.tags)
+
+    def num_entities(self):
+        return len(self.params) + len(self.tags) + len(self.metrics)
+
+    def add_metric(self, metric):
+        """ Adds the metric if the batch has room for it. """
+        size = _entity_size(metric)
+        if len(self.metrics) >= MAX_METRICS_PER_BATCH or self.num_entities() >= MAX_ENTITIES_PER_BATCH \
+                or self.size + size > MAX_BATCH_LOG_REQUEST_SIZE:
+            return False
+        self.metrics.append(metric)
+        self.size += size
+        return True
 
-def log_tags(client, run_dct, run_id, batch_size, import_metadata_tags, in_databricks, src_user_id, use_src_user_id):
-    def get_data(run_dct, args):
-        tags = run_dct["tags"]
-        if not import_metadata_tags: # remove mlflow_export_import tags
-            tags = { k:v for k,v in tags.items() if not k.startswith(utils.TAG_PREFIX_METADATA) }
-        tags = utils.create_mlflow_tags_for_databricks_import(tags) # remove "mlflow" tags that cannot be imported into Databricks
-        tags = [ RunTag(k,str(v)) for k,v in tags.items() ]
-        if not in_databricks:
-            utils.set_dst_user_id(tags, args["src_user_id"], args["use_src_user_id"])
-        return tags
+def _entity_size(entity):
+    return len(entity.key) + len(str(entity.value)) + _ENTITY_OVERHEAD_SIZE
 
-    def log_data(run_id, tags):
-        client.log_batch(run_id, tags=tags)
+def _chunk(entities, max_entities):
+    """ Splits params or tags into chunks within the per-type count limit and the request size limit. """
+    chunks, chunk, size = [], [], _REQUEST_OVERHEAD_SIZE
+    for entity in entities:
+        entity_size = _entity_size(entity)
+        if chunk and (len(chunk) == max_entities or size + entity_size > MAX_BATCH_LOG_REQUEST_SIZE // 2):
+            chunks.append(chunk)
+            chunk, size = [], _REQUEST_OVERHEAD_SIZE
+        chunk.append(entity)
+        size += entity_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
 
-    args_get = {
-        "import_metadata_tags": import_metadata_tags, 
-        "in_databricks": in_databricks, 
-        "src_user_id": src_user_id,
-        "use_src_user_id": use_src_user_id
-    }
+def pack_batches(params, metrics, tags):
+    """
+    Generator of batches that pack params, metrics and tags into as few log_batch calls as MLflow's limits allow -
+    100 params and 100 tags, 1000 metrics and 1000 entities in all per batch, and at most 1MB per request.
+    Params and tags are spread over the first batches and metrics fill the remaining room.
+    Metrics are consumed lazily so only the batches not yet yielded are held in memory.
+    A chunk of params or tags is capped at half the request size so the two of them always fit in one batch.
+    :param params: List of Param entities.
+    :param metrics: Iterable of Metric entities.
+    :param tags: List of RunTag entities.
+    :return: Generator of (params, metrics, tags) tuples.
+    """
+    param_chunks = _chunk(params, MAX_PARAMS_TAGS_PER_BATCH)
+    tag_chunks = _chunk(tags, MAX_PARAMS_TAGS_PER_BATCH)
+    pending = deque(_Batch(param_chunks[j] if j < len(param_chunks) else None, tag_chunks[j] if j < len(tag_chunks) else None)
+        for j in range(max(len(param_chunks), len(tag_chunks))))
+    batch = pending.popleft() if pending else _Batch()
+    for metric in metrics:
+        while not batch.add_metric(metric):
+            yield batch.params, batch.metrics, batch.tags
+            batch = pending.popleft() if pending else _Batch()
+    while True:
+        if batch.num_entities() > 0:
+            yield batch.params, batch.metrics, batch.tags
+        if not pending:
+            break
+        batch = pending.popleft()
 
-    _log_data(run_dct, run_id, batch_size, get_data, log_data, args_get)
+def log_run_data(client, run_id, params, metrics, tags, max_workers=4):
+    """
+    Logs a run's params, metrics and tags with as few log_batch calls as possible. Batches are sent concurrently
+    over max_workers lanes that each send their batches in order. A batch that continues the history of the
+    previous batch's last metric key goes to the same lane so the steps of a metric are logged in export order,
+    which matters for stores such as FileStore that append each step. Param and tag keys are unique.
+    At most twice the number of lanes of batches are in flight so streamed metrics stay bounded in memory.
+    :param client: MLflow client.
+    :param run_id: Destination run ID.
+    :param params: List of Param entities.
+    :param metrics: Iterable of Metric entities. The steps of each metric key must be contiguous.
+    :param tags: List of RunTag entities.
+    :param max_workers: Maximum number of concurrent log_batch calls.
+    :return: Number of log_batch calls.
+    """
+    def log_batch(batch):
+        params, metrics, tags = batch
+        client.log_batch(run_id, metrics=metrics, params=params, tags=tags)
 
-if __name__ == "__main__":
-    import sys
-    client = mlflow.tracking.MlflowClient()
-    #log_params(client, sys.argv[1],10)
-    log_metrics(client, sys.argv[1],100)
+    batches = pack_batches(params, metrics, tags)
+    num_batches = 0
+    if max_workers <= 1:
+        for batch in batches:
+            log_batch(batch)
+            num_batches += 1
+        return num_batches
+    lanes = [ ThreadPoolExecutor(max_workers=1) for _ in range(max_workers) ]
+    try:
+        futures = deque()
+        lane, last_key = 0, None
+        for batch in batches:
+            metrics = batch[1]
+            if not metrics or metrics[0].key != last_key:
+                lane = (lane + 1) % max_workers
+            last_key = metrics[-1].key if metrics else None
+            futures.append(lanes[lane].submit(contextvars.copy_context().run, log_batch, batch))
+            num_batches += 1
+            if len(futures) >= 2 * max_workers:
+                futures.popleft().result()
+        while futures:
+            futures.popleft().result()
+    finally:
+        for executor in lanes:
+            executor.shutdown(wait=True)
+    return num_batches
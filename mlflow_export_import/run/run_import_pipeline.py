@@ -0,0 +1,65 @@
+"""
+Pipelined import of the runs of an experiment.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from mlflow_export_import.common import mlflow_utils
+
+
+class RunImportPipeline():
+    """
+    Imports runs in overlapping stages. Run creation and termination, data logging (params, metrics and tags)
+    and artifact upload each have their own bounded pool so one run's slow artifact upload does not idle the others.
+    The data and artifacts of a created run are imported concurrently.
+    At most twice the pool size of runs are in flight. When a stage's pool is busy the runs waiting on it hold back
+    the creation of further runs.
+    """
+    def __init__(self, run_importer, max_workers=4):
+        """
+        :param run_importer: RunImporter that implements the stages.
+        :param max_workers: Size of each stage's pool.
+        """
+        self.run_importer = run_importer
+        self.max_workers = max(1, max_workers)
+
+    def import_runs(self, exp_name, input_dirs, dst_notebook_dir=None, existing_runs=None, dst_parent_run_ids=None):
+        """
+        :param exp_name: Destination experiment name.
+        :param input_dirs: Directories of the exported runs.
+        :param dst_notebook_dir: Databricks destination workpsace directory for notebooks.
+        :param existing_runs: List of the partially imported destination run to resume, or None, for each input directory.
+        :param dst_parent_run_ids: List of the destination parent run ID, or None, for each input directory.
+        :return: List of the run and its source parent run ID for each input directory in input order.
+        """
+        importer = self.run_importer
+        experiment_id = mlflow_utils.set_experiment(importer.mlflow_client, lambda: importer.dbx_client, exp_name)
+
+        def submit(executor, func, *args):
+            return executor.submit(contextvars.copy_context().run, func, *args)
+
+        def import_run(input_dir, existing_run, dst_parent_run_id):
+            print(f"Importing run from '{input_dir}'")
+            run, src_run_dct = submit(run_pool, importer._create_run, experiment_id, input_dir, existing_run).result()
+            run_id = run.info.run_id
+            futures = []
+            if not existing_run: # the data of a resumed run was already logged
+                futures.append(submit(data_pool, importer._run_stage, run_id, importer._import_run_data, src_run_dct, run_id, src_run_dct["info"]["user_id"], input_dir, dst_parent_run_id))
+            futures.append(submit(artifact_pool, importer._run_stage, run_id, importer._import_artifacts, run, src_run_dct, input_dir))
+            wait(futures)
+            for future in futures:
+                future.result()
+            res = submit(run_pool, importer._finish_run, run, src_run_dct, input_dir, dst_notebook_dir).result()
+            print(f"Imported run into '{exp_name}/{run_id}'")
+            return res
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as run_pool, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as data_pool, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as artifact_pool, \
+                ThreadPoolExecutor(max_workers=2*self.max_workers) as driver_pool:
+            existing_runs = existing_runs or [ None ] * len(input_dirs)
+            dst_parent_run_ids = dst_parent_run_ids or [ None ] * len(input_dirs)
+            futures = [ submit(driver_pool, import_run, input_dir, existing_run, dst_parent_run_id)
+                for input_dir, existing_run, dst_parent_run_id in zip(input_dirs, existing_runs, dst_parent_run_ids) ]
+            wait(futures)
+            return [ future.result() for future in futures ]
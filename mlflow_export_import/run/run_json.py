@@ -0,0 +1,234 @@
+"""
+Streaming writer and incremental reader of run.json so that runs with very long metric histories
+are exported and imported in bounded memory.
+The file layout is the same as a json.dump of the run dict so either side can be used with older exports.
+The 'metrics' field is written after the run's other fields so a reader that only needs those can stop at it.
+"""
+
+import os
+import re
+import json
+from mlflow_export_import.common.filesystem import mk_local_path
+from mlflow_export_import.common import encoding
+
+CHUNK_SIZE = 1024 * 1024
+
+_STRUCTURE_CHARS = re.compile(r'["\[\]{}]')
+_STRING_REST = re.compile(r'(?:[^"\\]|\\.)*"', re.S)
+
+
+class RunJsonWriter():
+    """
+    Writes the top-level fields of a run.json one at a time. Metric histories are appended step by step.
+    The file is written to a temporary path and renamed on close so a partial run.json is never left behind.
+    Usage:
+        with RunJsonWriter(path) as writer:
+            writer.write_field("info", info)
+            writer.begin_metrics()
+            writer.write_metric("rmse", steps)
+            writer.end_metrics()
+    """
+    def __init__(self, path):
+        self.path = mk_local_path(path)
+        self.tmp_path = f"{self.path}.tmp"
+        self.f = None
+        self.num_fields = 0
+        self.num_metrics = 0
+
+    def __enter__(self):
+        self.f = encoding.open_text(self.tmp_path, "w")
+        self.compact = encoding.is_compact()
+        self.f.write("{")
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.f.write("}\n" if self.compact else "\n}\n")
+            self.f.close()
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.f.close()
+            os.remove(self.tmp_path)
+
+    def write_field(self, key, value):
+        self._begin_field(key)
+        self.f.write(encoding.dumps(value) if self.compact else json.dumps(value, indent=2).replace("\n", "\n  "))
+
+    def begin_metrics(self):
+        self._begin_field("metrics")
+        self.f.write("{")
+        self.num_metrics = 0
+
+    def write_metric(self, key, steps):
+        """ Writes the history of one metric. steps is any iterable of { value, timestamp, step } dicts. """
+        self._write_separator(self.num_metrics, 4)
+        self.f.write(f"{json.dumps(key)}:" if self.compact else f"{json.dumps(key)}: ")
+        self.f.write("[")
+        for j,step in enumerate(steps):
+            self._write_separator(j, 6)
+            self.f.write(encoding.dumps(step) if self.compact else json.dumps(step))
+        self.f.write("]" if self.compact else "\n    ]")
+        self.num_metrics += 1
+
+    def end_metrics(self):
+        self.f.write("\n  }" if self.num_metrics and not self.compact else "}")
+
+    def _begin_field(self, key):
+        self._write_separator(self.num_fields, 2)
+        self.f.write(f"{json.dumps(key)}:" if self.compact else f"{json.dumps(key)}: ")
+        self.num_fields += 1
+
+    def _write_separator(self, idx, indent):
+        """ Writes the separator before the idx-th element of an object or array. """
+        if self.compact:
+            self.f.write("," if idx else "")
+        else:
+            self.f.write(("," if idx else "") + "\n" + " "*indent)
+
+
+class _Scanner():
+    """ Incremental JSON scanner over a file that holds at most one chunk plus the current value in memory. """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read_more(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Returns the next non-whitespace character without consuming it. """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                raise ValueError("Unexpected end of JSON")
+
+    def expect(self, chars):
+        ch = self.peek()
+        if ch not in chars:
+            raise ValueError(f"Expected one of '{chars}' but found '{ch}' at offset {self.pos}")
+        self.pos += 1
+        return ch
+
+    def decode(self):
+        """ Decodes the next complete JSON value, reading more of the file until it is complete. """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                if end < len(self.buf) or self.eof: # a number at the end of the buffer may be truncated
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._read_more():
+                value, self.pos = self.decoder.raw_decode(self.buf, self.pos)
+                return value
+
+    def iter_object(self):
+        """ Generator of the keys of an object. The caller must consume each key's value before the next key. """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def iter_array(self):
+        """ Generator of the values of an array. """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.expect(",]") == "]":
+                return
+
+    def skip_value(self):
+        """ Skips a value. Arrays and objects are skipped by matching brackets without decoding their elements. """
+        if self.peek() in "[{":
+            self._skip_container()
+        else:
+            self.decode()
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            m = _STRUCTURE_CHARS.search(self.buf, self.pos)
+            if not m:
+                self.pos = len(self.buf)
+                self._read_more_or_fail()
+                continue
+            ch = m.group()
+            if ch == '"':
+                end = _STRING_REST.match(self.buf, m.end())
+                if not end: # the string continues in the next chunk
+                    self.pos = m.start()
+                    self._read_more_or_fail()
+                    continue
+                self.pos = end.end()
+                continue
+            self.pos = m.end()
+            depth += 1 if ch in "[{" else -1
+            if depth == 0:
+                return
+
+    def _read_more_or_fail(self):
+        if not self._read_more():
+            raise ValueError("Unexpected end of JSON")
+
+def read_run(path, skip_metrics=True, fields=None):
+    """
+    Reads run.json. With skip_metrics the 'metrics' field is left out of the returned dict.
+    Use iter_metrics() to stream it.
+    Since 'metrics' is the last run field, reading stops there and trailing fields such as 'instrumentation' are not returned.
+    Older exports that have 'tags' after 'metrics' are skipped through instead.
+    :param fields: If set, only these fields are returned and reading stops as soon as all of them have been read.
+    """
+    with encoding.open_text(path, "r") as f:
+        scanner = _Scanner(f)
+        dct = {}
+        for key in scanner.iter_object():
+            if fields is not None and key not in fields:
+                scanner.skip_value()
+            elif key == "metrics" and skip_metrics:
+                if "tags" in dct:
+                    break
+                scanner.skip_value()
+            else:
+                dct[key] = scanner.decode()
+                if fields is not None and len(dct) == len(fields):
+                    break
+        return dct
+
+def iter_metrics(path):
+    """ Generator of (metric key, step dict) for each step of each metric history of run.json. """
+    with encoding.open_text(path, "r") as f:
+        scanner = _Scanner(f)
+        for key in scanner.iter_object():
+            if key != "metrics":
+                scanner.skip_value()
+                continue
+            for metric_key in scanner.iter_object():
+                for step in scanner.iter_array():
+                    yield metric_key, step
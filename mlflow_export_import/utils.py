@@ -1,10 +1,12 @@
 import os
 import json
 import time
-from tabulate import tabulate
-import pandas as pd
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import mlflow
 from . import mk_local_path
+from mlflow_export_import.common import encoding
 
 TAG_PREFIX_METADATA = "mlflow_export_import.metadata"
 TAG_PREFIX_SRC_RUN = "mlflow_export_import.source_run"
@@ -68,14 +70,20 @@ def strip_underscores(obj):
     return { k[1:]:v for (k,v) in obj.__dict__.items() }
 
 def write_json_file(fs, path, dct):
-    fs.write(path, json.dumps(dct,indent=2)+"\n")
+    """ Writes a JSON file in the configured export encoding. Compressed files are written through the local path. """
+    if encoding.is_compressed():
+        with encoding.open_text(path, "w") as f:
+            f.write(encoding.dumps(dct)+"\n")
+    else:
+        fs.write(path, encoding.dumps(dct)+"\n")
 
 def write_file(path, content):
     with open(mk_local_path(path), 'wb') as f:
         f.write(content)
 
 def read_json_file(path):
-    with open(mk_local_path(path), "r") as f:
+    """ Reads a JSON file of any export encoding. """
+    with encoding.open_text(path, "r") as f:
         return json.loads(f.read())
 
 def string_to_list(list_as_string):
@@ -87,16 +95,56 @@ def get_user_id():
     from mlflow.tracking.context.default_context import _get_user
     return _get_user()
 
-def nested_tags(dst_client, run_ids_mapping):
+def group_by_nesting_level(parent_run_ids):
     """
-    Set the new parentRunId for new imported child runs.
+    Orders runs so that parent runs come before their child runs.
+    :param parent_run_ids: Dict of run ID to its parent run ID or None.
+    :return: List of lists of run IDs. Level 0 holds the runs without a parent among the runs and each following level
+             the children of the runs of the previous level. Runs caught in a parent cycle are put in a last level.
     """
+    levels = []
+    placed = set()
+    remaining = dict(parent_run_ids)
+    while remaining:
+        level = [ run_id for run_id, parent_run_id in remaining.items()
+            if parent_run_id is None or parent_run_id in placed or parent_run_id not in parent_run_ids ]
+        if not level:
+            levels.append(list(remaining.keys()))
+            break
+        levels.append(level)
+        placed.update(level)
+        for run_id in level:
+            del remaining[run_id]
+    return levels
+
+def nested_tags(dst_client, run_ids_mapping, max_workers=8):
+    """
+    Set the new parentRunId for new imported child runs whose parent tag was not set when they were imported.
+    Entries with a 'dst_parent_run_id' equal to their parent's new run ID are already correct and are skipped.
+    Child runs whose parent run was not imported are left as is. The tags are set concurrently.
+    :param run_ids_mapping: Dict of source run ID to a dict with 'dst_run_id', 'src_parent_run_id' and optionally 'dst_parent_run_id'.
+    :param max_workers: Maximum number of concurrent set_tag calls.
+    :return: Number of runs whose parent tag was set.
+    """
+    fixes = []
     for _,v in run_ids_mapping.items():
         src_parent_run_id = v.get("src_parent_run_id",None)
-        if src_parent_run_id:
-            dst_run_id = v["dst_run_id"]
+        if src_parent_run_id and src_parent_run_id in run_ids_mapping:
             dst_parent_run_id = run_ids_mapping[src_parent_run_id]["dst_run_id"]
-            dst_client.set_tag(dst_run_id, "mlflow.parentRunId", dst_parent_run_id)
+            if v.get("dst_parent_run_id") != dst_parent_run_id:
+                fixes.append((v["dst_run_id"], dst_parent_run_id))
+    if not fixes:
+        return 0
+    print(f"Setting the parent run tag of {len(fixes)} nested runs")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = deque()
+        for dst_run_id, dst_parent_run_id in fixes:
+            futures.append(executor.submit(contextvars.copy_context().run, dst_client.set_tag, dst_run_id, TAG_PARENT_ID, dst_parent_run_id))
+            if len(futures) >= 2 * max_workers:
+                futures.popleft().result()
+        while futures:
+            futures.popleft().result()
+    return len(fixes)
 
 def importing_into_databricks():
     return mlflow.tracking.get_tracking_uri().startswith("databricks")
@@ -107,11 +155,14 @@ def create_common_manifest(duration):
             "mlflow_version": mlflow.__version__,
             "mlflow_tracking_uri": mlflow.get_tracking_uri(),
             "export_time": get_now_nice(),
-            "duration": duration
+            "duration": duration,
+            "encoding": encoding.get_encoding()
         }
     }
 
 def show_table(title, lst, columns):
+    from tabulate import tabulate
+    import pandas as pd
     print(title)
     df = pd.DataFrame(lst, columns = columns)
     print(tabulate(df, headers="keys", tablefmt="psql", showindex=False))
@@ -22,6 +22,7 @@ setup(name="mlflow_export_import",
              "export-run = mlflow_export_import.run.export_run:main",
              "import-run = mlflow_export_import.run.import_run:main",
              "export-experiment = mlflow_export_import.experiment.export_experiment:main",
+             "export-experiment-async = mlflow_export_import.experiment.export_experiment_async:main",
              "import-experiment = mlflow_export_import.experiment.import_experiment:main",
              "export-experiments = mlflow_export_import.bulk.export_experiments:main",
              "import-experiments = mlflow_export_import.bulk.import_experiments:main",
@@ -0,0 +1,236 @@
+import os
+import threading
+import pytest
+from types import SimpleNamespace
+from mlflow.entities import FileInfo
+from mlflow.store.artifact.s3_artifact_repo import S3ArtifactRepository
+from mlflow.store.artifact.gcs_artifact_repo import GCSArtifactRepository
+from mlflow.store.artifact.azure_blob_artifact_repo import AzureBlobArtifactRepository
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import artifact_transfer
+from mlflow_export_import.common.artifact_transfer import ArtifactDownloader, ArtifactUploader, ArtifactCopier
+from utils_test import create_output_dir, output_dir
+
+_files = { "model/model.pkl": b"pickle", "model/conda.yaml": b"conda", "info.txt": b"hi", "dir2/a/b.txt": b"deep" }
+
+def _list_tree(tree, path):
+    prefix = f"{path}/" if path else ""
+    children = {}
+    for file_path, content in tree.items():
+        if not file_path.startswith(prefix):
+            continue
+        name = file_path[len(prefix):].split("/")[0]
+        child = prefix + name
+        children[child] = FileInfo(child, False, len(content)) if child == file_path else FileInfo(child, True, None)
+    return list(children.values())
+
+class _FakeClient():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.downloads = []
+    def list_artifacts(self, run_id, path=""):
+        return _list_tree(_files, path)
+    def download_artifacts(self, run_id, path, dst_path):
+        with self.lock:
+            self.downloads.append(path)
+        local_path = os.path.join(dst_path, path)
+        with open(local_path, "wb") as f:
+            f.write(_files[path])
+        return local_path
+
+def _read_tree(dir):
+    tree = {}
+    for root, _, names in os.walk(dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, dir).replace(os.sep, "/")] = f.read()
+    return tree
+
+def test_download():
+    create_output_dir()
+    client = _FakeClient()
+    stats = ArtifactDownloader(client, max_workers=3).download("r1", output_dir)
+    assert _read_tree(output_dir) == _files
+    assert sorted(client.downloads) == sorted(_files.keys())
+    assert stats["files"] == 4
+    assert stats["skipped"] == 0
+    assert stats["bytes"] == sum(len(v) for v in _files.values())
+
+def test_download_resume():
+    create_output_dir()
+    os.makedirs(os.path.join(output_dir, "model"))
+    with open(os.path.join(output_dir, "model", "model.pkl"), "wb") as f:
+        f.write(b"pickle")
+    with open(os.path.join(output_dir, "model", "conda.yaml"), "wb") as f:
+        f.write(b"con") # truncated by an interrupted export
+    client = _FakeClient()
+    stats = ArtifactDownloader(client, max_workers=2).download("r1", output_dir)
+    assert _read_tree(output_dir) == _files
+    assert sorted(client.downloads) == [ "dir2/a/b.txt", "info.txt", "model/conda.yaml" ]
+    assert stats["skipped"] == 1
+
+def test_download_no_artifacts():
+    create_output_dir()
+    client = _FakeClient()
+    client.list_artifacts = lambda run_id, path="": []
+    stats = ArtifactDownloader(client).download("r1", os.path.join(output_dir, "artifacts"))
+    assert stats["files"] == 0
+    assert not os.path.exists(os.path.join(output_dir, "artifacts"))
+
+class _FakeUploadClient():
+    """ Destination run whose artifact store is a dict of artifact path to content. """
+    def __init__(self, store=None):
+        self.lock = threading.Lock()
+        self.store = dict(store or {})
+        self.uploads = []
+    def list_artifacts(self, run_id, path=""):
+        with self.lock:
+            return _list_tree(self.store, path)
+    def log_artifact(self, run_id, local_path, artifact_path=None):
+        path = f"{artifact_path}/{os.path.basename(local_path)}" if artifact_path else os.path.basename(local_path)
+        with open(local_path, "rb") as f:
+            content = f.read()
+        with self.lock:
+            self.store[path] = content
+            self.uploads.append(path)
+
+def test_upload():
+    create_output_dir()
+    _mk_store(output_dir, _files)
+    client = _FakeUploadClient()
+    stats = ArtifactUploader(client, max_workers=3).upload("r1", output_dir)
+    assert client.store == _files
+    assert stats["files"] == 4
+    assert stats["skipped"] == 0
+    assert stats["bytes"] == sum(len(v) for v in _files.values())
+    assert "bytes_per_second" in stats
+
+def test_upload_resume():
+    create_output_dir()
+    _mk_store(output_dir, _files)
+    client = _FakeUploadClient({ "model/model.pkl": b"pickle", "model/conda.yaml": b"con" }) # conda.yaml truncated by an interrupted import
+    stats = ArtifactUploader(client, max_workers=2).upload("r1", output_dir)
+    assert client.store == _files
+    assert sorted(client.uploads) == [ "dir2/a/b.txt", "info.txt", "model/conda.yaml" ]
+    assert stats["skipped"] == 1
+
+def _mk_store(dir, files):
+    for path, content in files.items():
+        path = os.path.join(dir, *path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+def test_copy_local():
+    create_output_dir()
+    src_dir = os.path.join(output_dir, "src", "artifacts")
+    dst_dir = os.path.join(output_dir, "dst", "artifacts")
+    _mk_store(src_dir, _files)
+    files = [ { "path": path, "size": len(content) } for path, content in _files.items() ]
+    stats = ArtifactCopier(max_workers=2).copy(src_dir, files, dst_dir)
+    assert _read_tree(dst_dir) == _files
+    assert stats["files"] == 4
+    assert stats["bytes"] == sum(len(v) for v in _files.values())
+
+def test_copy_size_mismatch():
+    create_output_dir()
+    src_dir = os.path.join(output_dir, "src", "artifacts")
+    _mk_store(src_dir, { "info.txt": b"changed since export" })
+    with pytest.raises(MlflowExportImportException):
+        ArtifactCopier().copy(src_dir, [ { "path": "info.txt", "size": 2 } ], os.path.join(output_dir, "dst"))
+
+def test_copy_rate_limited():
+    create_output_dir()
+    src_dir = os.path.join(output_dir, "src", "artifacts")
+    _mk_store(src_dir, _files)
+    files = [ { "path": path, "size": len(content) } for path, content in _files.items() ]
+    limiter = rate_limiter.configure({ "artifacts": 1000 })
+    try:
+        ArtifactCopier(max_workers=2).copy(src_dir, files, os.path.join(output_dir, "dst", "artifacts"))
+    finally:
+        rate_limiter.configure(None)
+    assert limiter.get_stats()["endpoint_classes"]["artifacts"]["requests"] == len(files)
+
+# == Copy inside an object store - fake store clients record the copies and no bytes go through the local file system
+
+class _FakeS3Client():
+    def __init__(self, objects):
+        self.objects = objects
+    def copy(self, src, bucket, key):
+        self.objects[(bucket, key)] = self.objects[(src["Bucket"], src["Key"])]
+    def head_object(self, Bucket, Key):
+        return { "ContentLength": len(self.objects[(Bucket, Key)]) }
+
+def _mk_s3_repo(uri, s3_client):
+    repo = S3ArtifactRepository(uri)
+    repo._get_s3_client = lambda: s3_client
+    return repo
+
+def test_copy_s3():
+    s3_client = _FakeS3Client({ ("src", "1/r1/artifacts/model/model.pkl"): b"pickle" })
+    src_repo = _mk_s3_repo("s3://src/1/r1/artifacts", s3_client)
+    dst_repo = _mk_s3_repo("s3://dst/2/r2/artifacts", s3_client)
+    size = ArtifactCopier()._copy_file(src_repo, dst_repo, { "path": "model/model.pkl", "size": 6 })
+    assert size == 6
+    assert s3_client.objects[("dst", "2/r2/artifacts/model/model.pkl")] == b"pickle"
+
+def test_copy_s3_size_mismatch():
+    s3_client = _FakeS3Client({ ("src", "r1/info.txt"): b"hi" })
+    with pytest.raises(MlflowExportImportException):
+        ArtifactCopier()._copy_file(_mk_s3_repo("s3://src/r1", s3_client), _mk_s3_repo("s3://dst/r2", s3_client), { "path": "info.txt", "size": 3 })
+
+class _FakeGcsBlob():
+    def __init__(self, objects, name):
+        self.objects, self.name, self.size = objects, name, None
+    def rewrite(self, src, token=None): # two calls as for a large object
+        if token is None:
+            return "token", 0, len(self.objects[src.name])
+        self.objects[self.name] = self.objects[src.name]
+        return None, len(self.objects[src.name]), len(self.objects[src.name])
+    def reload(self):
+        self.size = len(self.objects[self.name])
+
+def _mk_gcs_repo(uri, objects):
+    repo = GCSArtifactRepository.__new__(GCSArtifactRepository) # the constructor needs the GCS library
+    repo.artifact_uri = uri
+    repo._get_bucket = lambda bucket: SimpleNamespace(blob=lambda name: _FakeGcsBlob(objects, f"{bucket}/{name}"))
+    return repo
+
+def test_copy_gcs():
+    objects = { "src/r1/info.txt": b"hi" }
+    size = ArtifactCopier()._copy_file(_mk_gcs_repo("gs://src/r1", objects), _mk_gcs_repo("gs://dst/r2", objects), { "path": "info.txt", "size": 2 })
+    assert size == 2
+    assert objects["dst/r2/info.txt"] == b"hi"
+
+class _FakeAzureBlob():
+    def __init__(self, objects, container, name):
+        self.objects, self.key, self.polls = objects, (container, name), 0
+        self.url = f"https://account.blob.core.windows.net/{container}/{name}"
+    def start_copy_from_url(self, url):
+        self.src_key = tuple(url.split("/", 4)[3:])
+    def get_blob_properties(self):
+        self.polls += 1
+        if self.polls == 1:
+            return SimpleNamespace(copy=SimpleNamespace(status="pending"), size=None)
+        self.objects[self.key] = self.objects[self.src_key]
+        return SimpleNamespace(copy=SimpleNamespace(status="success"), size=len(self.objects[self.key]))
+
+def _mk_azure_repo(uri, objects):
+    client = SimpleNamespace(get_blob_client=lambda container, name: _FakeAzureBlob(objects, container, name))
+    return AzureBlobArtifactRepository(uri, client=client)
+
+def test_copy_azure(monkeypatch):
+    monkeypatch.setattr(artifact_transfer, "AZURE_COPY_POLL_INTERVAL", 0)
+    objects = { ("src", "r1/info.txt"): b"hi" }
+    src_repo = _mk_azure_repo("wasbs://src@account.blob.core.windows.net/r1", objects)
+    dst_repo = _mk_azure_repo("wasbs://dst@account.blob.core.windows.net/r2", objects)
+    assert ArtifactCopier()._copy_file(src_repo, dst_repo, { "path": "info.txt", "size": 2 }) == 2
+    assert objects[("dst", "r2/info.txt")] == b"hi"
+
+def test_copy_azure_other_account_streams():
+    src_repo = _mk_azure_repo("wasbs://src@account1.blob.core.windows.net/r1", {})
+    dst_repo = _mk_azure_repo("wasbs://dst@account2.blob.core.windows.net/r2", {})
+    assert artifact_transfer._get_copy_in_store(src_repo, dst_repo) is None
+    assert artifact_transfer._get_copy_in_store(_mk_s3_repo("s3://src/r1", None), dst_repo) is None
@@ -0,0 +1,53 @@
+import os
+from mlflow_export_import.common.blob_store import BlobStore, artifacts_dir, ARTIFACTS_MANIFEST, BLOBS_DIR
+from utils_test import create_output_dir, output_dir
+
+def _mk_run_dir(run_id, files):
+    run_dir = os.path.join(output_dir, "runs", run_id)
+    for path, content in files.items():
+        path = os.path.join(run_dir, "artifacts", path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+    return run_dir
+
+def _read_tree(dir):
+    tree = {}
+    for root, _, names in os.walk(dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "r") as f:
+                tree[os.path.relpath(path, dir)] = f.read()
+    return tree
+
+def test_dedup_and_rehydrate():
+    create_output_dir()
+    files1 = { "model/model.pkl": "pickle", "model/conda.yaml": "conda", "info.txt": "run 1" }
+    files2 = { "model/model.pkl": "pickle", "model/conda.yaml": "conda", "info.txt": "run 2" }
+    run_dir1 = _mk_run_dir("r1", files1)
+    run_dir2 = _mk_run_dir("r2", files2)
+    store = BlobStore(os.path.join(output_dir, BLOBS_DIR))
+    store.dedup_artifacts(run_dir1)
+    store.dedup_artifacts(run_dir2)
+
+    assert not os.path.exists(os.path.join(run_dir1, "artifacts"))
+    assert os.path.exists(os.path.join(run_dir1, ARTIFACTS_MANIFEST))
+    stats = store.get_stats()
+    assert stats["files"] == 6
+    assert stats["blobs"] == 4
+    assert stats["deduplicated_bytes"] == len("pickle") + len("conda")
+
+    for run_dir, files in [ (run_dir1, files1), (run_dir2, files2) ]:
+        with artifacts_dir(run_dir) as dir:
+            assert _read_tree(dir) == { k.replace("/", os.sep):v for k,v in files.items() }
+
+def test_artifacts_dir_not_deduplicated():
+    create_output_dir()
+    run_dir = _mk_run_dir("r1", { "info.txt": "hi" })
+    with artifacts_dir(run_dir) as dir:
+        assert dir == os.path.join(run_dir, "artifacts")
+
+def test_artifacts_dir_no_artifacts():
+    create_output_dir()
+    with artifacts_dir(os.path.join(output_dir, "r1")) as dir:
+        assert dir is None
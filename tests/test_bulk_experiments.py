@@ -7,6 +7,8 @@ from compare_utils import compare_runs
 
 from mlflow_export_import.bulk.export_experiments import export_experiments
 from mlflow_export_import.bulk.import_experiments import import_experiments
+from mlflow_export_import.experiment.export_experiment_async import AsyncExperimentExporter
+from mlflow_export_import import utils
 
 notebook_formats = "SOURCE,DBC"
 exp_suffix = "_Imported"
@@ -38,7 +40,7 @@ def create_test_experiment(num_runs):
 
 # == Export/import Experiments tests
 
-def _run_test(compare_func, export_metadata_tags=False, use_threads=False):
+def _run_test(compare_func, export_metadata_tags=False, use_threads=False, blobs_dir=None):
     create_output_dir()
     exps = [ create_test_experiment(3), create_test_experiment(4) ]
     exp_names = [ exp.name for exp in exps ]
@@ -46,7 +48,8 @@ def _run_test(compare_func, export_metadata_tags=False, use_threads=False):
         output_dir=output_dir,
         export_metadata_tags=export_metadata_tags,
         notebook_formats=notebook_formats,
-        use_threads=use_threads)
+        use_threads=use_threads,
+        blobs_dir=blobs_dir)
 
     import_experiments(output_dir, experiment_name_suffix=exp_suffix, use_src_user_id=False, import_metadata_tags=False, use_threads=False)
 
@@ -70,6 +73,26 @@ def test_exp_basic_threads():
 def test_exp_import_metadata_tags(): 
     _run_test(compare_runs, export_metadata_tags=True)
 
+def test_exp_dedup_artifacts():
+    _run_test(compare_runs, blobs_dir=os.path.join(output_dir, "blobs"))
+    manifest = utils.read_json_file(os.path.join(output_dir, "manifest.json"))
+    stats = manifest["info"]["blob_store"]
+    assert stats["files"] > stats["blobs"]
+    assert stats["deduplicated_bytes"] > 0
+
+def test_exp_async_many_runs():
+    create_output_dir()
+    exp = create_test_experiment(6)
+    exporter = AsyncExperimentExporter(max_metadata_requests=3, max_artifact_requests=2)
+    res = exporter.export_experiment(exp.name, output_dir)
+    assert res == (6, 0)
+    manifest = utils.read_json_file(os.path.join(output_dir, "manifest.json"))
+    run_ids = [ run.info.run_id for run in client.search_runs(exp.experiment_id, "") ]
+    assert set(manifest["export_info"]["ok_runs"]) == set(run_ids)
+    for run_id in run_ids:
+        assert os.path.exists(os.path.join(output_dir, run_id, "run.json"))
+        assert os.path.exists(os.path.join(output_dir, run_id, "artifacts", "model", "MLmodel"))
+
 def test_get_experiment_ids_from_comma_delimited_string():
     exp_ids = bulk_utils.get_experiment_ids("exp1,exp2,exp3")
     assert len(exp_ids) == 3
@@ -85,3 +108,24 @@ def test_get_experiment_ids_from_list():
     exp_ids1 = ["exp1","exp2","exp3"]
     exp_ids2 = bulk_utils.get_experiment_ids(exp_ids1)
     assert exp_ids1 == exp_ids2
+
+def test_exp_incremental():
+    create_output_dir()
+    exp = create_test_experiment(3)
+    export_experiments(experiments=[exp.name], output_dir=output_dir, export_metadata_tags=False, notebook_formats="", incremental=True)
+    manifest = utils.read_json_file(os.path.join(output_dir, "manifest.json"))
+    assert manifest["info"]["ok_runs"] == 3
+    assert manifest["info"]["incremental"]["skipped_runs"] == 0
+
+    run = client.search_runs(exp.experiment_id, "tags.run_index = '0'")[0]
+    client.set_tag(run.info.run_id, "changed", "true")
+    stale_path = os.path.join(output_dir, exp.experiment_id, run.info.run_id, "artifacts", "deleted.txt")
+    with open(stale_path, "w") as f:
+        f.write("deleted artifact")
+    export_experiments(experiments=[exp.name], output_dir=output_dir, export_metadata_tags=False, notebook_formats="", incremental=True)
+    manifest = utils.read_json_file(os.path.join(output_dir, "manifest.json"))
+    assert manifest["info"]["ok_runs"] == 3
+    assert manifest["info"]["incremental"]["skipped_runs"] == 2
+    run_dct = utils.read_json_file(os.path.join(output_dir, exp.experiment_id, run.info.run_id, "run.json"))
+    assert run_dct["tags"]["changed"] == "true"
+    assert not os.path.exists(stale_path)
@@ -7,6 +7,7 @@ from mlflow_export_import.model.export_model import ModelExporter
 from mlflow_export_import.bulk.export_models import export_models
 from mlflow_export_import.bulk.import_models import import_all
 from mlflow_export_import.bulk import bulk_utils
+from mlflow_export_import import utils
 from test_bulk_experiments import create_test_experiment
 
 # == Setup
@@ -91,3 +92,29 @@ def test_get_model_names_from_all_string():
     model_names1 = [ _create_model() for j in range(0,3) ]
     model_names2 = bulk_utils.get_model_names("*")
     assert set(model_names1) == set(model_names2)
+
+def test_export_incremental():
+    _init()
+    model_name = _create_model()
+    export_models([model_name], output_dir, notebook_formats, stages="None", incremental=True)
+    manifest = utils.read_json_file(os.path.join(output_dir, "models", "manifest.json"))
+    assert manifest["info"]["incremental"]["skipped_models"] == 0
+    export_models([model_name], output_dir, notebook_formats, stages="None", incremental=True)
+    manifest = utils.read_json_file(os.path.join(output_dir, "models", "manifest.json"))
+    assert manifest["info"]["incremental"]["skipped_models"] == 1
+    assert manifest["info"]["ok_models"] == 1
+
+def test_reference_model_sources():
+    _init()
+    model_name = _create_model()
+    src_versions = client.search_model_versions(f"name='{model_name}'")
+    export_models([model_name], output_dir, notebook_formats, stages="None", reference_artifacts=True)
+    client.rename_registered_model(model_name, _rename_model_name(model_name))
+    for exp in list_experiments():
+        client.rename_experiment(exp.experiment_id, f"{exp.name}_{model_suffix}")
+    import_all(output_dir, delete_model=False, use_src_user_id=False, import_metadata_tags=False,
+        verbose=False, use_threads=False, reference_model_sources=True)
+    dst_versions = client.search_model_versions(f"name='{model_name}'")
+    assert sorted(vr.source for vr in dst_versions) == sorted(vr.source for vr in src_versions)
+    for vr in dst_versions:
+        assert vr.run_id not in [ src_vr.run_id for src_vr in src_versions ]
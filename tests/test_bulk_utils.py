@@ -0,0 +1,19 @@
+from mlflow_export_import.bulk import bulk_utils
+from utils_test import create_experiment, mk_test_object_name, client
+
+def test_get_experiment_ids_by_prefix():
+    prefix = f"{mk_test_object_name()}_"
+    exp_ids = [ client.create_experiment(f"{prefix}{j}") for j in range(3) ]
+    create_experiment()
+    assert sorted(bulk_utils.get_experiment_ids(f"{prefix}*")) == sorted(exp_ids)
+
+def test_get_model_names_by_prefix():
+    prefix = f"{mk_test_object_name()}_"
+    names = [ client.create_registered_model(f"{prefix}{j}").name for j in range(3) ]
+    client.create_registered_model(mk_test_object_name())
+    assert sorted(bulk_utils.get_model_names(f"{prefix}*")) == sorted(names)
+
+def test_mk_prefix_filter():
+    assert bulk_utils._mk_prefix_filter("team_a") == "name LIKE 'team_a%'"
+    assert bulk_utils._mk_prefix_filter("bob's") == "name LIKE \"bob's%\""
+    assert bulk_utils._mk_prefix_filter("'\"") is None
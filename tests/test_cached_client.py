@@ -0,0 +1,88 @@
+import time
+from mlflow_export_import.common import mlflow_utils
+from mlflow_export_import.common import cached_client
+from mlflow_export_import.common.cached_client import CachedMlflowClient, LruTtlCache
+
+class _FakeClient():
+    def __init__(self):
+        self.calls = 0
+        self.experiments = { "1": "exp_1" }
+    def get_experiment(self, exp_id):
+        self.calls += 1
+        return self.experiments[exp_id]
+    def get_experiment_by_name(self, name):
+        self.calls += 1
+        return None
+    def get_run(self, run_id):
+        self.calls += 1
+        return run_id
+    def rename_experiment(self, exp_id, name):
+        self.experiments[exp_id] = name
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        pass
+
+def test_cache_hits():
+    fake = _FakeClient()
+    client = CachedMlflowClient(fake)
+    for _ in range(5):
+        assert client.get_experiment("1") == "exp_1"
+    assert fake.calls == 1
+    stats = client.get_cache_stats()
+    assert stats["hits"] == 4
+    assert stats["misses"] == 1
+    assert stats["methods"]["get_experiment"] == { "hits": 4, "misses": 1 }
+
+def test_none_not_cached():
+    fake = _FakeClient()
+    client = CachedMlflowClient(fake)
+    assert client.get_experiment_by_name("foo") is None
+    assert client.get_experiment_by_name("foo") is None
+    assert fake.calls == 2
+
+def test_write_invalidates():
+    fake = _FakeClient()
+    client = CachedMlflowClient(fake)
+    client.get_experiment("1")
+    client.rename_experiment("1", "exp_renamed")
+    assert client.get_experiment("1") == "exp_renamed"
+    assert fake.calls == 2
+
+def test_runs_not_cached():
+    fake = _FakeClient()
+    client = CachedMlflowClient(fake)
+    client.get_run("run_0")
+    client.get_run("run_0")
+    assert fake.calls == 2
+    assert "get_run" not in client.get_cache_stats()["methods"]
+
+def test_lru_eviction():
+    cache = LruTtlCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("b") == (False, None)
+    assert len(cache) == 2
+
+def test_ttl_expiry():
+    cache = LruTtlCache(ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == (True, 1)
+    time.sleep(0.1)
+    assert cache.get("a") == (False, None)
+
+def test_create_mlflow_client_not_cached_by_default():
+    client = mlflow_utils.create_mlflow_client(_FakeClient())
+    assert not isinstance(client, CachedMlflowClient)
+    assert cached_client.get_cache_stats(client) is None
+
+def test_create_mlflow_client_cached():
+    client = mlflow_utils.create_mlflow_client(_FakeClient(), cache_lookups=True)
+    assert isinstance(client, CachedMlflowClient)
+    assert mlflow_utils.create_mlflow_client(client) is client
+    cached_client.configure(True)
+    try:
+        assert isinstance(mlflow_utils.create_mlflow_client(_FakeClient()), CachedMlflowClient)
+    finally:
+        cached_client.configure(False)
@@ -53,3 +53,17 @@ def test_copy_exp_basic():
 def test_copy_exp_import_metadata_tags():
     run1, run2 = init_exp_copy_test(ExperimentCopier(client, client, export_metadata_tags=True))
     compare_run_import_metadata_tags(client, output_dir, run1, run2)
+
+def test_copy_exp_nested_runs():
+    from test_experiments_runs import _create_nested_runs
+    exp, parent_run = _create_nested_runs()
+    client.log_artifact(parent_run.info.run_id, "info.txt") # copy_run needs an artifact to download
+    dst_experiment_name = f"{exp.name}_copy_exp"
+    ExperimentCopier(client, client).copy_experiment(exp.name, dst_experiment_name)
+    exp2 = client.get_experiment_by_name(dst_experiment_name)
+    runs = client.search_runs(exp2.experiment_id, "")
+    assert len(runs) == 4
+    parents = [ run for run in runs if run.data.params["p1"] == "parent" ]
+    assert len(parents) == 1
+    children = [ run for run in runs if run.data.params["p1"] != "parent" ]
+    assert all(run.data.tags["mlflow.parentRunId"] == parents[0].info.run_id for run in children)
@@ -0,0 +1,50 @@
+import pytest
+from mlflow_export_import import utils
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common import encoding
+from mlflow_export_import.common.filesystem import LocalFileSystem
+from mlflow_export_import.run import run_json
+
+_dct = { "info": { "run_id": "abc" }, "metrics": { "rmse": [ { "value": 0.5, "timestamp": 1, "step": 0 } ] }, "tags": {} }
+
+@pytest.fixture
+def configure():
+    yield encoding.configure
+    encoding.configure("json")
+
+@pytest.mark.parametrize("name, magic", [ ("json", b"{\n"), ("compact", b'{"'), ("gzip", b"\x1f\x8b") ])
+def test_write_read_json_file(tmp_path, configure, name, magic):
+    configure(name)
+    path = str(tmp_path / "run.json")
+    utils.write_json_file(LocalFileSystem(), path, _dct)
+    with open(path, "rb") as f:
+        assert f.read(2) == magic
+    encoding.configure("json")
+    assert utils.read_json_file(path) == _dct
+
+@pytest.mark.parametrize("name", [ "json", "compact", "gzip" ])
+def test_run_json_writer(tmp_path, configure, name):
+    configure(name)
+    path = str(tmp_path / "run.json")
+    with run_json.RunJsonWriter(path) as writer:
+        writer.write_field("info", _dct["info"])
+        writer.begin_metrics()
+        writer.write_metric("rmse", _dct["metrics"]["rmse"])
+        writer.end_metrics()
+        writer.write_field("tags", {})
+    encoding.configure("json")
+    assert run_json.read_run(path, skip_metrics=False) == _dct
+    assert list(run_json.iter_metrics(path)) == [ ("rmse", _dct["metrics"]["rmse"][0]) ]
+
+def test_compact_is_smaller(tmp_path, configure):
+    sizes = {}
+    for name in [ "json", "compact", "gzip" ]:
+        configure(name)
+        path = tmp_path / f"{name}.json"
+        utils.write_json_file(LocalFileSystem(), str(path), { "metrics": [ { "value": j, "step": j } for j in range(1000) ] })
+        sizes[name] = path.stat().st_size
+    assert sizes["gzip"] < sizes["compact"] < sizes["json"]
+
+def test_unknown_encoding(configure):
+    with pytest.raises(MlflowExportImportException):
+        configure("bzip2")
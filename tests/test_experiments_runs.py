@@ -1,8 +1,14 @@
+import os
+import yaml
 import mlflow
+from mlflow_export_import.run import run_json
+from mlflow_export_import.run import imported_run_index
 from mlflow_export_import.run.export_run import RunExporter
 from mlflow_export_import.run.import_run import RunImporter
 from mlflow_export_import.experiment.export_experiment import ExperimentExporter
 from mlflow_export_import.experiment.import_experiment import ExperimentImporter
+from mlflow_export_import.experiment.export_experiment_async import AsyncExperimentExporter
+from mlflow_export_import.common.artifact_transfer import ArtifactDownloader
 from utils_test import create_output_dir, create_simple_run, init_output_dirs, output_dir
 from compare_utils import compare_runs, compare_run_import_metadata_tags
 from compare_utils import dump_runs
@@ -41,6 +47,37 @@ def test_run_basic_use_metric_steps():
     run1, run2 = init_run_test(RunExporter(), RunImporter(mlmodel_fix=mlmodel_fix), use_metric_steps=True)
     compare_runs(client, output_dir, run1, run2)
 
+def test_run_basic_use_metric_steps_serial():
+    run1, run2 = init_run_test(RunExporter(metric_history_workers=1), RunImporter(mlmodel_fix=mlmodel_fix), use_metric_steps=True)
+    compare_runs(client, output_dir, run1, run2)
+
+def test_run_basic_use_metric_steps_npz():
+    run1, run2 = init_run_test(RunExporter(metrics_format="npz"), RunImporter(mlmodel_fix=mlmodel_fix), use_metric_steps=True)
+    compare_runs(client, output_dir, run1, run2)
+    for key in run1.data.metrics.keys():
+        assert [ (m.step, m.timestamp, m.value) for m in client.get_metric_history(run1.info.run_id, key) ] == \
+            [ (m.step, m.timestamp, m.value) for m in client.get_metric_history(run2.info.run_id, key) ]
+
+def test_run_reference_artifacts():
+    run1, run2 = init_run_test(RunExporter(reference_artifacts=True), RunImporter(mlmodel_fix=mlmodel_fix))
+    assert not os.path.exists(os.path.join(output_dir, "artifacts"))
+    artifacts = run_json.read_run(os.path.join(output_dir, "run.json"))["artifacts"]
+    assert artifacts["artifact_uri"] == run1.info.artifact_uri
+    assert len(artifacts["files"]) > 0
+    compare_runs(client, output_dir, run1, run2)
+    _check_mlmodel_run_id(run2)
+
+def _check_mlmodel_run_id(run):
+    path = client.download_artifacts(run.info.run_id, "model/MLmodel")
+    with open(path, "r") as f:
+        assert yaml.safe_load(f)["run_id"] == run.info.run_id
+
+def test_run_mlmodel_fix():
+    run1, run2 = init_run_test(RunExporter(), RunImporter(mlmodel_fix=True))
+    _check_mlmodel_run_id(run2)
+    with open(os.path.join(output_dir, "artifacts", "model", "MLmodel"), "r") as f:
+        assert yaml.safe_load(f)["run_id"] == run1.info.run_id
+
 # == Export/import Experiment tests
 
 def init_exp_test(exporter, importer, verbose=False):
@@ -62,6 +99,176 @@ def test_exp_basic():
     run1, run2 = init_exp_test(ExperimentExporter(), ExperimentImporter(), True)
     compare_runs(client, output_dir, run1, run2)
 
+def test_exp_search_partitions():
+    run1, run2 = init_exp_test(ExperimentExporter(search_partitions=4), ExperimentImporter())
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_npz():
+    run1, run2 = init_exp_test(ExperimentExporter(metrics_format="npz"), ExperimentImporter())
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_gzip():
+    from mlflow_export_import.common import encoding
+    encoding.configure("gzip")
+    try:
+        run1, run2 = init_exp_test(ExperimentExporter(), ExperimentImporter())
+    finally:
+        encoding.configure("json")
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_dedup_artifacts():
+    import os
+    from mlflow_export_import.common.blob_store import BlobStore, ARTIFACTS_MANIFEST
+    blob_store = BlobStore(os.path.join(output_dir, "blobs"))
+    run1, run2 = init_exp_test(ExperimentExporter(blob_store=blob_store), ExperimentImporter())
+    assert os.path.exists(os.path.join(output_dir, run1.info.run_id, ARTIFACTS_MANIFEST))
+    assert blob_store.get_stats()["blobs"] > 0
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_async():
+    run1, run2 = init_exp_test(AsyncExperimentExporter(max_metadata_requests=4, max_artifact_requests=2), ExperimentImporter())
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_async_shared_artifact_pool(monkeypatch):
+    def download(self, run_id, dst_dir):
+        raise Exception("Each run must not open its own artifact download pool")
+    monkeypatch.setattr(ArtifactDownloader, "download", download)
+    run1, run2 = init_exp_test(AsyncExperimentExporter(max_metadata_requests=4, max_artifact_requests=2), ExperimentImporter())
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_async_reference_artifacts():
+    run1, run2 = init_exp_test(AsyncExperimentExporter(reference_artifacts=True), ExperimentImporter())
+    compare_runs(client, output_dir, run1, run2)
+
+def test_exp_async_import_metadata_tags():
+    run1, run2 = init_exp_test(AsyncExperimentExporter(export_metadata_tags=True), ExperimentImporter(import_metadata_tags=True))
+    compare_run_import_metadata_tags(client, output_dir, run1, run2)
+
 def test_exp_import_metadata_tags():
     run1, run2 = init_exp_test(ExperimentExporter(export_metadata_tags=True), ExperimentImporter(import_metadata_tags=True), verbose=False)
     compare_run_import_metadata_tags(client, output_dir, run1, run2)
+
+def _create_nested_runs(num_children=3):
+    from utils_test import create_experiment
+    exp = create_experiment()
+    with mlflow.start_run(run_name="parent") as parent_run:
+        mlflow.log_param("p1", "parent")
+        for j in range(num_children):
+            with mlflow.start_run(run_name=f"child_{j}", nested=True):
+                mlflow.log_param("p1", f"child_{j}")
+                mlflow.log_metric("m1", j)
+                with open("info.txt", "w") as f:
+                    f.write(f"Hi child {j}")
+                mlflow.log_artifact("info.txt")
+    return exp, parent_run
+
+def _import_nested_runs(importer):
+    init_output_dirs()
+    exp, parent_run = _create_nested_runs()
+    ExperimentExporter().export_experiment(exp.name, output_dir)
+    experiment_name = f"{exp.name}_imported"
+    importer.import_experiment(experiment_name, output_dir)
+    exp2 = client.get_experiment_by_name(experiment_name)
+    runs = client.search_runs(exp2.experiment_id, "")
+    assert len(runs) == 4
+    assert all(run.info.status == "FINISHED" for run in runs)
+    parents = [ run for run in runs if run.data.params["p1"] == "parent" ]
+    assert len(parents) == 1
+    children = [ run for run in runs if run.data.params["p1"] != "parent" ]
+    assert all(run.data.tags["mlflow.parentRunId"] == parents[0].info.run_id for run in children)
+    assert sorted(client.list_artifacts(run.info.run_id)[0].path for run in children) == [ "info.txt" ] * 3
+
+def test_exp_nested_runs_pipeline():
+    _import_nested_runs(ExperimentImporter(run_workers=4))
+
+def test_exp_nested_runs_serial():
+    _import_nested_runs(ExperimentImporter(run_workers=1))
+
+class _SetTagCountingClient(mlflow.tracking.MlflowClient):
+    def __init__(self):
+        super().__init__()
+        self.set_tag_keys = []
+    def set_tag(self, run_id, key, value):
+        self.set_tag_keys.append(key)
+        super().set_tag(run_id, key, value)
+
+def test_exp_nested_runs_parent_tag_logged():
+    dst_client = _SetTagCountingClient()
+    _import_nested_runs(ExperimentImporter(dst_client, run_workers=4))
+    assert "mlflow.parentRunId" not in dst_client.set_tag_keys
+
+def _import_twice(existing_runs, exporter=None, importer1=None, break_run=False, break_data=False):
+    init_output_dirs()
+    exp, _ = _create_nested_runs()
+    (exporter or ExperimentExporter()).export_experiment(exp.name, output_dir)
+    experiment_name = f"{exp.name}_imported"
+    (importer1 or ExperimentImporter(existing_runs=existing_runs)).import_experiment(experiment_name, output_dir)
+    exp2 = client.get_experiment_by_name(experiment_name)
+    runs1 = { run.info.run_id: run for run in client.search_runs(exp2.experiment_id, "") }
+    broken_run_id = None
+    if break_run:
+        broken_run_id = [ run.info.run_id for run in runs1.values() if run.data.params["p1"] == "child_0" ][0]
+        client.set_terminated(broken_run_id, "FAILED")
+        if break_data:
+            client.delete_tag(broken_run_id, imported_run_index.TAG_DATA_IMPORTED)
+    ExperimentImporter(existing_runs=existing_runs).import_experiment(experiment_name, output_dir)
+    runs2 = { run.info.run_id: run for run in client.search_runs(exp2.experiment_id, "") }
+    assert len(runs2) == 4
+    assert all(run.info.status == "FINISHED" for run in runs2.values())
+    return runs1, runs2, broken_run_id
+
+def test_exp_existing_runs_duplicate():
+    init_output_dirs()
+    exp, _ = _create_nested_runs()
+    ExperimentExporter().export_experiment(exp.name, output_dir)
+    experiment_name = f"{exp.name}_imported"
+    ExperimentImporter().import_experiment(experiment_name, output_dir)
+    ExperimentImporter().import_experiment(experiment_name, output_dir)
+    exp2 = client.get_experiment_by_name(experiment_name)
+    assert len(client.search_runs(exp2.experiment_id, "")) == 8
+
+def test_exp_existing_runs_skip_finished():
+    runs1, runs2, _ = _import_twice("resume")
+    assert runs1.keys() == runs2.keys()
+
+def test_exp_existing_runs_resume():
+    runs1, runs2, broken_run_id = _import_twice("resume", break_run=True)
+    assert runs1.keys() == runs2.keys()
+    assert runs2[broken_run_id].data.params["p1"] == "child_0"
+    assert [ f.path for f in client.list_artifacts(broken_run_id) ] == [ "info.txt" ]
+    assert len(client.get_metric_history(broken_run_id, "m1")) == 1
+
+def test_exp_existing_runs_reimported_source_run():
+    """ The source run was itself imported - its own source run tags must not replace the ones of this import. """
+    init_output_dirs()
+    from utils_test import create_experiment
+    exp = create_experiment()
+    with mlflow.start_run() as run:
+        mlflow.log_param("p1", "hop")
+        mlflow.set_tag(imported_run_index.TAG_SRC_RUN_ID, "OLD_HOP_ID")
+        mlflow.set_tag(imported_run_index.TAG_DATA_IMPORTED, "true")
+    ExperimentExporter().export_experiment(exp.name, output_dir)
+    experiment_name = f"{exp.name}_imported"
+    ExperimentImporter(existing_runs="resume").import_experiment(experiment_name, output_dir)
+    ExperimentImporter(existing_runs="resume").import_experiment(experiment_name, output_dir)
+    exp2 = client.get_experiment_by_name(experiment_name)
+    runs = client.search_runs(exp2.experiment_id, "")
+    assert len(runs) == 1
+    assert imported_run_index.get_source_run_id(runs[0]) == run.info.run_id
+
+def test_exp_existing_runs_resume_partial_data():
+    runs1, runs2, broken_run_id = _import_twice("resume", break_run=True, break_data=True)
+    assert broken_run_id not in runs2
+    assert len(set(runs1.keys()) & set(runs2.keys())) == 3
+    assert all(imported_run_index.is_data_imported(run) for run in runs2.values())
+
+def test_exp_existing_runs_replace():
+    runs1, runs2, broken_run_id = _import_twice("replace", break_run=True)
+    assert broken_run_id not in runs2
+    assert len(set(runs1.keys()) & set(runs2.keys())) == 3
+    parent_run_id = [ run.info.run_id for run in runs2.values() if run.data.params["p1"] == "parent" ][0]
+    assert all(run.data.tags["mlflow.parentRunId"] == parent_run_id for run in runs2.values() if run.info.run_id != parent_run_id)
+
+def test_exp_existing_runs_metadata_tags():
+    runs1, runs2, _ = _import_twice("resume", ExperimentExporter(export_metadata_tags=True), ExperimentImporter(import_metadata_tags=True))
+    assert runs1.keys() == runs2.keys()
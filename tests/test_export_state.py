@@ -0,0 +1,111 @@
+import os
+import threading
+from mlflow.entities import Run, RunInfo, RunData, Param, Metric, RunTag
+from mlflow_export_import.common.export_state import ExportState, fingerprint_run, fingerprint_model, STATE_FILE
+from utils_test import create_output_dir, output_dir
+
+def _mk_run(run_id="r1", end_time=2000, rmse=0.5, tags=None):
+    info = RunInfo(run_uuid=run_id, experiment_id="1", user_id="user", status="FINISHED",
+        start_time=1000, end_time=end_time, lifecycle_stage="active", run_id=run_id)
+    tags = tags or { "t1": "v1" }
+    data = RunData(metrics=[Metric("rmse", rmse, 1500, 0)], params=[Param("p1", "1")],
+        tags=[RunTag(k,v) for k,v in tags.items()])
+    return Run(info, data)
+
+def _mk_run_dir(run_id):
+    run_dir = os.path.join(output_dir, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, "run.json"), "w") as f:
+        f.write("{}")
+    return run_dir
+
+def test_fingerprint_run():
+    assert fingerprint_run(_mk_run()) == fingerprint_run(_mk_run())
+    assert fingerprint_run(_mk_run()) != fingerprint_run(_mk_run(rmse=0.6))
+    assert fingerprint_run(_mk_run()) != fingerprint_run(_mk_run(tags={ "t1": "v2" }))
+    assert fingerprint_run(_mk_run(end_time=None)) is None
+    assert fingerprint_run(_mk_run(), { "metrics_format": "json" }) != fingerprint_run(_mk_run(), { "metrics_format": "npz" })
+
+def test_fingerprint_model():
+    model = { "name": "m1", "last_updated_timestamp": 1000 }
+    versions = [ { "version": "1", "current_stage": "None" } ]
+    assert fingerprint_model(model, versions) == fingerprint_model(dict(model), [ dict(versions[0]) ])
+    assert fingerprint_model(model, versions) != fingerprint_model(model, [ { "version": "1", "current_stage": "Production" } ])
+    assert fingerprint_model(model, versions) != fingerprint_model(model, versions, [ "production" ])
+    assert fingerprint_model(model, versions, [ "staging", "production" ]) == fingerprint_model(model, versions, [ "production", "staging" ])
+
+def test_run_unchanged():
+    create_output_dir()
+    run = _mk_run()
+    run_dir = _mk_run_dir(run.info.run_id)
+    state = ExportState(output_dir)
+    assert not state.is_run_unchanged(run, run_dir)
+    state.update_run(run)
+    assert state.is_run_unchanged(run, run_dir)
+    assert not state.is_run_unchanged(_mk_run(rmse=0.6), run_dir)
+    assert state.get_stats() == { "skipped_runs": 1, "skipped_models": 0 }
+
+def test_run_output_missing():
+    create_output_dir()
+    run = _mk_run()
+    state = ExportState(output_dir)
+    state.update_run(run)
+    assert not state.is_run_unchanged(run, os.path.join(output_dir, run.info.run_id))
+
+def test_running_run_never_unchanged():
+    create_output_dir()
+    run = _mk_run(end_time=None)
+    run_dir = _mk_run_dir(run.info.run_id)
+    state = ExportState(output_dir)
+    state.update_run(run)
+    assert not state.is_run_unchanged(run, run_dir)
+
+def test_save_and_load():
+    create_output_dir()
+    run = _mk_run()
+    run_dir = _mk_run_dir(run.info.run_id)
+    state = ExportState(output_dir)
+    state.update_run(run)
+    state.save()
+    assert os.path.exists(os.path.join(output_dir, STATE_FILE))
+    state = ExportState(output_dir)
+    assert state.is_run_unchanged(run, run_dir)
+
+def test_remove_output():
+    create_output_dir()
+    run_dir = _mk_run_dir("r1")
+    with open(os.path.join(run_dir, "deleted.txt"), "w") as f:
+        f.write("stale")
+    state = ExportState(output_dir)
+    state.remove_output(run_dir)
+    assert not os.path.exists(run_dir)
+    state.remove_output(run_dir)
+
+def test_run_export_options_changed():
+    create_output_dir()
+    run = _mk_run()
+    run_dir = _mk_run_dir(run.info.run_id)
+    state = ExportState(output_dir)
+    state.update_run(run, { "reference_artifacts": False })
+    assert state.is_run_unchanged(run, run_dir, { "reference_artifacts": False })
+    assert not state.is_run_unchanged(run, run_dir, { "reference_artifacts": True })
+
+def test_save_concurrently():
+    create_output_dir()
+    state = ExportState(output_dir)
+    errors = []
+    def save(idx):
+        try:
+            for j in range(50):
+                state.update_run(_mk_run(run_id=f"r{idx}_{j}"))
+                state.save()
+        except Exception as e:
+            errors.append(e)
+    threads = [ threading.Thread(target=save, args=(idx,)) for idx in range(8) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(ExportState(output_dir).state["runs"]) == 400
+    assert os.listdir(output_dir) == [ STATE_FILE ]
@@ -0,0 +1,189 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common.http_client import HttpClient, write_pages_as_json_lines, _parse_retry_after
+from mlflow_export_import.model.list_registered_models import write_registered_models, list_registered_models
+
+# == Setup - local stub server that fails the first requests
+
+class _Handler(BaseHTTPRequestHandler):
+    responses = []
+    delays = []
+    num_requests = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.num_requests += 1
+        if cls.delays:
+            time.sleep(cls.delays.pop(0))
+        status, headers = cls.responses.pop(0) if cls.responses else (200, {})
+        self.send_response(status)
+        for k,v in headers.items():
+            self.send_header(k, v)
+        body = json.dumps({"status": status}).encode()
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+def _start_server(responses, delays=()):
+    _Handler.responses = list(responses)
+    _Handler.delays = list(delays)
+    _Handler.num_requests = 0
+    server = ThreadingHTTPServer(("localhost", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _mk_client(server, max_retries=3, read_timeout=None):
+    host = f"http://localhost:{server.server_address[1]}"
+    return HttpClient("api/2.0", host, None, max_retries=max_retries, backoff_factor=0.01, read_timeout=read_timeout)
+
+# == Tests
+
+def test_retry_then_succeed():
+    server = _start_server([ (503, {}), (429, {"Retry-After": "0"}) ])
+    try:
+        rsp = _mk_client(server).get("clusters/list")
+        assert rsp == {"status": 200}
+        assert _Handler.num_requests == 3
+    finally:
+        server.shutdown()
+
+def test_retry_exhausted():
+    server = _start_server([ (503, {}) ] * 3)
+    try:
+        with pytest.raises(MlflowExportImportException):
+            _mk_client(server, max_retries=2).get("clusters/list")
+        assert _Handler.num_requests == 3
+    finally:
+        server.shutdown()
+
+def test_no_retry_on_client_error():
+    server = _start_server([ (404, {}) ])
+    try:
+        with pytest.raises(MlflowExportImportException):
+            _mk_client(server).get("clusters/list")
+        assert _Handler.num_requests == 1
+    finally:
+        server.shutdown()
+
+def test_post_no_retry_on_server_error():
+    server = _start_server([ (500, {}) ])
+    try:
+        with pytest.raises(MlflowExportImportException):
+            _mk_client(server).post("runs/create", {})
+        assert _Handler.num_requests == 1
+    finally:
+        server.shutdown()
+
+def test_post_retry_when_not_processed():
+    server = _start_server([ (503, {}), (429, {"Retry-After": "0"}) ])
+    try:
+        assert _mk_client(server).post("runs/create", {}) == {"status": 200}
+        assert _Handler.num_requests == 3
+    finally:
+        server.shutdown()
+
+def test_post_idempotent_retry_on_server_error():
+    server = _start_server([ (500, {}), (502, {}) ])
+    try:
+        assert _mk_client(server).post("runs/search", {}, idempotent=True) == {"status": 200}
+        assert _Handler.num_requests == 3
+    finally:
+        server.shutdown()
+
+def test_post_no_retry_on_connection_error():
+    client = HttpClient("api/2.0", "http://localhost:1", None, max_retries=3, backoff_factor=0.01)
+    with pytest.raises(MlflowExportImportException, match="after 1 attempts"):
+        client.post("runs/create", {})
+
+def test_retry_on_read_timeout():
+    server = _start_server([], delays=[ 1.0 ])
+    try:
+        assert _mk_client(server, read_timeout=0.2).get("clusters/list") == {"status": 200}
+        assert _Handler.num_requests == 2
+    finally:
+        server.shutdown()
+
+def test_post_no_retry_on_read_timeout():
+    server = _start_server([], delays=[ 1.0 ])
+    try:
+        with pytest.raises(MlflowExportImportException):
+            _mk_client(server, read_timeout=0.2).post("runs/create", {})
+        assert _Handler.num_requests == 1
+    finally:
+        server.shutdown()
+
+def test_parse_retry_after():
+    assert _parse_retry_after("3") == 3.0
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert _parse_retry_after("garbage") is None
+
+# == Pagination and streaming
+
+class _PagedHandler(BaseHTTPRequestHandler):
+    pages = [ [ "a", "b" ], [ "c" ] ]
+
+    def do_GET(self):
+        params = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}")
+        idx = int(params.get("page_token", 0))
+        dct = { "items": type(self).pages[idx] }
+        if idx+1 < len(type(self).pages):
+            dct["next_page_token"] = str(idx+1)
+        body = json.dumps(dct).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _start_paged_server():
+    server = ThreadingHTTPServer(("localhost", 0), _PagedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_paginate_json_lines(tmp_path):
+    server = _start_paged_server()
+    try:
+        client = _mk_client(server)
+        path = tmp_path / "items.jsonl"
+        with open(path, "w") as f:
+            num_items = write_pages_as_json_lines(client.paginate("GET", "items/list"), f)
+        assert num_items == 3
+        assert [ json.loads(line) for line in open(path) ] == [ "a", "b", "c" ]
+    finally:
+        server.shutdown()
+
+def test_download(tmp_path):
+    server = _start_paged_server()
+    try:
+        path = tmp_path / "page.json"
+        num_bytes = _mk_client(server).download("GET", "items/list", None, path, chunk_size=4)
+        assert num_bytes == path.stat().st_size
+        assert json.loads(path.read_text())["items"] == [ "a", "b" ]
+    finally:
+        server.shutdown()
+
+def test_list_registered_models(tmp_path):
+    server = _start_paged_server()
+    try:
+        client = _mk_client(server)
+        path = tmp_path / "registered_models.json"
+        assert write_registered_models(client, path) == path.stat().st_size
+        assert json.loads(path.read_text()) == { "items": [ "a", "b" ], "next_page_token": "1" }
+        path = tmp_path / "registered_models.jsonl"
+        assert list_registered_models(client, path) == 3
+    finally:
+        server.shutdown()
@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import subprocess
+
+CLI_MODULES = [
+    "mlflow_export_import.run.export_run",
+    "mlflow_export_import.run.import_run",
+    "mlflow_export_import.run.copy_run",
+    "mlflow_export_import.experiment.export_experiment",
+    "mlflow_export_import.experiment.import_experiment",
+    "mlflow_export_import.model.export_model",
+    "mlflow_export_import.model.import_model",
+    "mlflow_export_import.bulk.export_experiments",
+    "mlflow_export_import.bulk.export_models",
+    "mlflow_export_import.bulk.import_models",
+    "mlflow_export_import.bulk.export_all",
+    "mlflow_export_import.common.find_artifacts",
+    "mlflow_export_import.common.dump_run",
+]
+
+_script = f"""
+import sys, json
+import requests
+import mlflow
+from mlflow.tracking._tracking_service import utils as tracking_utils
+
+# Records calls to these functions wherever they are referenced from
+watched = {{
+    requests.Session.__init__.__code__: "session",
+    mlflow.tracking.MlflowClient.__init__.__code__: "mlflow_client",
+    tracking_utils.get_tracking_uri.__code__: "tracking_uri",
+}}
+calls = []
+def profile(frame, event, arg):
+    if event == "call" and frame.f_code in watched:
+        calls.append(watched[frame.f_code])
+sys.setprofile(profile)
+for name in {CLI_MODULES!r}:
+    __import__(name)
+sys.setprofile(None)
+
+from mlflow_export_import.common import mlflow_utils
+print(json.dumps({{ "calls": calls, "tabulate": "tabulate" in sys.modules,
+    "default_client": mlflow_utils._default_client is not None }}))
+"""
+
+def test_import_cli_modules():
+    """ Importing the CLI modules prints nothing, creates no client or session and does not look up the tracking URI. """
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = { **os.environ, "PYTHONPATH": root_dir, "MLFLOW_TRACKING_URI": "http://localhost:1" }
+    proc = subprocess.run([ sys.executable, "-c", _script ], capture_output=True, text=True, env=env, cwd=root_dir, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    lines = proc.stdout.strip().split("\n")
+    assert len(lines) == 1, proc.stdout
+    res = json.loads(lines[0])
+    assert res["calls"] == []
+    assert not res["tabulate"]
+    assert not res["default_client"]
@@ -0,0 +1,63 @@
+import time
+import pytest
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from mlflow_export_import.common import instrumentation
+from mlflow_export_import.common.instrumentation import InstrumentedMlflowClient, Recorder
+
+class _FakeClient():
+    def get_run(self, run_id):
+        time.sleep(0.01)
+        return run_id
+    def log_batch(self, run_id, metrics=()):
+        raise RuntimeError("RESOURCE_EXHAUSTED")
+    def download_artifacts(self, run_id, path, dst_path):
+        with open(f"{dst_path}/model.pkl", "wb") as f:
+            f.write(b"x" * 100)
+        return dst_path
+
+def test_recorder_percentiles():
+    recorder = Recorder()
+    for j in range(1, 101):
+        recorder.record("get_run", j/1000)
+    stats = recorder.get_stats()["get_run"]
+    assert stats["count"] == 100
+    assert stats["p50"] == 0.05
+    assert stats["p95"] == 0.095
+    assert stats["p99"] == 0.099
+
+def test_client_calls_recorded_in_scope(tmp_path):
+    client = InstrumentedMlflowClient(_FakeClient())
+    with instrumentation.scope() as recorder:
+        client.get_run("run_0")
+        client.get_run("run_1")
+        client.download_artifacts("run_0", "", str(tmp_path))
+    client.get_run("run_2")
+    stats = recorder.get_stats()
+    assert stats["get_run"]["count"] == 2
+    assert stats["get_run"]["total_time"] >= 0.02
+    assert stats["download_artifacts"]["bytes"] == 100
+    assert instrumentation.get_recorder().get_stats()["get_run"]["count"] >= 3
+
+def test_nested_scopes_and_copied_context():
+    client = InstrumentedMlflowClient(_FakeClient())
+    with instrumentation.scope() as outer:
+        with instrumentation.scope() as inner:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [ executor.submit(contextvars.copy_context().run, client.get_run, f"run_{j}") for j in range(4) ]
+                [ f.result() for f in futures ]
+        client.get_run("run_4")
+    assert inner.get_stats()["get_run"]["count"] == 4
+    assert outer.get_stats()["get_run"]["count"] == 5
+
+def test_failed_calls_recorded():
+    client = InstrumentedMlflowClient(_FakeClient())
+    with instrumentation.scope() as recorder:
+        client.get_run("run_0")
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                client.log_batch("run_0")
+    stats = recorder.get_stats()
+    assert stats["log_batch"]["count"] == 2
+    assert stats["log_batch"]["errors"] == 2
+    assert stats["get_run"]["errors"] == 0
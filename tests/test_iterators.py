@@ -1,5 +1,16 @@
+import re
+import gc
+import time
+import threading
+import pytest
+from types import SimpleNamespace
 import mlflow
+from mlflow.entities.model_registry import RegisteredModel
+from mlflow.store.entities.paged_list import PagedList
+from mlflow.utils.search_utils import SearchUtils
+from mlflow_export_import.common import MlflowExportImportException
 from mlflow_export_import.common.iterators import SearchRunsIterator
+from mlflow_export_import.common.iterators import PartitionedSearchRunsIterator
 from mlflow_export_import.common.iterators import SearchRegisteredModelsIterator
 from mlflow_export_import.common.iterators import ListExperimentsIterator
 from mlflow_export_import.common.iterators import ListRegisteredModelsIterator
@@ -82,6 +93,12 @@ def test_list_models_max_results_custom():
     models2 = ListRegisteredModelsIterator(client, max_results)
     assert len(models1) == len(list(models2))
 
+def test_list_models_prefetch():
+    num_models = 25
+    _create_models(num_models)
+    models = ListRegisteredModelsIterator(client, 10, prefetch=1)
+    assert num_models == len(list(models))
+
 def test_list_models_max_results_non_default():
     MAX_RESULTS_DEFAULT = 100
     num_models = 101
@@ -92,6 +109,42 @@ def test_list_models_max_results_non_default():
     models2 = ListRegisteredModelsIterator(client, max_results)
     assert len(list(models2)) == num_models
 
+class _EndlessModelsClient():
+    """ Returns pages of registered models that never end. """
+    def list_registered_models(self, max_results, page_token=None):
+        start = int(page_token or 0)
+        return PagedList([ RegisteredModel(f"model_{j}") for j in range(start, start+max_results) ], str(start+max_results))
+
+def _take_prefetched(iterator, num_models):
+    models = iter(iterator)
+    return [ next(models) for _ in range(num_models) ]
+
+def test_list_models_prefetch_close():
+    models = ListRegisteredModelsIterator(_EndlessModelsClient(), 10, prefetch=1)
+    assert len(_take_prefetched(models, 15)) == 15
+    thread = models._thread
+    models.close()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_list_models_prefetch_abandoned():
+    models = ListRegisteredModelsIterator(_EndlessModelsClient(), 10, prefetch=1)
+    _take_prefetched(models, 5)
+    thread = models._thread
+    del models
+    gc.collect()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_list_models_prefetch_reiterate():
+    models = ListRegisteredModelsIterator(_EndlessModelsClient(), 10, prefetch=1)
+    _take_prefetched(models, 5)
+    thread = models._thread
+    assert [ model.name for model in _take_prefetched(models, 3) ] == [ "model_0", "model_1", "model_2" ]
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    models.close()
+
 # ==== SearchRunsIterator
 
 def _create_runs(num_runs):
@@ -121,6 +174,95 @@ def test_SearchRunsIterator_empty():
     runs = list(iterator)
     assert num_runs == len(runs)
 
+def test_SearchRunsIterator_prefetch():
+    num_runs = 120
+    max_results = 22
+    exp = _create_runs(num_runs)
+    runs1 = list(SearchRunsIterator(client, exp.experiment_id, max_results))
+    runs2 = list(SearchRunsIterator(client, exp.experiment_id, max_results, prefetch=2))
+    assert num_runs == len(runs2)
+    assert [ run.info.run_id for run in runs1 ] == [ run.info.run_id for run in runs2 ]
+
+def test_SearchRunsIterator_prefetch_empty():
+    exp = _create_runs(0)
+    iterator = SearchRunsIterator(client, exp.experiment_id, 22, prefetch=2)
+    assert 0 == len(list(iterator))
+
+# ==== PartitionedSearchRunsIterator
+
+def test_PartitionedSearchRunsIterator():
+    num_runs = 50
+    exp = _create_runs(num_runs)
+    runs1 = list(SearchRunsIterator(client, exp.experiment_id, 10))
+    runs2 = list(PartitionedSearchRunsIterator(client, exp.experiment_id, num_partitions=4, max_results=10))
+    assert num_runs == len(runs2)
+    assert set(run.info.run_id for run in runs1) == set(run.info.run_id for run in runs2)
+
+def test_PartitionedSearchRunsIterator_empty():
+    exp = _create_runs(0)
+    runs = list(PartitionedSearchRunsIterator(client, exp.experiment_id, num_partitions=4))
+    assert 0 == len(runs)
+
+def test_PartitionedSearchRunsIterator_query():
+    exp = _create_runs(20)
+    runs = list(PartitionedSearchRunsIterator(client, exp.experiment_id, num_partitions=3, query="metrics.m1 > 1"))
+    assert 0 == len(runs)
+
+class _FakeRunsClient():
+    """ Searches runs by ranges of a numeric attribute like the tracking stores do - runs without a value match no range. """
+    def __init__(self, values, attr="start_time"):
+        self.attr = attr
+        self.runs = [ SimpleNamespace(info=SimpleNamespace(run_id=f"r{j}", status="RUNNING" if value is None else "FINISHED", **{ attr: value }))
+            for j, value in enumerate(values) ]
+        self.queries = []
+    def search_runs(self, experiment_id, query, max_results, order_by=None, page_token=None):
+        self.queries.append(query)
+        runs = self.runs
+        for low, high in re.findall(rf"attributes.{self.attr} >= (\d+) and attributes.{self.attr} < (\d+)", query):
+            runs = [ run for run in runs if self._value(run) is not None and int(low) <= self._value(run) < int(high) ]
+        for status in re.findall(r"attributes.status = '(\w+)'", query):
+            runs = [ run for run in runs if run.info.status == status ]
+        if order_by:
+            runs = sorted([ run for run in runs if self._value(run) is not None ], key=self._value, reverse=order_by[0].endswith("DESC"))
+        return self._page(runs, max_results, page_token)
+    def _value(self, run):
+        return getattr(run.info, self.attr)
+    def _page(self, items, max_results, page_token):
+        start = int(page_token or 0)
+        end = start + max_results
+        return PagedList(items[start:end], str(end) if end < len(items) else None)
+
+def test_PartitionedSearchRunsIterator_start_time_not_null():
+    """ A run always has a start_time so no search for runs without it is made. """
+    client = _FakeRunsClient([ 100, 200, 300, 400 ])
+    runs = list(PartitionedSearchRunsIterator(client, "0", num_partitions=2, max_results=2))
+    assert len(runs) == 4
+    assert not any("status" in query for query in client.queries)
+
+def test_PartitionedSearchRunsIterator_without_key(monkeypatch):
+    """ Newer MLflow versions can search by end_time which is null for runs that have not ended. """
+    monkeypatch.setattr(SearchUtils, "NUMERIC_ATTRIBUTES", { "start_time", "end_time" })
+    client = _FakeRunsClient([ 100, 200, None, 300, None, 400 ], attr="end_time")
+    runs = list(PartitionedSearchRunsIterator(client, "0", num_partitions=2, max_results=2, partition_key="attributes.end_time"))
+    assert sorted(run.info.run_id for run in runs) == [ f"r{j}" for j in range(6) ]
+
+def test_PartitionedSearchRunsIterator_invalid_key():
+    with pytest.raises(MlflowExportImportException):
+        PartitionedSearchRunsIterator(client, "0", partition_key="metrics.m1")
+
+def test_PartitionedSearchRunsIterator_abandoned():
+    client = _FakeRunsClient(range(1000))
+    num_threads = threading.active_count()
+    runs = iter(PartitionedSearchRunsIterator(client, "0", num_partitions=4, max_results=10))
+    next(runs)
+    assert threading.active_count() > num_threads
+    runs.close()
+    for _ in range(50):
+        if threading.active_count() == num_threads:
+            break
+        time.sleep(0.1)
+    assert threading.active_count() == num_threads
+
 # Stress test - connection timeout
 def test_SearchRunsIterator_many():
     num_runs = 1200
@@ -0,0 +1,47 @@
+import threading
+from mlflow_export_import import utils
+
+class _FakeClient():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tags = {}
+    def set_tag(self, run_id, key, value):
+        with self.lock:
+            self.tags[run_id] = (key, value)
+
+def test_group_by_nesting_level():
+    parents = { "c1": "p", "g1": "c1", "p": None, "c2": "p", "r": None }
+    assert utils.group_by_nesting_level(parents) == [ ["p", "r"], ["c1", "c2"], ["g1"] ]
+
+def test_group_by_nesting_level_missing_parent():
+    parents = { "c1": "p", "c2": "c1" }
+    assert utils.group_by_nesting_level(parents) == [ ["c1"], ["c2"] ]
+
+def test_group_by_nesting_level_cycle():
+    parents = { "a": "b", "b": "a", "r": None }
+    assert utils.group_by_nesting_level(parents) == [ ["r"], ["a", "b"] ]
+
+def test_group_by_nesting_level_empty():
+    assert utils.group_by_nesting_level({}) == []
+
+def _mapping(num_children, dst_parent_run_id=None):
+    mapping = { "p": { "dst_run_id": "dst_p", "src_parent_run_id": None } }
+    for j in range(num_children):
+        mapping[f"c{j}"] = { "dst_run_id": f"dst_c{j}", "src_parent_run_id": "p", "dst_parent_run_id": dst_parent_run_id }
+    return mapping
+
+def test_nested_tags():
+    client = _FakeClient()
+    assert utils.nested_tags(client, _mapping(50), max_workers=4) == 50
+    assert client.tags == { f"dst_c{j}": (utils.TAG_PARENT_ID, "dst_p") for j in range(50) }
+
+def test_nested_tags_already_set():
+    client = _FakeClient()
+    assert utils.nested_tags(client, _mapping(50, "dst_p")) == 0
+    assert client.tags == {}
+
+def test_nested_tags_missing_parent():
+    client = _FakeClient()
+    mapping = { "c": { "dst_run_id": "dst_c", "src_parent_run_id": "p" } }
+    assert utils.nested_tags(client, mapping) == 0
+    assert client.tags == {}
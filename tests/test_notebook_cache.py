@@ -0,0 +1,78 @@
+import os
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common.notebook_cache import NotebookCache
+from mlflow_export_import.common.filesystem import get_filesystem
+from mlflow_export_import.run.export_run import RunExporter
+from utils_test import create_output_dir, output_dir
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_fetch_once():
+    create_output_dir()
+    cache = NotebookCache()
+    lock = threading.Lock()
+    calls = []
+    def fetch():
+        with lock:
+            calls.append(1)
+        return b"notebook"
+    paths = [ os.path.join(output_dir, f"nb_{j}.source") for j in range(20) ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for future in [ executor.submit(cache.export_notebook, "/nb", "123", "SOURCE", path, fetch) for path in paths ]:
+            future.result()
+    assert len(calls) == 1
+    assert all(_read(path) == b"notebook" for path in paths)
+    assert cache.get_stats() == { "hits": 19, "misses": 1 }
+
+def test_keys():
+    create_output_dir()
+    cache = NotebookCache()
+    for revision in [ "1", "2" ]:
+        for format in [ "SOURCE", "DBC" ]:
+            cache.export_notebook("/nb", revision, format, os.path.join(output_dir, f"nb_{revision}.{format}"), lambda: f"{revision}{format}".encode())
+    assert cache.get_stats()["misses"] == 4
+    assert _read(os.path.join(output_dir, "nb_2.DBC")) == b"2DBC"
+
+def test_failure_cached():
+    create_output_dir()
+    cache = NotebookCache()
+    calls = []
+    def fetch():
+        calls.append(1)
+        raise MlflowExportImportException("not found")
+    for j in range(3):
+        with pytest.raises(MlflowExportImportException):
+            cache.export_notebook("/nb", "1", "SOURCE", os.path.join(output_dir, f"nb_{j}"), fetch)
+    assert len(calls) == 1
+
+class _FakeResponse():
+    def __init__(self, content):
+        self.content = content
+
+class _FakeDatabricksClient():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+    def _get(self, resource, params):
+        with self.lock:
+            self.calls.append((params["path"], params["revision_timestamp"], params["format"]))
+        return _FakeResponse(f"{params['format']}-{params['revision_timestamp']}".encode())
+
+def test_run_exporter_notebooks():
+    create_output_dir()
+    exporter = RunExporter(notebook_formats=["SOURCE", "DBC"])
+    exporter.dbx_client = _FakeDatabricksClient()
+    tags = { "mlflow.databricks.notebookPath": "/Users/me/train", "mlflow.databricks.notebookRevisionID": "123" }
+    for j in range(5):
+        run_dir = os.path.join(output_dir, f"run_{j}")
+        exporter._export_notebook(run_dir, tags["mlflow.databricks.notebookPath"], tags, get_filesystem(run_dir))
+        notebook_dir = os.path.join(run_dir, "artifacts", "notebooks")
+        assert _read(os.path.join(notebook_dir, "train.source")) == b"SOURCE-123"
+        assert _read(os.path.join(notebook_dir, "train.dbc")) == b"DBC-123"
+        assert os.path.exists(os.path.join(notebook_dir, "manifest.json"))
+    assert sorted(exporter.dbx_client.calls) == [ ("/Users/me/train", "123", "DBC"), ("/Users/me/train", "123", "SOURCE") ]
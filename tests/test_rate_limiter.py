@@ -0,0 +1,71 @@
+import time
+import pytest
+from types import SimpleNamespace
+from mlflow_export_import.common import MlflowExportImportException
+from mlflow_export_import.common import rate_limiter
+from mlflow_export_import.common import mlflow_utils
+from mlflow_export_import.common.rate_limiter import RateLimiter, RateLimitedMlflowClient, TokenBucket
+
+class _FakeClient():
+    def __init__(self):
+        self.experiments = {}
+    def get_run(self, run_id):
+        return run_id
+    def get_experiment_by_name(self, name):
+        return self.experiments.get(name)
+    def create_experiment(self, name):
+        self.experiments[name] = SimpleNamespace(experiment_id=str(len(self.experiments)), lifecycle_stage="active")
+        return self.experiments[name].experiment_id
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        return run_id
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.18
+
+def test_client_proxy_stats():
+    limiter = RateLimiter({"read": 1000})
+    client = RateLimitedMlflowClient(_FakeClient(), limiter)
+    for j in range(3):
+        assert client.get_run(f"run_{j}") == f"run_{j}"
+    client.log_batch("run_0")
+    stats = limiter.get_stats()["endpoint_classes"]
+    assert stats["read"]["requests"] == 3
+    assert stats["write"]["requests"] == 1
+
+def test_default_rate_applies_to_unlisted_classes():
+    limiter = RateLimiter({"default": 50})
+    client = RateLimitedMlflowClient(_FakeClient(), limiter)
+    start = time.monotonic()
+    for _ in range(60):
+        client.log_batch("run_0")
+    assert time.monotonic() - start >= 0.18
+
+def _no_dbx_client():
+    raise AssertionError("Databricks client created outside of Databricks")
+
+def test_set_experiment_rate_limited():
+    limiter = RateLimiter({"read": 1000})
+    client = RateLimitedMlflowClient(_FakeClient(), limiter)
+    assert mlflow_utils.set_experiment(client, _no_dbx_client, "exp_1") == "0"
+    assert mlflow_utils.set_experiment(client, _no_dbx_client, "exp_1") == "0"
+    stats = limiter.get_stats()["endpoint_classes"]
+    assert stats["read"]["requests"] == 2
+    assert stats["write"]["requests"] == 1
+
+def test_endpoint_classes():
+    assert rate_limiter.get_endpoint_class("get_metric_history") == "read"
+    assert rate_limiter.get_endpoint_class("search_runs") == "search"
+    assert rate_limiter.get_endpoint_class("list_experiments") == "search"
+    assert rate_limiter.get_endpoint_class("download_artifacts") == "artifacts"
+    assert rate_limiter.get_endpoint_class("set_terminated") == "write"
+    assert rate_limiter.get_http_endpoint_class("GET", "workspace/export") == "artifacts"
+
+def test_parse_rates():
+    assert rate_limiter.parse_rates("read=20,write=2.5") == {"read": 20.0, "write": 2.5}
+    assert rate_limiter.parse_rates(None) == {}
+    with pytest.raises(MlflowExportImportException):
+        rate_limiter.parse_rates("foo=1")
@@ -4,13 +4,16 @@ Tests for importing MLflow run data (params, metrics and tags) that exceed API l
 See: https://www.mlflow.org/docs/latest/rest-api.html#request-limits.
 """
 
+import time
 import mlflow
-from mlflow.utils.validation import MAX_PARAMS_TAGS_PER_BATCH, MAX_METRICS_PER_BATCH
+import threading
+from mlflow.utils.validation import MAX_PARAMS_TAGS_PER_BATCH, MAX_METRICS_PER_BATCH, MAX_ENTITIES_PER_BATCH, MAX_BATCH_LOG_REQUEST_SIZE
 from utils_test import create_output_dir, create_experiment, output_dir
 from compare_utils import compare_runs
 from mlflow.entities import Metric, Param, RunTag
 from mlflow_export_import.run.export_run import RunExporter
 from mlflow_export_import.run.import_run import RunImporter
+from mlflow_export_import.run import run_data_importer
 
 _num_params = 10
 _num_metrics = 10
@@ -39,6 +42,76 @@ def test_params_and_metrics():
     assert len(run1.data.metrics) == MAX_METRICS_PER_BATCH + _num_metrics
     compare_runs(client, output_dir, run1, run2)
 
+def test_params_tags_and_metrics():
+    run1, run2 = init_test_runs(RunExporter(), RunImporter(mlmodel_fix=True), num_params=_num_params, num_metrics=_num_metrics, num_tags=_num_tags)
+    assert len(run1.data.params) == MAX_PARAMS_TAGS_PER_BATCH + _num_params
+    assert len(run1.data.metrics) == MAX_METRICS_PER_BATCH + _num_metrics
+    compare_runs(client, output_dir, run1, run2)
+
+def _mk_entities(num_params, num_metrics, num_tags, tag_value="tval"):
+    params = [ Param(f"p_{j:>04d}", "pval") for j in range(0,num_params) ]
+    metrics = ( Metric(f"m_{j%10}", 0.87, 0, j) for j in range(0,num_metrics) )
+    tags = [ RunTag(f"t_{j:>04d}", tag_value) for j in range(0,num_tags) ]
+    return params, metrics, tags
+
+def _check_batches(batches, num_params, num_metrics, num_tags):
+    for params, metrics, tags in batches:
+        assert len(params) <= MAX_PARAMS_TAGS_PER_BATCH
+        assert len(tags) <= MAX_PARAMS_TAGS_PER_BATCH
+        assert len(metrics) <= MAX_METRICS_PER_BATCH
+        assert len(params) + len(metrics) + len(tags) <= MAX_ENTITIES_PER_BATCH
+        assert sum(len(e.key) + len(str(e.value)) for e in params + metrics + tags) < MAX_BATCH_LOG_REQUEST_SIZE
+    assert sum(len(b[0]) for b in batches) == num_params
+    assert sum(len(b[1]) for b in batches) == num_metrics
+    assert sum(len(b[2]) for b in batches) == num_tags
+
+def test_pack_small_run_in_one_batch():
+    batches = list(run_data_importer.pack_batches(*_mk_entities(20, 900, 30)))
+    assert len(batches) == 1
+    _check_batches(batches, 20, 900, 30)
+
+def test_pack_large_run():
+    batches = list(run_data_importer.pack_batches(*_mk_entities(150, 2500, 250)))
+    _check_batches(batches, 150, 2500, 250)
+    assert len(batches) == 3 # 2900 entities in batches of at most 1000
+
+def test_pack_large_tags():
+    batches = list(run_data_importer.pack_batches(*_mk_entities(0, 10, 300, tag_value="x"*5000)))
+    _check_batches(batches, 0, 10, 300)
+    assert len(batches) == 4
+
+def test_pack_empty():
+    assert list(run_data_importer.pack_batches([], [], [])) == []
+
+class _FakeClient():
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches = []
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        with self.lock:
+            self.batches.append((params, metrics, tags))
+
+def test_log_run_data_concurrently():
+    fake_client = _FakeClient()
+    num_batches = run_data_importer.log_run_data(fake_client, "123", *_mk_entities(150, 2500, 250), max_workers=4)
+    assert num_batches == len(fake_client.batches) == 3
+    _check_batches(fake_client.batches, 150, 2500, 250)
+
+def test_log_run_data_metric_order():
+    """ The first batch is slow so a later batch of the same metric key would overtake it on another worker. """
+    logged = []
+    lock = threading.Lock()
+    class _SlowFirstClient():
+        def log_batch(self, run_id, metrics=(), params=(), tags=()):
+            if metrics and metrics[0].step == 0:
+                time.sleep(0.2)
+            with lock:
+                logged.extend(metrics)
+    metrics = [ Metric(key, 1.0, 0, j) for key in [ "m1", "m2" ] for j in range(2500) ]
+    run_data_importer.log_run_data(_SlowFirstClient(), "123", [], metrics, [], max_workers=4)
+    for key in [ "m1", "m2" ]:
+        assert [ m.step for m in logged if m.key == key ] == list(range(2500))
+
 def init_test_runs(exporter, importer, num_params=None, num_metrics=None, num_tags=None):
     create_output_dir()
     exp, run = create_run(num_params, num_metrics, num_tags)
@@ -0,0 +1,120 @@
+import json
+from mlflow_export_import.run import run_json
+from mlflow_export_import.run.run_json import RunJsonWriter, _Scanner
+
+def _mk_run_dict(num_steps):
+    return {
+        "info": { "run_id": "abc", "status": "FINISHED", "end_time": None },
+        "params": { "alpha": "0.5" },
+        "tags": { "quote": 'a "b" {c} [d] \\', "unicode": "déjà" },
+        "metrics": {
+            "rmse": [ { "value": 0.5+j, "timestamp": 1660000000000+j, "step": j } for j in range(num_steps) ],
+            "empty": [],
+            "m/1": [ { "value": -1.5e-10, "timestamp": 1, "step": 0 } ]
+        }
+    }
+
+def _mk_old_run_dict(num_steps):
+    """ Layout of older exports with 'tags' after 'metrics'. """
+    dct = _mk_run_dict(num_steps)
+    dct["tags"] = dct.pop("tags")
+    return dct
+
+def _write(path, dct):
+    with RunJsonWriter(str(path)) as writer:
+        for k,v in dct.items():
+            if k == "metrics":
+                writer.begin_metrics()
+                for key,steps in v.items():
+                    writer.write_metric(key, iter(steps))
+                writer.end_metrics()
+            else:
+                writer.write_field(k, v)
+
+def test_writer_output_is_json(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_run_dict(100)
+    _write(path, dct)
+    assert json.loads(path.read_text()) == dct
+    assert not (tmp_path / "run.json.tmp").exists()
+
+def test_read_run_skips_metrics(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_run_dict(100)
+    path.write_text(json.dumps(dct, indent=2))
+    res = run_json.read_run(str(path))
+    assert "metrics" not in res
+    assert res["tags"] == dct["tags"]
+    assert run_json.read_run(str(path), skip_metrics=False) == dct
+
+def test_read_run_stops_at_metrics(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_run_dict(10)
+    text = json.dumps(dct, indent=2)
+    path.write_text(text[:text.index('"rmse"')]) # nothing after the start of 'metrics' is read
+    assert run_json.read_run(str(path)) == { k:v for k,v in dct.items() if k != "metrics" }
+
+def test_read_run_fields(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_run_dict(10)
+    text = json.dumps(dct)
+    path.write_text(text[:text.index('"metrics"')]) # nothing after 'tags' is read
+    assert run_json.read_run(str(path), fields=[ "tags" ]) == { "tags": dct["tags"] }
+    path.write_text(json.dumps(_mk_old_run_dict(10)))
+    assert run_json.read_run(str(path), fields=[ "tags" ]) == { "tags": dct["tags"] }
+
+def test_read_run_old_layout(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_old_run_dict(100)
+    path.write_text(json.dumps(dct))
+    with open(path) as f:
+        scanner = _Scanner(f, chunk_size=3)
+        res = {}
+        for key in scanner.iter_object():
+            if key == "metrics":
+                scanner.skip_value()
+            else:
+                res[key] = scanner.decode()
+    assert res == { k:v for k,v in dct.items() if k != "metrics" }
+    assert run_json.read_run(str(path))["tags"] == dct["tags"]
+
+def test_iter_metrics(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_run_dict(1000)
+    _write(path, dct)
+    expected = [ (k, step) for k,steps in dct["metrics"].items() for step in steps ]
+    assert list(run_json.iter_metrics(str(path))) == expected
+
+def test_scanner_small_chunks(tmp_path):
+    path = tmp_path / "run.json"
+    dct = _mk_run_dict(50)
+    path.write_text(json.dumps(dct))
+    with open(path) as f:
+        scanner = _Scanner(f, chunk_size=3)
+        res = {}
+        for key in scanner.iter_object():
+            res[key] = scanner.decode()
+    assert res == dct
+
+def test_writer_failure_leaves_no_file(tmp_path):
+    path = tmp_path / "run.json"
+    try:
+        with RunJsonWriter(str(path)) as writer:
+            writer.write_field("info", {})
+            raise RuntimeError("failed")
+    except RuntimeError:
+        pass
+    assert not path.exists()
+    assert not (tmp_path / "run.json.tmp").exists()
+
+def test_scanner_skip_value_strings(tmp_path):
+    path = tmp_path / "run.json"
+    dct = { "a": [ 'x"]}', { "b\\": "\\\"[" } ], "c": 1 }
+    path.write_text(json.dumps(dct))
+    with open(path) as f:
+        scanner = _Scanner(f, chunk_size=2)
+        keys = []
+        for key in scanner.iter_object():
+            keys.append(key)
+            scanner.skip_value()
+    assert keys == [ "a", "c" ]